@@ -0,0 +1 @@
+"""Benchmarks for Splitsquash, run against generated repositories"""
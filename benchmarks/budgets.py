@@ -0,0 +1,145 @@
+"""Check that operations stay within their budgets of git processes and object reads
+
+Run from the root of the repository, with Splitsquash installed:
+
+    python -m benchmarks.budgets --commits 10 100
+
+Each operation is run against generated repositories of every size, and fails if it starts
+more git processes or reads more git objects than its budget allows. The budgets don't
+depend on the number of commits, so an operation that makes a git call per commit fails on
+the larger repositories. The exit code is 1 if any operation went over its budget.
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+from typing import Callable, List, Tuple
+
+from git import Repo
+
+from benchmarks.repo_generator import RepoShape, generate_repo
+from benchmarks.ui import TAB_SWITCH, run_scenarios
+from splitsquash.git_calls import GitBudget, count_git_calls
+from splitsquash.plan import apply_plan
+from splitsquash.rebase_todo.rebase_todo_state import (
+    RebaseTodoState,
+    RebaseTodoStateAndCursor,
+)
+from splitsquash.rebasing import create_rebase_todo_text, parse_rebase_todo
+
+# Loading the todo may run git rev-parse and git log, and start GitPython's cat-file process.
+LOAD_BUDGET = GitBudget(max_processes=3)
+# Editing the todo only uses what was loaded.
+EDIT_BUDGET = GitBudget()
+# Rendering and moving around the editor only use what was loaded, except for the diff of
+# the active commit, which is loaded in the background.
+EDITOR_BUDGET = GitBudget(ignored_commands=["show"])
+
+# (name, tab, keys), as in benchmarks.ui. Each key updates the whole editor, so a few are
+# enough.
+EDITOR_SCENARIOS = [
+    ("cursor", "default", ["j", "j", "k", "v", "j", "m", "k", "m"]),
+    ("grid", "grid", ["j", "l", "t", "h", "k", "ctrl+z"]),
+    ("tab_switch", "default", [TAB_SWITCH] * 2),
+]
+
+
+def _make_todo_text(shas: List[str]) -> str:
+    return "".join(f"pick {sha} commit {i}\n" for i, sha in enumerate(shas))
+
+
+def _get_plan(num_items: int) -> list:
+    last = num_items - 1
+    return [
+        {"op": "set_action", "items": [1], "action": "fixup"},
+        {"op": "copy", "item": last},
+        {"op": "drop_files", "items": [last], "files": []},
+        {"op": "move", "items": [last], "to": 0},
+        {"op": "distribute", "sources": [last], "targets": [0]},
+    ]
+
+
+def check_load(repo: Repo, shas: List[str]):
+    """Parse the rebase todo"""
+    todo_text = _make_todo_text(shas)
+    with count_git_calls() as calls:
+        parse_rebase_todo(todo_text, repo)
+    return LOAD_BUDGET, calls
+
+
+def check_edit(repo: Repo, shas: List[str]):
+    """Apply a plan, undo it, move the cursor, and create the new rebase todo"""
+    rebase_items = parse_rebase_todo(_make_todo_text(shas), repo).rebase_items
+
+    with count_git_calls() as calls:
+        todo_state = RebaseTodoStateAndCursor(RebaseTodoState(rebase_items))
+        apply_plan(todo_state, _get_plan(len(rebase_items)))
+        for _ in range(len(rebase_items)):
+            todo_state.move_cursor("inc")
+        todo_state.undo()
+        todo_state.redo()
+        todo_state.get_current_files()
+        todo_state.get_files_by_co_change()
+        create_rebase_todo_text(todo_state.get_current_items())
+    return EDIT_BUDGET, calls
+
+
+def check_editor(repo: Repo, shas: List[str]):
+    """Start the editor headless, and replay the benchmark key sequences"""
+    rebase_items = parse_rebase_todo(_make_todo_text(shas), repo).rebase_items
+    with count_git_calls() as calls:
+        asyncio.run(run_scenarios(rebase_items, EDITOR_SCENARIOS))
+    return EDITOR_BUDGET, calls
+
+
+CHECKS: List[Tuple[str, Callable]] = [
+    ("load", check_load),
+    ("edit", check_edit),
+    ("editor", check_editor),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--commits", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--files-per-commit", type=int, default=5)
+    parser.add_argument(
+        "--no-editor",
+        action="store_true",
+        help="Don't start the editor, so Textual isn't needed.",
+    )
+    args = parser.parse_args()
+
+    num_failed = 0
+    with tempfile.TemporaryDirectory(prefix="splitsquash-budgets-") as work_dir:
+        for num_commits in args.commits:
+            shape = RepoShape(num_commits, args.files_per_commit)
+            repo_dir = tempfile.mkdtemp(dir=work_dir, prefix="repo-")
+            shas = generate_repo(repo_dir, shape)
+            repo = Repo(repo_dir)
+
+            for name, check in CHECKS:
+                if args.no_editor and name == "editor":
+                    continue
+
+                budget, calls = check(repo, shas)
+                errors = budget.get_errors(calls)
+                status = "ok    " if len(errors) == 0 else "failed"
+                print(
+                    f"{status} {name} ({num_commits} commits): "
+                    f"{len(calls.get_processes(budget.ignored_commands))} processes, "
+                    f"{len(calls.object_reads)} object reads"
+                )
+                for error in errors:
+                    print("    " + error.replace("\n", "\n    "))
+                num_failed += len(errors) > 0
+
+            repo.close()
+
+    if num_failed > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
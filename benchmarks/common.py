@@ -0,0 +1,66 @@
+"""Helpers shared by the benchmark suites"""
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from importlib import metadata
+from typing import Any, Callable, Dict, List
+
+
+def get_environment() -> Dict[str, Any]:
+    """Describe where the benchmarks ran, so results from different versions can be compared"""
+    try:
+        version = metadata.version("splitsquash")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+
+    git_version = subprocess.run(
+        ["git", "--version"], stdout=subprocess.PIPE, text=True
+    ).stdout.strip()
+
+    return {
+        "splitsquash_version": version,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "git": git_version,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def time_repeated(function: Callable[[], Any], repeat: int) -> List[float]:
+    """Call function several times, and return the wall time of each call in seconds"""
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return times
+
+
+def summarise_times(times: List[float]) -> Dict[str, float]:
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "max": max(times),
+    }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Get a percentile of some values, by linear interpolation between the closest ranks"""
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def write_results(path: str, suite: str, results: List[Dict[str, Any]]):
+    with open(path, "w") as f:
+        json.dump(
+            {"suite": suite, "environment": get_environment(), "results": results},
+            f,
+            indent=2,
+        )
@@ -0,0 +1,235 @@
+"""Benchmarks for parsing, editing and executing rebase todos, without the user interface
+
+Run from the root of the repository, with Splitsquash installed:
+
+    python -m benchmarks.core --commits 50 200 --output core.json
+
+A repository is generated for every combination of the shape arguments, and every benchmark
+is run against it. The results are written as JSON.
+"""
+
+import argparse
+import asyncio
+import itertools
+import shutil
+import tempfile
+import tracemalloc
+from typing import Any, Dict, List, Tuple
+
+from git import Repo
+
+from benchmarks.common import summarise_times, time_repeated, write_results
+from benchmarks.repo_generator import RepoShape, generate_repo
+from splitsquash.dry_run import dry_run
+from splitsquash.rebase_todo.distribute import distribute_changes
+from splitsquash.rebase_todo.rebase_todo_state import RebaseTodoState
+from splitsquash.rebasing import create_rebase_todo_text, parse_rebase_items
+from splitsquash.types import RebaseItem
+
+
+def _make_todo_text(repo: Repo, shas: List[str]) -> str:
+    return "".join(f"pick {sha[:7]} {repo.commit(sha).summary}\n" for sha in shas)
+
+
+def _exclude_some_files(rebase_items: List[RebaseItem]):
+    """Exclude a file from every other item, so those items need ss-edit-rebase-item
+
+    Only files that no later item modifies are excluded, so the rebase doesn't conflict.
+    """
+    last_item_index = {}
+    for i, item in enumerate(rebase_items):
+        for path in item.file_changes.keys():
+            last_item_index[path] = i
+
+    for i, item in enumerate(rebase_items):
+        if i % 2 != 0 or len(item.file_changes) < 2:
+            continue
+        for path, file_change in item.file_changes.items():
+            if last_item_index[path] == i:
+                file_change.included = False
+                break
+
+
+def _get_distribute_indices(
+    rebase_items: List[RebaseItem],
+) -> Tuple[List[int], List[int]]:
+    """Use the last quarter of the items as sources, and choose targets that won't be ambiguous
+
+    Targets are chosen from the other items, oldest first, so that no two targets modify the
+    same file.
+    """
+    num_sources = max(1, len(rebase_items) // 4)
+    source_indices = list(range(len(rebase_items) - num_sources, len(rebase_items)))
+
+    target_indices = []
+    target_files = set()
+    for i in range(len(rebase_items) - num_sources):
+        files = set(rebase_items[i].file_changes.keys())
+        if files.isdisjoint(target_files):
+            target_indices.append(i)
+            target_files.update(files)
+
+    return source_indices, target_indices
+
+
+def bench_parse_rebase_items(repo, shas, repeat) -> Dict[str, Any]:
+    todo_text = _make_todo_text(repo, shas)
+    times = time_repeated(lambda: parse_rebase_items(todo_text, repo), repeat)
+    return summarise_times(times)
+
+
+def bench_rebase_item_construction(repo, shas, repeat) -> Dict[str, Any]:
+    commits = [repo.commit(sha) for sha in shas]
+    times = time_repeated(
+        lambda: [RebaseItem("pick", commit) for commit in commits], repeat
+    )
+    return summarise_times(times)
+
+
+def bench_create_rebase_todo_text(rebase_items, repeat) -> Dict[str, Any]:
+    rebase_items = [item.copy() for item in rebase_items]
+    _exclude_some_files(rebase_items)
+    times = time_repeated(lambda: create_rebase_todo_text(rebase_items), repeat)
+    return summarise_times(times)
+
+
+def bench_distribute_changes(rebase_items, repeat) -> Dict[str, Any]:
+    rebase_items = tuple(rebase_items)
+    source_indices, target_indices = _get_distribute_indices(list(rebase_items))
+
+    errors = []
+
+    def distribute():
+        _, error = distribute_changes(source_indices, target_indices, rebase_items)
+        errors.append(error)
+
+    times = time_repeated(distribute, repeat)
+    return {
+        **summarise_times(times),
+        "num_sources": len(source_indices),
+        "num_targets": len(target_indices),
+        "error": errors[0],
+    }
+
+
+def bench_undo_history_growth(rebase_items, num_steps) -> Dict[str, Any]:
+    """Toggle one file per step, like pressing t repeatedly, and see how each step slows down"""
+    state = RebaseTodoState(rebase_items)
+
+    tracemalloc.start()
+    start_memory, _ = tracemalloc.get_traced_memory()
+
+    def toggle(step: int):
+        items = state.get_current_items()
+        item = items[step % len(items)]
+        file_change = next(iter(item.file_changes.values()))
+        file_change.included = not file_change.included
+        state.modify_items(items)
+
+    steps = itertools.count()
+    times = time_repeated(lambda: toggle(next(steps)), num_steps)
+
+    end_memory, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    num_window = max(1, min(10, num_steps // 2))
+    return {
+        "num_steps": num_steps,
+        "first_steps": summarise_times(times[:num_window]),
+        "last_steps": summarise_times(times[-num_window:]),
+        "memory_growth_bytes": end_memory - start_memory,
+        "peak_memory_bytes": peak_memory - start_memory,
+    }
+
+
+def bench_full_execution(repo_dir, rebase_items) -> Dict[str, Any]:
+    """Run the whole rebase, including the ss-edit-rebase-item exec commands, in a worktree"""
+    if shutil.which("ss-edit-rebase-item") is None:
+        return {"skipped": "ss-edit-rebase-item isn't on the PATH."}
+
+    rebase_items = [item.copy() for item in rebase_items]
+    _exclude_some_files(rebase_items)
+    todo_text = create_rebase_todo_text(rebase_items)
+
+    result = asyncio.run(dry_run(todo_text, "base", repo_dir))
+    return {
+        "total": result.total_duration,
+        "num_steps": result.steps[-1].number if len(result.steps) > 0 else 0,
+        "success": result.success,
+        "slowest_step": max((step.duration for step in result.steps), default=0.0),
+    }
+
+
+def run_benchmarks(
+    shape: RepoShape, work_dir: str, repeat: int, undo_steps: int, execute: bool
+) -> List[Dict[str, Any]]:
+    repo_dir = tempfile.mkdtemp(dir=work_dir, prefix="repo-")
+    shas = generate_repo(repo_dir, shape)
+    repo = Repo(repo_dir)
+    rebase_items = parse_rebase_items(_make_todo_text(repo, shas), repo)
+
+    benchmarks = {
+        "parse_rebase_items": lambda: bench_parse_rebase_items(repo, shas, repeat),
+        "rebase_item_construction": lambda: bench_rebase_item_construction(
+            repo, shas, repeat
+        ),
+        "create_rebase_todo_text": lambda: bench_create_rebase_todo_text(
+            rebase_items, repeat
+        ),
+        "distribute_changes": lambda: bench_distribute_changes(rebase_items, repeat),
+        "undo_history_growth": lambda: bench_undo_history_growth(
+            rebase_items, undo_steps
+        ),
+    }
+    if execute:
+        benchmarks["full_execution"] = lambda: bench_full_execution(
+            repo_dir, rebase_items
+        )
+
+    results = []
+    for name, benchmark in benchmarks.items():
+        print(f"{name} {shape}")
+        results.append(
+            {"benchmark": name, "shape": shape.to_dict(), "result": benchmark()}
+        )
+
+    repo.close()
+    shutil.rmtree(repo_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--commits", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--files-per-commit", type=int, nargs="+", default=[5])
+    parser.add_argument("--path-depth", type=int, nargs="+", default=[2])
+    parser.add_argument("--overlap", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--undo-steps", type=int, default=20)
+    parser.add_argument(
+        "--no-execute",
+        action="store_true",
+        help="Don't run the full rebase through ss-edit-rebase-item.",
+    )
+    parser.add_argument("--output", type=str, default="benchmark_core.json")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="splitsquash-bench-") as work_dir:
+        for num_commits, files_per_commit, path_depth, overlap in itertools.product(
+            args.commits, args.files_per_commit, args.path_depth, args.overlap
+        ):
+            shape = RepoShape(
+                num_commits, files_per_commit, path_depth, overlap, args.seed
+            )
+            results += run_benchmarks(
+                shape, work_dir, args.repeat, args.undo_steps, not args.no_execute
+            )
+
+    write_results(args.output, "core", results)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
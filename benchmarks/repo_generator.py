@@ -0,0 +1,121 @@
+"""Generate git repositories with a given shape, for benchmarking
+
+Commits are written with git fast-import, so large repositories can be generated quickly.
+"""
+
+import os
+import random
+import subprocess
+from dataclasses import asdict, dataclass
+from typing import List
+
+
+@dataclass(frozen=True)
+class RepoShape:
+    """The shape of a generated repository
+
+    :param num_commits: The number of commits, not including the initial commit.
+    :param files_per_commit: The number of files each commit modifies.
+    :param path_depth: The number of directories above each file.
+    :param overlap: The probability that a commit modifies a file that an earlier commit
+                    modified, rather than a new file. 0 means no two commits modify the same
+                    file.
+    :param seed: The seed for the random number generator, so the same shape always gives
+                 the same repository.
+    """
+
+    num_commits: int = 100
+    files_per_commit: int = 5
+    path_depth: int = 2
+    overlap: float = 0.5
+    seed: int = 0
+
+    def to_dict(self):
+        return asdict(self)
+
+
+# the number of subdirectories in each directory
+DIRECTORY_BRANCHING = 4
+
+
+def _make_path(shape: RepoShape, rng: random.Random, file_number: int) -> str:
+    directories = [
+        f"d{rng.randrange(DIRECTORY_BRANCHING)}" for _ in range(shape.path_depth)
+    ]
+    return "/".join(directories + [f"file{file_number}.txt"])
+
+
+def _get_commit_paths(shape: RepoShape) -> List[List[str]]:
+    """Choose the paths that each commit modifies"""
+    rng = random.Random(shape.seed)
+
+    all_paths: List[str] = []
+    commit_paths: List[List[str]] = []
+    for _ in range(shape.num_commits):
+        paths = set()
+        while len(paths) < shape.files_per_commit:
+            # Only reuse files once there are enough, so every commit can be filled.
+            can_reuse = len(all_paths) >= shape.files_per_commit
+            if can_reuse and rng.random() < shape.overlap:
+                paths.add(rng.choice(all_paths))
+            else:
+                path = _make_path(shape, rng, len(all_paths))
+                all_paths.append(path)
+                paths.add(path)
+        commit_paths.append(sorted(paths))
+
+    return commit_paths
+
+
+def generate_repo(path: str, shape: RepoShape) -> List[str]:
+    """Create a repository at path with the given shape
+
+    The repository has an initial commit tagged "base", followed by the generated commits on
+    the "main" branch.
+
+    :return: The hashes of the generated commits, oldest first.
+    """
+    os.makedirs(path, exist_ok=True)
+    subprocess.run(
+        ["git", "init", "-q", "-b", "main", path], check=True, stdout=subprocess.DEVNULL
+    )
+    for key, value in [("user.name", "Benchmark"), ("user.email", "bench@example.com")]:
+        subprocess.run(["git", "config", key, value], cwd=path, check=True)
+
+    stream = []
+    timestamp = 1_700_000_000
+
+    def add_commit(mark: int, message: str, files: List[str], version: int):
+        message_bytes = message.encode()
+        stream.append(f"commit refs/heads/main\nmark :{mark}\n".encode())
+        stream.append(
+            f"committer Benchmark <bench@example.com> {timestamp + mark} +0000\n".encode()
+        )
+        stream.append(f"data {len(message_bytes)}\n".encode() + message_bytes + b"\n")
+        for file in files:
+            content = f"{file}\nversion {version}\n".encode()
+            stream.append(f"M 100644 inline {file}\ndata {len(content)}\n".encode())
+            stream.append(content + b"\n")
+        stream.append(b"\n")
+
+    add_commit(1, "Initial commit", ["README.md"], 0)
+    stream.append(b"reset refs/tags/base\nfrom :1\n\n")
+    for i, paths in enumerate(_get_commit_paths(shape)):
+        add_commit(i + 2, f"Commit {i}\n\nModifies {len(paths)} files.", paths, i + 1)
+
+    subprocess.run(
+        ["git", "fast-import", "--quiet"],
+        cwd=path,
+        input=b"".join(stream),
+        check=True,
+    )
+    subprocess.run(["git", "checkout", "-q", "main"], cwd=path, check=True)
+
+    shas = subprocess.run(
+        ["git", "rev-list", "--reverse", "base..main"],
+        cwd=path,
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout.split()
+    return shas
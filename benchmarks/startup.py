@@ -0,0 +1,218 @@
+"""Benchmarks for how long the command line entry points take to start
+
+Run from the root of the repository, with Splitsquash installed:
+
+    python -m benchmarks.startup --repeat 20 --output startup.json
+
+Each entry point is run in a new Python process, and timed from start to exit. The time
+the interpreter takes to start on its own is measured too, and subtracted. Each entry point
+has a target for this time, and a list of modules it mustn't import, e.g. ss-edit-rebase-item
+runs once for every split item, so it mustn't import GitPython. The exit code is 1 if any
+entry point misses its target or imports a module it shouldn't.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.common import write_results
+from benchmarks.repo_generator import RepoShape, generate_repo
+
+# the modules whose import is checked for
+HEAVY_MODULES = ["git", "textual", "asyncio"]
+
+# Run in the child process to find out which heavy modules were imported. This is printed
+# when the interpreter exits, so it works for entry points that call sys.exit().
+_REPORT_IMPORTS = (
+    "import atexit, json, sys\n"
+    "atexit.register(lambda: print(json.dumps([m for m in {modules} if m in sys.modules]),"
+    " file=sys.stderr))\n"
+)
+
+
+@dataclass
+class EntryPoint:
+    name: str
+    # the module containing main()
+    module: str
+    args: List[str]
+    # the most time it should take, in seconds, not counting the interpreter's own start up
+    target: float
+    forbidden_modules: List[str] = field(default_factory=list)
+    # Called with the repository directory before each run, to set up the state the entry
+    # point expects.
+    prepare: Optional[Callable[[str], None]] = None
+
+
+def _prepare_edit_rebase_item(repo_dir: str):
+    """Check out the last commit, as if a rebase had just applied it"""
+    subprocess.run(
+        ["git", "checkout", "-q", "-f", "--detach", "main"], cwd=repo_dir, check=True
+    )
+    rebase_dir = os.path.join(repo_dir, ".git", "rebase-merge")
+    os.makedirs(rebase_dir, exist_ok=True)
+    with open(os.path.join(rebase_dir, "git-rebase-todo"), "w"):
+        pass
+
+
+def get_entry_points(repo_dir: str) -> List[EntryPoint]:
+    files = subprocess.run(
+        ["git", "diff-tree", "--no-commit-id", "--name-only", "-r", "main"],
+        cwd=repo_dir,
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    ).stdout.split()
+
+    todo_file = os.path.join(repo_dir, "todo")
+    with open(todo_file, "w") as f:
+        f.write("pick main~1 first\npick main second\n")
+    plan_file = os.path.join(repo_dir, "plan.json")
+    with open(plan_file, "w") as f:
+        json.dump([{"op": "set_action", "items": [1], "action": "fixup"}], f)
+
+    return [
+        EntryPoint(
+            "ss-edit-rebase-item --help",
+            "splitsquash.scripts.edit_rebase_item",
+            ["--help"],
+            target=0.1,
+            forbidden_modules=["git", "textual", "asyncio"],
+        ),
+        EntryPoint(
+            "ss-edit-rebase-item",
+            "splitsquash.scripts.edit_rebase_item",
+            ["-a", "fixup", *files[: max(1, len(files) // 2)]],
+            target=0.2,
+            forbidden_modules=["git", "textual", "asyncio"],
+            prepare=_prepare_edit_rebase_item,
+        ),
+        EntryPoint(
+            "splitsquash --help",
+            "splitsquash.scripts.main",
+            ["--help"],
+            target=0.1,
+            forbidden_modules=["git", "textual", "asyncio"],
+        ),
+        EntryPoint(
+            "splitsquash --plan",
+            "splitsquash.scripts.main",
+            ["--plan", plan_file, todo_file],
+            target=0.4,
+            forbidden_modules=["textual", "asyncio"],
+        ),
+        EntryPoint(
+            "ss-batch-rebase --help",
+            "splitsquash.scripts.batch_rebase",
+            ["--help"],
+            target=0.1,
+            forbidden_modules=["git", "textual"],
+        ),
+    ]
+
+
+def _run_python(code: str, args: List[str], cwd: str) -> Tuple[float, str]:
+    start_time = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-c", code, *args],
+        cwd=cwd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return time.perf_counter() - start_time, process.stderr
+
+
+def measure_interpreter(repo_dir: str, repeat: int) -> float:
+    """Get the median time Python takes to start and exit, doing nothing"""
+    return statistics.median(
+        _run_python("pass", [], repo_dir)[0] for _ in range(repeat)
+    )
+
+
+def measure_entry_point(
+    entry_point: EntryPoint, repo_dir: str, repeat: int, interpreter_time: float
+) -> Dict[str, Any]:
+    code = (
+        _REPORT_IMPORTS.format(modules=HEAVY_MODULES)
+        + f"sys.argv[0] = {entry_point.name.split()[0]!r}\n"
+        + f"from {entry_point.module} import main\n"
+        + "main()\n"
+    )
+
+    times = []
+    imported_modules = []
+    for _ in range(repeat):
+        if entry_point.prepare is not None:
+            entry_point.prepare(repo_dir)
+        duration, stderr = _run_python(code, entry_point.args, repo_dir)
+        times.append(duration - interpreter_time)
+        imported_modules = json.loads(stderr.strip().split("\n")[-1])
+
+    median = statistics.median(times)
+    forbidden_imports = [
+        m for m in imported_modules if m in entry_point.forbidden_modules
+    ]
+    return {
+        "name": entry_point.name,
+        "median": median,
+        "min": min(times),
+        "max": max(times),
+        "target": entry_point.target,
+        "imported_modules": imported_modules,
+        "forbidden_imports": forbidden_imports,
+        "success": median <= entry_point.target and len(forbidden_imports) == 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", type=str, default="benchmark_startup.json")
+    args = parser.parse_args()
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="splitsquash-bench-")
+    try:
+        repo_dir = os.path.join(work_dir, "repo")
+        generate_repo(repo_dir, RepoShape(num_commits=2, files_per_commit=6))
+
+        interpreter_time = measure_interpreter(repo_dir, args.repeat)
+        print(f"interpreter: {interpreter_time * 1000:.1f}ms")
+
+        for entry_point in get_entry_points(repo_dir):
+            result = measure_entry_point(
+                entry_point, repo_dir, args.repeat, interpreter_time
+            )
+            results.append(result)
+
+            status = "ok    " if result["success"] else "failed"
+            print(
+                f"{status} {result['name']}: {result['median'] * 1000:.1f}ms "
+                f"(target {entry_point.target * 1000:.0f}ms), "
+                f"imports {', '.join(result['imported_modules']) or 'nothing heavy'}"
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    write_results(
+        args.output,
+        "startup",
+        [{"interpreter": interpreter_time, "entry_points": results}],
+    )
+    print(f"Results written to {args.output}")
+
+    if not all(result["success"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Benchmarks for the latency of the editor, running headless against generated repositories
+
+Run from the root of the repository, with Splitsquash installed:
+
+    python -m benchmarks.ui --commits 20 100 --files-per-commit 5 --output ui.json
+
+For every repository shape, the editor is started with Textual's run_test(), and several
+key sequences are replayed. The time from each key press until the app is idle (including
+any deferred update of the rebase todo widgets) is recorded, and reported as percentiles
+for each grid size. Each shape runs in a separate process, so the peak memory is per shape.
+"""
+
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from git import Repo
+
+from benchmarks.common import percentile, write_results
+from benchmarks.repo_generator import RepoShape, generate_repo
+from splitsquash.rebasing import parse_rebase_items
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+# Replayed instead of a key, to switch between the editor tabs
+TAB_SWITCH = "<tab switch>"
+
+# the terminal size for the headless app
+SCREEN_SIZE = (200, 60)
+
+
+def get_scenarios(num_rows: int) -> List[Tuple[str, str, List[str]]]:
+    """Get the key sequences to replay: (name, tab, keys)
+
+    tab is "default" or "grid", for the editor the keys are pressed in.
+    """
+    sweep = min(num_rows - 1, 50)
+    return [
+        ("jk_sweep", "default", ["j"] * sweep + ["k"] * sweep),
+        ("select", "default", ["v", "j"] * 10 + ["ctrl+a", "ctrl+a"]),
+        ("move", "default", ["v", "j", "v", "m"] + ["j"] * 5 + ["k"] * 5 + ["m"]),
+        ("grid_jk_sweep", "grid", ["j"] * sweep + ["k"] * sweep),
+        ("toggle", "grid", ["l", "t", "l", "t", "h", "t", "h", "t"]),
+        (
+            "distribute",
+            "grid",
+            ["k"] * sweep + ["v", "q", "j", "v", "j", "v", "q", "ctrl+z"],
+        ),
+        ("tab_switch", "default", [TAB_SWITCH] * 10),
+    ]
+
+
+async def _wait_until_idle(app, pilot):
+    from splitsquash.widgets.rebase_todo_widget import RebaseTodoWidget
+
+    await pilot.pause()
+    while any(widget.update_pending for widget in app.query(RebaseTodoWidget)):
+        await pilot.pause(0.001)
+
+
+async def _switch_tab(app, tab: str):
+    from textual.widgets import TabbedContent, TabPane
+
+    tabbed_content = app.query_one(TabbedContent)
+    pane_ids = [pane.id for pane in tabbed_content.query(TabPane)]
+    if tab == "default":
+        tabbed_content.active = pane_ids[0]
+    elif tab == "grid":
+        tabbed_content.active = pane_ids[1]
+    else:
+        index = pane_ids.index(tabbed_content.active)
+        tabbed_content.active = pane_ids[1 - index]
+
+
+async def run_scenarios(
+    rebase_items, scenarios: Optional[List[Tuple[str, str, List[str]]]] = None
+) -> Dict[str, List[float]]:
+    """Replay key sequences in a headless editor, and return the latency of each key
+
+    :param scenarios: The key sequences to replay, as (name, tab, keys). Defaults to
+                      get_scenarios().
+    """
+    from splitsquash.scripts.editor import GitRebaseExtendedEditor
+
+    if scenarios is None:
+        scenarios = get_scenarios(len(rebase_items))
+
+    latencies: Dict[str, List[float]] = {}
+
+    app = GitRebaseExtendedEditor(rebase_items)
+    async with app.run_test(size=SCREEN_SIZE) as pilot:
+        await _wait_until_idle(app, pilot)
+
+        for name, tab, keys in scenarios:
+            await _switch_tab(app, tab)
+            await _wait_until_idle(app, pilot)
+
+            times = latencies[name] = []
+            for key in keys:
+                start_time = time.perf_counter()
+                if key == TAB_SWITCH:
+                    await _switch_tab(app, key)
+                else:
+                    await pilot.press(key)
+                await _wait_until_idle(app, pilot)
+                times.append(time.perf_counter() - start_time)
+
+        app.exit()
+
+    return latencies
+
+
+def _summarise_latencies(times: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(times),
+        "p50": percentile(times, 0.5),
+        "p95": percentile(times, 0.95),
+        "p99": percentile(times, 0.99),
+        "max": max(times),
+    }
+
+
+def run_shape(shape: RepoShape, work_dir: str) -> Dict[str, Any]:
+    """Run all the scenarios against a repository of this shape
+
+    This is run in a separate process for each shape.
+    """
+    repo_dir = tempfile.mkdtemp(dir=work_dir, prefix="repo-")
+    shas = generate_repo(repo_dir, shape)
+    repo = Repo(repo_dir)
+    todo_text = "".join(f"pick {sha[:7]} {repo.commit(sha).summary}\n" for sha in shas)
+    rebase_items = parse_rebase_items(todo_text, repo)
+
+    num_columns = len(set(path for item in rebase_items for path in item.file_changes))
+
+    latencies = asyncio.run(run_scenarios(rebase_items))
+
+    repo.close()
+    shutil.rmtree(repo_dir, ignore_errors=True)
+
+    all_times = [t for times in latencies.values() for t in times]
+    return {
+        "shape": shape.to_dict(),
+        "grid_size": {"rows": len(rebase_items), "columns": num_columns},
+        "scenarios": {
+            name: _summarise_latencies(times) for name, times in latencies.items()
+        },
+        "all_keys": _summarise_latencies(all_times),
+        # kilobytes on Linux, bytes on macOS
+        "peak_rss": (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--commits", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--files-per-commit", type=int, nargs="+", default=[5])
+    parser.add_argument("--path-depth", type=int, nargs="+", default=[2])
+    parser.add_argument("--overlap", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default="benchmark_ui.json")
+    args = parser.parse_args()
+
+    # A new process for each shape, so the peak memory of one doesn't hide the others.
+    context = multiprocessing.get_context("spawn")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="splitsquash-bench-") as work_dir:
+        for num_commits, files_per_commit, path_depth, overlap in itertools.product(
+            args.commits, args.files_per_commit, args.path_depth, args.overlap
+        ):
+            shape = RepoShape(
+                num_commits, files_per_commit, path_depth, overlap, args.seed
+            )
+            print(shape)
+            with context.Pool(1) as pool:
+                result = pool.apply(run_shape, (shape, work_dir))
+            results.append(result)
+
+            all_keys = result["all_keys"]
+            print(
+                f"    {result['grid_size']['rows']}x{result['grid_size']['columns']}: "
+                f"p50 {all_keys['p50'] * 1000:.1f}ms, p95 {all_keys['p95'] * 1000:.1f}ms, "
+                f"p99 {all_keys['p99'] * 1000:.1f}ms"
+            )
+
+    write_results(args.output, "ui", results)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
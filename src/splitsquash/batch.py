@@ -0,0 +1,180 @@
+"""Apply the same plan to many branches at once
+
+Each branch is rebased in its own temporary worktree, so several rebases can run at the
+same time without touching the main checkout. The rebases run in a process pool. See
+splitsquash.plan for the plan format.
+"""
+
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Set
+
+from splitsquash.tracing import span
+
+
+@dataclass
+class BranchResult:
+    """The result of rebasing one branch"""
+
+    branch: str
+    success: bool
+    # wall time in seconds, including creating and removing the worktree
+    duration: float
+    old_sha: Optional[str] = None
+    # None if the rebase failed
+    new_sha: Optional[str] = None
+    # git's output, or the error if the rebase failed
+    output: str = ""
+
+
+def _git(args: List[str], cwd: str, env: Optional[dict] = None) -> str:
+    with span(f"git {args[0]}", "git", command=" ".join(args)) as span_args:
+        process = subprocess.run(
+            ["git", *args],
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        span_args["bytes"] = len(process.stdout)
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"git {' '.join(args)} failed with exit code {process.returncode}:\n"
+            + process.stdout
+        )
+    return process.stdout
+
+
+def get_checked_out_branches(repo_dir: str) -> Set[str]:
+    """Get the refs of the branches checked out in any worktree"""
+    lines = _git(["worktree", "list", "--porcelain"], repo_dir).splitlines()
+    return set(line[len("branch ") :] for line in lines if line.startswith("branch "))
+
+
+def get_plan_editor_command(plan_file: str) -> str:
+    """Get a sequence editor command that applies a plan to the rebase todo"""
+    return (
+        f"{shlex.quote(sys.executable)} -m splitsquash.scripts.main "
+        f"--plan {shlex.quote(os.path.abspath(plan_file))}"
+    )
+
+
+def rebase_branch_with_plan(
+    repo_dir: str, branch: str, upstream: str, plan_file: str
+) -> BranchResult:
+    """Rebase a branch onto upstream in a temporary worktree, applying a plan to the todo
+
+    The branch is only updated if the rebase succeeds, and if nothing else has moved it in
+    the meantime. A rebase that stops part way through, e.g. at an edit, is cancelled, since
+    nobody can continue it. Branches that are checked out in a worktree are not rebased, since updating
+    them would leave that worktree's files out of date.
+    """
+    start_time = time.perf_counter()
+    result = BranchResult(branch, False, 0.0)
+
+    worktree_dir = tempfile.mkdtemp(prefix="splitsquash-")
+    worktree_added = False
+    try:
+        if f"refs/heads/{branch}" in get_checked_out_branches(repo_dir):
+            raise RuntimeError(f"{branch} is checked out in a worktree.")
+
+        result.old_sha = _git(
+            ["rev-parse", "--verify", f"refs/heads/{branch}^{{commit}}"], repo_dir
+        ).strip()
+
+        # Detach HEAD, so the branch is only moved once the whole rebase has succeeded.
+        _git(["worktree", "add", "--detach", worktree_dir, result.old_sha], repo_dir)
+        worktree_added = True
+
+        env = os.environ.copy()
+        env["GIT_SEQUENCE_EDITOR"] = get_plan_editor_command(plan_file)
+        # Keep commit messages as they are for reword and squash, instead of waiting for
+        # someone to edit them.
+        env["GIT_EDITOR"] = "true"
+
+        try:
+            result.output = _git(["rebase", "-i", upstream], worktree_dir, env)
+
+            # git exits with code 0 when it stops at an edit or break, but leaves the rebase
+            # directory there. The branch mustn't be moved to a half-finished rebase.
+            rebase_dir = _git(
+                ["rev-parse", "--git-path", "rebase-merge"], worktree_dir
+            ).strip()
+            if os.path.isdir(os.path.join(worktree_dir, rebase_dir)):
+                raise RuntimeError(
+                    "The rebase stopped before the end, e.g. at an edit or break, so it "
+                    "was cancelled:\n" + result.output
+                )
+        except RuntimeError:
+            subprocess.run(
+                ["git", "rebase", "--abort"],
+                cwd=worktree_dir,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            raise
+
+        new_sha = _git(["rev-parse", "HEAD"], worktree_dir).strip()
+        _git(
+            [
+                "update-ref",
+                "-m",
+                "splitsquash batch rebase",
+                f"refs/heads/{branch}",
+                new_sha,
+                result.old_sha,
+            ],
+            repo_dir,
+        )
+
+        result.new_sha = new_sha
+        result.success = True
+    except RuntimeError as e:
+        result.output = str(e)
+    finally:
+        if worktree_added:
+            subprocess.run(
+                ["git", "worktree", "remove", "--force", worktree_dir],
+                cwd=repo_dir,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        shutil.rmtree(worktree_dir, ignore_errors=True)
+
+        result.duration = time.perf_counter() - start_time
+
+    return result
+
+
+def run_batch(
+    repo_dir: str,
+    branches: List[str],
+    upstream: str,
+    plan_file: str,
+    max_workers: Optional[int] = None,
+) -> Iterator[BranchResult]:
+    """Rebase each branch onto upstream with the same plan, several at a time
+
+    Results are yielded as each branch finishes, so not in the order of branches.
+
+    :param max_workers: The number of rebases to run at once. Defaults to the number of CPUs.
+    """
+    repo_dir = os.path.abspath(repo_dir)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                rebase_branch_with_plan, repo_dir, branch, upstream, plan_file
+            )
+            for branch in branches
+        ]
+        for future in as_completed(futures):
+            yield future.result()
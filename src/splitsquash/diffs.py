@@ -0,0 +1,85 @@
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+from git import Commit
+
+from splitsquash.tracing import span
+
+# A commit hash, and optionally a path to only show the diff of one file
+DiffKey = Tuple[str, Optional[str]]
+
+
+class DiffCache:
+    """A least-recently-used cache of diffs
+
+    The size of the cache is limited by the total number of bytes in the diffs, rather
+    than the number of diffs, since a single diff can be very large. Diffs are loaded in
+    worker threads, so the cache is locked while it's read or changed.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self._max_bytes = max_bytes
+        self._num_bytes = 0
+        self._diffs: OrderedDict[DiffKey, Tuple[List[str], int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: DiffKey) -> Optional[List[str]]:
+        """Get the lines of a diff, or None if it isn't cached"""
+        with self._lock:
+            entry = self._diffs.get(key)
+            if entry is None:
+                return None
+
+            self._diffs.move_to_end(key)
+            lines, _ = entry
+            return lines
+
+    def put(self, key: DiffKey, lines: List[str], num_bytes: int):
+        """Add a diff, and evict the least recently used diffs until it fits
+
+        Diffs larger than the whole cache are not stored.
+        """
+        if num_bytes > self._max_bytes:
+            return
+
+        with self._lock:
+            if key in self._diffs:
+                _, old_num_bytes = self._diffs.pop(key)
+                self._num_bytes -= old_num_bytes
+
+            self._diffs[key] = (lines, num_bytes)
+            self._num_bytes += num_bytes
+
+            while self._num_bytes > self._max_bytes:
+                _, (_, evicted_num_bytes) = self._diffs.popitem(last=False)
+                self._num_bytes -= evicted_num_bytes
+
+
+def stream_diff(commit: Commit, path: Optional[str] = None) -> Iterator[bytes]:
+    """Yield the lines of a commit's diff as git outputs them
+
+    If path is given, only the diff of that file is shown. The git process is killed if the
+    generator is closed before the end of the diff.
+    """
+    args = ["git", "show", "--format=", "--no-color", "--no-ext-diff", commit.hexsha]
+    if path is not None:
+        args += ["--", path]
+
+    with span("git show", "git", command=" ".join(args)) as span_args:
+        process = subprocess.Popen(
+            args,
+            cwd=commit.repo.working_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        num_bytes = 0
+        try:
+            for line in process.stdout:
+                num_bytes += len(line)
+                yield line
+        finally:
+            process.kill()
+            process.wait()
+            span_args["bytes"] = num_bytes
@@ -0,0 +1,126 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Iterator
+
+from splitsquash.rebase_todo.renames import RenameIndex
+from splitsquash.types import RebaseItem
+
+
+def get_parent_directories(path: str) -> Iterator[str]:
+    """Yield every directory containing the path, starting from the top level
+
+    e.g. "a/b/c.txt" gives "a" then "a/b". Git paths always use "/" as the separator.
+    """
+    parts = path.split("/")
+    for i in range(1, len(parts)):
+        yield "/".join(parts[:i])
+
+
+@dataclass
+class DirectoryStats:
+    """The file changes in one directory of a rebase item, added together"""
+
+    num_included: int = 0
+    num_excluded: int = 0
+    # insertions plus deletions
+    lines_changed: int = 0
+    # the number of files with each change type (see FileChangeIndicator)
+    change_types: Counter = field(default_factory=Counter)
+
+    def get_change_type(self) -> str:
+        """Get the change type of all the files, or "M" if they have different types"""
+        if len(self.change_types) == 1:
+            return next(iter(self.change_types))
+        return "M"
+
+    def add(self, other: "DirectoryStats"):
+        """Add the file changes of other to these stats"""
+        self.num_included += other.num_included
+        self.num_excluded += other.num_excluded
+        self.lines_changed += other.lines_changed
+        self.change_types.update(other.change_types)
+
+
+class DirectoryAggregation:
+    """Stores a DirectoryStats for every directory in every rebase item
+
+    Each file change is added to the stats of all the directories above it, so the stats of
+    any directory can be looked up directly. When rebase items change, only the changed file
+    changes are applied, which costs one update per parent directory.
+
+    :param rename_index: If given, each file change is added to the directories of the file's
+                         canonical path, so a renamed file is counted in one place.
+    """
+
+    def __init__(self, rename_index: Optional[RenameIndex] = None):
+        self._rename_index = rename_index or RenameIndex()
+        # for each row, the stats of each directory
+        self._rows: List[Dict[str, DirectoryStats]] = []
+        # for each row, the commit hash and whether each file is included
+        self._row_files: List[Tuple[str, Dict[str, bool]]] = []
+
+    def get_stats(self, row: int, directory: str) -> Optional[DirectoryStats]:
+        """Get the stats of a directory in a rebase item, or None if it has no file changes"""
+        return self._rows[row].get(directory)
+
+    def update_items(self, rebase_items: Tuple[RebaseItem, ...]):
+        """Update the stats to match a new list of rebase items
+
+        Rows for the same commit as before only have their toggled files updated. Other rows
+        are rebuilt.
+        """
+        del self._rows[len(rebase_items) :]
+        del self._row_files[len(rebase_items) :]
+
+        for row, item in enumerate(rebase_items):
+            if row >= len(self._rows):
+                self._rows.append({})
+                self._row_files.append(("", {}))
+
+            sha, included_files = self._row_files[row]
+            if sha != item.commit.hexsha:
+                self._rebuild_row(row, item)
+                continue
+
+            for path, file_change in item.file_changes.items():
+                if included_files[path] != file_change.included:
+                    self.set_included(row, path, file_change.included)
+
+    def set_included(self, row: int, path: str, included: bool):
+        """Include or exclude one file in a row, and update the directories above it"""
+        _, included_files = self._row_files[row]
+        if included_files[path] == included:
+            return
+        included_files[path] = included
+
+        change = 1 if included else -1
+        canonical_path = self._rename_index.get_canonical_path(path)
+        for directory in get_parent_directories(canonical_path):
+            stats = self._rows[row][directory]
+            stats.num_included += change
+            stats.num_excluded -= change
+
+    def _rebuild_row(self, row: int, item: RebaseItem):
+        stats_by_directory: Dict[str, DirectoryStats] = {}
+        included_files: Dict[str, bool] = {}
+
+        commit_stats = item.stats.files
+        for path, file_change in item.file_changes.items():
+            included_files[path] = file_change.included
+            file_stats = commit_stats[path]
+
+            canonical_path = self._rename_index.get_canonical_path(path)
+            for directory in get_parent_directories(canonical_path):
+                stats = stats_by_directory.get(directory)
+                if stats is None:
+                    stats = stats_by_directory[directory] = DirectoryStats()
+
+                if file_change.included:
+                    stats.num_included += 1
+                else:
+                    stats.num_excluded += 1
+                stats.lines_changed += file_stats["lines"]
+                stats.change_types[file_stats["change_type"]] += 1
+
+        self._rows[row] = stats_by_directory
+        self._row_files[row] = (item.commit.hexsha, included_files)
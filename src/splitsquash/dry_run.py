@@ -0,0 +1,188 @@
+"""Try out a rebase todo in a temporary worktree, without changing the real checkout
+
+The worktree shares the repository's object store, so nothing needs to be copied. The time
+taken by each todo command is recorded, including the ss-edit-rebase-item exec commands, so
+slow or conflicting todos can be found before running them for real.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from splitsquash.rebase_runner import RebaseProgress, run_rebase
+from splitsquash.tracing import span
+
+# These would make git use the real checkout instead of the temporary worktree.
+_GIT_LOCATION_VARIABLES = ["GIT_DIR", "GIT_WORK_TREE", "GIT_INDEX_FILE"]
+
+
+@dataclass
+class DryRunStep:
+    """One command in the rebase todo, and how long it took in seconds"""
+
+    # the number git gives the command, starting from 1
+    number: int
+    line: str
+    duration: float
+
+
+@dataclass
+class DryRunResult:
+    steps: List[DryRunStep] = field(default_factory=list)
+    total_duration: float = 0.0
+    # The index of the step the rebase stopped at, or None if it finished. Commands that git
+    # finished too quickly to notice are counted as part of the step before.
+    stopped_at: Optional[int] = None
+    returncode: int = 0
+    output: str = ""
+
+    @property
+    def success(self):
+        return self.stopped_at is None and self.returncode == 0
+
+    def get_summary(self) -> str:
+        """Describe the result in a few lines"""
+        num_steps = self.steps[-1].number if len(self.steps) > 0 else 0
+        lines = [f"{num_steps} steps in {self.total_duration:.2f}s."]
+
+        if len(self.steps) > 0:
+            slowest = max(self.steps, key=lambda step: step.duration)
+            lines.append(f"Slowest: {slowest.line} ({slowest.duration:.2f}s).")
+
+        if self.stopped_at is not None:
+            lines.append(
+                f"Would stop at step {self.steps[self.stopped_at].number}: "
+                f"{self.steps[self.stopped_at].line}"
+            )
+        elif self.returncode != 0:
+            lines.append(f"git failed with exit code {self.returncode}.")
+
+        return "\n".join(lines)
+
+
+def get_todo_commands(rebase_todo: str) -> List[str]:
+    """Get the lines of a rebase todo that are commands, in the order git runs them"""
+    return [
+        line.strip()
+        for line in rebase_todo.split("\n")
+        if len(line.strip()) > 0 and not line.strip().startswith("#")
+    ]
+
+
+async def _git(args: List[str], cwd: str, env: dict):
+    with span(f"git {args[0]}", "git", command=" ".join(args)) as span_args:
+        process = await asyncio.create_subprocess_exec(
+            "git",
+            *args,
+            cwd=cwd,
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        stdout, _ = await process.communicate()
+        span_args["bytes"] = len(stdout)
+    if process.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed:\n{stdout.decode()}")
+    return stdout.decode().strip()
+
+
+async def get_rebase_onto(repo_dir: str = ".") -> str:
+    """Get the commit the rebase in progress is onto
+
+    Git writes this before it opens the sequence editor.
+    """
+    env = _get_env()
+    git_dir = os.path.join(
+        repo_dir, await _git(["rev-parse", "--git-dir"], repo_dir, env)
+    )
+    try:
+        with open(os.path.join(git_dir, "rebase-merge", "onto"), "r") as f:
+            return f.read().strip()
+    except OSError:
+        raise RuntimeError("There isn't a rebase in progress.")
+
+
+async def dry_run(rebase_todo: str, onto: str, repo_dir: str = ".") -> DryRunResult:
+    """Run a rebase todo in a temporary worktree, starting from onto
+
+    Commit messages are kept as they are for reword and squash commands. The worktree is
+    removed afterwards, whether or not the rebase finished.
+    """
+    env = _get_env()
+    env["GIT_EDITOR"] = "true"
+
+    commands = get_todo_commands(rebase_todo)
+    result = DryRunResult()
+
+    worktree_dir = tempfile.mkdtemp(prefix="splitsquash-dry-run-")
+    worktree_added = False
+    step_start_time = 0.0
+
+    def get_step_line(step: int) -> str:
+        # ss-edit-rebase-item can add commands to the todo, so look the step up in the
+        # commands git has done, rather than the original todo.
+        try:
+            with open(os.path.join(worktree_git_dir, "rebase-merge", "done"), "r") as f:
+                done = get_todo_commands(f.read())
+        except OSError:
+            done = []
+
+        if step <= len(done):
+            return done[step - 1]
+        elif step <= len(commands):
+            return commands[step - 1]
+        else:
+            return "(a command added by ss-edit-rebase-item)"
+
+    def on_progress(progress: RebaseProgress):
+        nonlocal step_start_time
+        now = time.perf_counter()
+        if len(result.steps) > 0:
+            result.steps[-1].duration = now - step_start_time
+        result.steps.append(
+            DryRunStep(progress.step, get_step_line(progress.step), 0.0)
+        )
+        step_start_time = now
+
+    try:
+        await _git(["worktree", "add", "--detach", worktree_dir, onto], repo_dir, env)
+        worktree_added = True
+        worktree_git_dir = await _git(
+            ["rev-parse", "--absolute-git-dir"], worktree_dir, env
+        )
+
+        start_time = time.perf_counter()
+        rebase_result = await run_rebase(
+            rebase_todo,
+            [onto],
+            cwd=worktree_dir,
+            on_progress=on_progress,
+            env=env,
+            poll_interval=0.01,
+        )
+        end_time = time.perf_counter()
+
+        if len(result.steps) > 0:
+            result.steps[-1].duration = end_time - step_start_time
+        result.total_duration = end_time - start_time
+        result.returncode = rebase_result.returncode
+        result.output = rebase_result.output
+        if rebase_result.stopped:
+            result.stopped_at = len(result.steps) - 1
+    finally:
+        if worktree_added:
+            await _git(["worktree", "remove", "--force", worktree_dir], repo_dir, env)
+        shutil.rmtree(worktree_dir, ignore_errors=True)
+
+    return result
+
+
+def _get_env() -> dict:
+    env = os.environ.copy()
+    for variable in _GIT_LOCATION_VARIABLES:
+        env.pop(variable, None)
+    return env
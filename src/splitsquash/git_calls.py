@@ -0,0 +1,141 @@
+"""Count the git processes started and the git objects read while some code runs
+
+GitPython hides git commands behind attributes, e.g. Commit.stats runs git diff every time
+it's read, so an innocent looking change can add a git command per commit or per key press.
+Wrap an operation in count_git_calls() to see what it runs, or in assert_git_budget() to
+fail if it runs more than expected.
+
+Processes are counted wherever they're started: by GitPython, subprocess or asyncio. Object
+reads are the reads through GitPython's long-running git cat-file processes, which don't
+start a new process each time.
+"""
+
+import os
+import subprocess
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional
+
+from git.cmd import Git
+
+_OBJECT_READ_METHODS = ["get_object_header", "get_object_data", "stream_object_data"]
+
+
+@dataclass
+class GitCalls:
+    # the arguments of each git process started, without "git" and any options before the
+    # command, e.g. ["rev-parse", "HEAD"]
+    processes: List[List[str]] = field(default_factory=list)
+    # the name of each object read, e.g. a commit hash
+    object_reads: List[str] = field(default_factory=list)
+
+    def get_processes(self, ignored_commands: Iterable[str] = ()) -> List[List[str]]:
+        """Get the processes started, except the ones running the given git commands"""
+        ignored_commands = set(ignored_commands)
+        return [
+            args
+            for args in self.processes
+            if len(args) == 0 or args[0] not in ignored_commands
+        ]
+
+
+@dataclass
+class GitBudget:
+    """The most git calls an operation is expected to make"""
+
+    max_processes: int = 0
+    max_object_reads: int = 0
+    # Git commands that aren't counted, e.g. "show" for the diffs loaded in the background
+    # when the cursor moves.
+    ignored_commands: List[str] = field(default_factory=list)
+
+    def get_errors(self, calls: GitCalls) -> List[str]:
+        """Describe how the calls went over the budget, or return an empty list"""
+        errors = []
+
+        processes = calls.get_processes(self.ignored_commands)
+        if len(processes) > self.max_processes:
+            commands = "\n".join(f"    git {' '.join(args)}" for args in processes)
+            errors.append(
+                f"{len(processes)} git processes were started, but the budget is "
+                f"{self.max_processes}:\n{commands}"
+            )
+
+        if len(calls.object_reads) > self.max_object_reads:
+            errors.append(
+                f"{len(calls.object_reads)} git objects were read, but the budget is "
+                f"{self.max_object_reads}: {', '.join(calls.object_reads[:10])}"
+            )
+
+        return errors
+
+
+def _get_git_args(popen_args) -> Optional[List[str]]:
+    """Get the arguments of a git command, or None if the process isn't git"""
+    if isinstance(popen_args, (str, bytes, os.PathLike)):
+        # a shell command, which is only counted if it starts with git
+        popen_args = os.fsdecode(popen_args).split()
+    popen_args = [os.fsdecode(arg) for arg in popen_args]
+    if len(popen_args) == 0 or os.path.basename(popen_args[0]) not in (
+        "git",
+        "git.exe",
+    ):
+        return None
+
+    # Skip options before the command, e.g. "git -c core.quotepath=false diff".
+    args = popen_args[1:]
+    while len(args) > 0 and args[0].startswith("-"):
+        option = args.pop(0)
+        if option in ("-c", "-C") and len(args) > 0:
+            args.pop(0)
+    return args
+
+
+@contextmanager
+def count_git_calls() -> Iterator[GitCalls]:
+    """Count the git calls made in the body of a with statement, from any thread
+
+    These can be nested.
+    """
+    calls = GitCalls()
+
+    popen_init = subprocess.Popen.__init__
+
+    def counting_popen_init(self, args, *popen_args, **kwargs):
+        git_args = _get_git_args(args)
+        if git_args is not None:
+            calls.processes.append(git_args)
+        popen_init(self, args, *popen_args, **kwargs)
+
+    object_read_methods = {name: getattr(Git, name) for name in _OBJECT_READ_METHODS}
+
+    def make_counting_read(method):
+        def counting_read(self, ref):
+            calls.object_reads.append(os.fsdecode(ref))
+            return method(self, ref)
+
+        return counting_read
+
+    subprocess.Popen.__init__ = counting_popen_init
+    for name, method in object_read_methods.items():
+        setattr(Git, name, make_counting_read(method))
+
+    try:
+        yield calls
+    finally:
+        subprocess.Popen.__init__ = popen_init
+        for name, method in object_read_methods.items():
+            setattr(Git, name, method)
+
+
+@contextmanager
+def assert_git_budget(
+    budget: GitBudget, name: str = "The operation"
+) -> Iterator[GitCalls]:
+    """Raise an AssertionError if the body of a with statement goes over a git budget"""
+    with count_git_calls() as calls:
+        yield calls
+
+    errors = budget.get_errors(calls)
+    if len(errors) > 0:
+        raise AssertionError(f"{name} went over its git budget.\n" + "\n".join(errors))
@@ -0,0 +1,149 @@
+"""A few git plumbing commands, run directly with subprocess
+
+ss-edit-rebase-item runs once for every split item in a rebase, so it shouldn't spend its
+time importing GitPython. This module only imports the standard library.
+"""
+
+import os
+import subprocess
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from splitsquash.tracing import span
+
+
+@dataclass
+class CommitInfo:
+    """The parts of a commit object needed to recreate it"""
+
+    tree: str
+    parents: List[str]
+    # "Name <email> timestamp timezone", as stored in the commit
+    author: str
+    message: str
+
+    def get_author_env(self) -> Dict[str, str]:
+        """Get the environment variables that make git commit-tree keep this author"""
+        name_and_email, _, date = self.author.rpartition(">")
+        name, _, email = name_and_email.partition("<")
+        return {
+            "GIT_AUTHOR_NAME": name.strip(),
+            "GIT_AUTHOR_EMAIL": email,
+            "GIT_AUTHOR_DATE": date.strip(),
+        }
+
+
+def run_git(
+    args: List[str],
+    input: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    cwd: Optional[str] = None,
+) -> str:
+    """Run a git command, and return its output without the trailing newline
+
+    :param env: Variables to set, on top of this process's environment.
+    """
+    with span(f"git {args[0]}", "git", command=" ".join(args)) as span_args:
+        process = subprocess.run(
+            ["git", *args],
+            input=input,
+            cwd=cwd,
+            env={**os.environ, **env} if env is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        span_args["bytes"] = len(process.stdout)
+    if process.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed:\n{process.stderr}")
+    return process.stdout.removesuffix("\n")
+
+
+def get_git_dir(cwd: Optional[str] = None) -> str:
+    """Get the absolute path of the git directory, which is separate for each worktree"""
+    return run_git(["rev-parse", "--absolute-git-dir"], cwd=cwd)
+
+
+def read_commit(rev: str, cwd: Optional[str] = None) -> CommitInfo:
+    text = run_git(["cat-file", "commit", rev], cwd=cwd)
+    # The headers are separated from the message by a blank line. Text is only removed from
+    # the end of the output, so the message is as git stored it, apart from its last newline.
+    headers, _, message = text.partition("\n\n")
+
+    tree = None
+    parents = []
+    author = ""
+    for line in headers.split("\n"):
+        key, _, value = line.partition(" ")
+        if key == "tree":
+            tree = value
+        elif key == "parent":
+            parents.append(value)
+        elif key == "author":
+            author = value
+
+    return CommitInfo(tree, parents, author, message + "\n")
+
+
+@contextmanager
+def temporary_index(git_dir: str) -> Iterator[Dict[str, str]]:
+    """Use a new index file in git_dir, so the real index and working tree aren't touched
+
+    :return: The environment variables that make git use the index. Pass them as the env of
+             the other functions.
+    """
+    index_file = os.path.join(git_dir, f"splitsquash-index-{os.getpid()}")
+    try:
+        yield {"GIT_INDEX_FILE": index_file, "GIT_LITERAL_PATHSPECS": "1"}
+    finally:
+        if os.path.exists(index_file):
+            os.remove(index_file)
+
+
+def read_tree(
+    rev: str, env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None
+):
+    """Replace the index with the tree of rev"""
+    run_git(["read-tree", rev], env=env, cwd=cwd)
+
+
+def reset_paths(
+    source: str,
+    paths: List[str],
+    env: Optional[Dict[str, str]] = None,
+    cwd: Optional[str] = None,
+):
+    """Set the paths in the index to their contents in source
+
+    Paths that don't exist in source are removed from the index.
+    """
+    run_git(["reset", "-q", source, "--", *paths], env=env, cwd=cwd)
+
+
+def write_tree(env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None) -> str:
+    """Write the index as a tree, and return its hash"""
+    return run_git(["write-tree"], env=env, cwd=cwd)
+
+
+def commit_tree(
+    tree: str,
+    parents: List[str],
+    message: str,
+    env: Optional[Dict[str, str]] = None,
+    cwd: Optional[str] = None,
+) -> str:
+    """Create a commit object, without changing HEAD
+
+    :param env: e.g. CommitInfo.get_author_env(), to keep the author of another commit.
+    :return: The hash of the new commit.
+    """
+    args = ["commit-tree", tree]
+    for parent in parents:
+        args += ["-p", parent]
+    return run_git([*args, "-F", "-"], input=message, env=env, cwd=cwd)
+
+
+def reset_hard(rev: str, cwd: Optional[str] = None):
+    """Point HEAD at a commit, and make the index and working tree match it"""
+    run_git(["reset", "-q", "--hard", rev], cwd=cwd)
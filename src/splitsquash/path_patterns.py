@@ -0,0 +1,139 @@
+"""Match glob and regex patterns against a set of file paths
+
+Patterns are compiled once, and matched against a PathIndex, which stores each file name and
+directory once. A pattern that only looks at file names (e.g. "*.lock") or directories (e.g.
+"vendor/") is matched against each distinct name or directory, rather than every path.
+
+Pattern syntax:
+- "re:<regex>" matches paths containing a match of the regular expression.
+- A glob ending in "/" matches every file under a matching directory. "vendor/" matches a
+  directory called vendor at any depth, and "src/vendor/" only matches src/vendor.
+- A glob without a "/" matches file names at any depth, e.g. "*.lock".
+- Any other glob matches whole paths from the top level, e.g. "src/**/test_*.py".
+
+In globs, "*" and "?" don't match "/", "**" matches any number of directories, and "[...]"
+matches one of a set of characters, or any character not in the set if it starts with "!".
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Literal
+
+from splitsquash.directory_aggregation import get_parent_directories
+
+REGEX_PREFIX = "re:"
+
+PatternKind = Literal["regex", "name", "path", "directory_name", "directory"]
+
+
+@dataclass(frozen=True)
+class PathPattern:
+    """A compiled pattern, and what it is matched against"""
+
+    kind: PatternKind
+    regex: re.Pattern
+
+
+def _translate_glob(glob: str) -> str:
+    """Translate a glob to a regular expression that matches the whole string"""
+    result = []
+    i = 0
+    while i < len(glob):
+        if glob.startswith("**/", i):
+            result.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i):
+            result.append(".*")
+            i += 2
+        elif glob[i] == "*":
+            result.append("[^/]*")
+            i += 1
+        elif glob[i] == "?":
+            result.append("[^/]")
+            i += 1
+        elif glob[i] == "[" and "]" in glob[i + 2 :]:
+            end = glob.index("]", i + 2)
+            characters = glob[i + 1 : end].replace("\\", "\\\\")
+            if characters.startswith("!"):
+                characters = "^" + characters[1:]
+            result.append(f"[{characters}]")
+            i = end + 1
+        else:
+            result.append(re.escape(glob[i]))
+            i += 1
+    return "".join(result) + r"\Z"
+
+
+@lru_cache(maxsize=128)
+def compile_path_pattern(pattern: str) -> PathPattern:
+    """Compile a pattern, as described in the module docstring
+
+    A ValueError is raised if the pattern is empty, or isn't a valid regular expression.
+    """
+    if pattern.startswith(REGEX_PREFIX):
+        try:
+            return PathPattern("regex", re.compile(pattern[len(REGEX_PREFIX) :]))
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}.") from e
+
+    glob = pattern.strip().lstrip("/")
+    if glob in ("", "/"):
+        raise ValueError("The pattern is empty.")
+
+    if glob.endswith("/"):
+        glob = glob.rstrip("/")
+        kind = "directory" if "/" in glob else "directory_name"
+    else:
+        kind = "path" if "/" in glob else "name"
+    return PathPattern(kind, re.compile(_translate_glob(glob)))
+
+
+class PathIndex:
+    """Stores a set of file paths, so patterns can be matched against them quickly
+
+    Each path is given an id. The ids are stored by file name and by every directory above
+    them, so each distinct name or directory is only matched once.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self._paths: List[str] = list(dict.fromkeys(paths))
+
+        self._ids_by_name: Dict[str, List[int]] = {}
+        self._ids_by_directory: Dict[str, List[int]] = {}
+        for path_id, path in enumerate(self._paths):
+            name = path.rsplit("/", 1)[-1]
+            self._ids_by_name.setdefault(name, []).append(path_id)
+            for directory in get_parent_directories(path):
+                self._ids_by_directory.setdefault(directory, []).append(path_id)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def match(self, pattern: str | PathPattern) -> List[str]:
+        """Get the paths that match a pattern, in the order they were given
+
+        :param pattern: A pattern string, which is compiled if it hasn't been already, or a
+                        compiled pattern.
+        """
+        if isinstance(pattern, str):
+            pattern = compile_path_pattern(pattern)
+
+        regex = pattern.regex
+        if pattern.kind == "regex":
+            return [path for path in self._paths if regex.search(path)]
+        elif pattern.kind == "path":
+            return [path for path in self._paths if regex.match(path)]
+
+        if pattern.kind == "name":
+            ids_by_key = self._ids_by_name
+        else:
+            ids_by_key = self._ids_by_directory
+
+        path_ids = set()
+        for key, ids in ids_by_key.items():
+            if pattern.kind == "directory_name":
+                key = key.rsplit("/", 1)[-1]
+            if regex.match(key):
+                path_ids.update(ids)
+        return [self._paths[path_id] for path_id in sorted(path_ids)]
@@ -0,0 +1,220 @@
+"""Apply a list of operations to a rebase todo, without the user interface
+
+A plan is a JSON file containing a list of operations, which are applied in order. Each
+operation refers to rebase items by their index in the rebase todo at that point, or by a
+prefix of their commit hash, of at least 4 characters (if the commit has been copied, the
+first copy is used). e.g.
+
+    [
+        {"op": "set_action", "items": ["1a2b3c"], "action": "fixup"},
+        {"op": "drop_files", "items": [2], "files": ["README.md"]},
+        {"op": "copy", "item": 3},
+        {"op": "move", "items": [4, 5], "to": 0},
+        {"op": "distribute", "sources": [6], "targets": [1, 2]},
+        {"op": "reword", "item": "4d5e6f", "message": "New subject\n\nNew body"},
+        {"op": "autosquash"}
+    ]
+
+Reworded items are given their new message while the rebase runs, so git doesn't stop.
+
+This module doesn't import Textual, so plans can be applied quickly to lots of branches.
+"""
+
+import json
+import re
+from typing import Any, Dict, List
+
+from splitsquash.rebase_todo.autosquash import autosquash
+from splitsquash.rebase_todo.rebase_todo_interactions import (
+    RebaseItemDistributor,
+    RebaseItemMover,
+)
+from splitsquash.rebase_todo.rebase_todo_state import RebaseTodoStateAndCursor
+from splitsquash.types import REBASE_ACTIONS
+
+PlanOperation = Dict[str, Any]
+
+# Like git, commit hashes can be abbreviated to 4 characters at the shortest.
+MIN_HASH_PREFIX_LENGTH = 4
+HASH_PREFIX_PATTERN = re.compile(f"[0-9a-fA-F]{{{MIN_HASH_PREFIX_LENGTH},}}")
+
+
+def load_plan(path: str) -> List[PlanOperation]:
+    """Load the operations from a plan file
+
+    The file can contain a list of operations, or an object with an "operations" list.
+    """
+    with open(path, "r") as f:
+        plan = json.load(f)
+
+    if isinstance(plan, dict):
+        plan = plan.get("operations")
+    if not isinstance(plan, list):
+        raise ValueError(f"{path} doesn't contain a list of operations.")
+
+    return plan
+
+
+def apply_plan(todo_state: RebaseTodoStateAndCursor, operations: List[PlanOperation]):
+    """Apply each operation to the rebase todo, in order
+
+    Each operation is a separate step in the undo history. A ValueError is raised if an
+    operation is invalid, and the operations after it aren't applied.
+    """
+    for i, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f"Operation {i} isn't an object: {operation!r}.")
+
+        op = operation.get("op")
+        apply_operation = _OPERATIONS.get(op)
+        if apply_operation is None:
+            raise ValueError(f"Operation {i} has an unknown op: {op!r}.")
+
+        try:
+            apply_operation(todo_state, operation)
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Operation {i} ({op}) failed: {e}") from e
+
+
+def _get_index(todo_state: RebaseTodoStateAndCursor, item_ref: int | str) -> int:
+    """Get the index of an item from its index or commit hash prefix"""
+    num_items = todo_state.get_current_num_items()
+
+    # bool is a subclass of int, but true and false aren't item indices
+    if isinstance(item_ref, bool) or not isinstance(item_ref, (int, str)):
+        raise ValueError(f"Items must be indices or commit hashes, not {item_ref!r}.")
+
+    if isinstance(item_ref, int):
+        if not 0 <= item_ref < num_items:
+            raise ValueError(f"There is no item at index {item_ref}.")
+        return item_ref
+
+    if not HASH_PREFIX_PATTERN.fullmatch(item_ref):
+        raise ValueError(
+            f"{item_ref!r} isn't a commit hash prefix of at least "
+            f"{MIN_HASH_PREFIX_LENGTH} hex digits."
+        )
+
+    # Copies of the same commit all match, so the first of them is used. Prefixes of
+    # different commits are ambiguous.
+    prefix = item_ref.lower()
+    items = todo_state.get_current_items(copy=False)
+    index = None
+    for i, item in enumerate(items):
+        if not item.commit.hexsha.startswith(prefix):
+            continue
+        elif index is None:
+            index = i
+        elif item.commit.hexsha != items[index].commit.hexsha:
+            raise ValueError(f"{item_ref!r} matches more than one commit.")
+
+    if index is None:
+        raise ValueError(f"There is no item for commit {item_ref!r}.")
+    return index
+
+
+def _select(todo_state: RebaseTodoStateAndCursor, item_refs: List[int | str]):
+    if not isinstance(item_refs, list):
+        raise ValueError(f"Items must be given as a list, not {item_refs!r}.")
+
+    indices = set(_get_index(todo_state, item_ref) for item_ref in item_refs)
+    if len(indices) == 0:
+        raise ValueError("No items were given.")
+
+    todo_state.set_selected(
+        [i in indices for i in range(todo_state.get_current_num_items())]
+    )
+
+
+def _set_action(todo_state: RebaseTodoStateAndCursor, operation: PlanOperation):
+    action = operation["action"]
+    if action not in REBASE_ACTIONS:
+        raise ValueError(f"Unknown action {action!r}.")
+
+    _select(todo_state, operation["items"])
+    rebase_items = todo_state.get_current_items()
+    for i in todo_state.get_selected_indices():
+        rebase_items[i].action = action
+        rebase_items[i].fixup_option = None
+    todo_state.modify_items(rebase_items, clear_selection=True)
+
+
+def _drop_files(todo_state: RebaseTodoStateAndCursor, operation: PlanOperation):
+    files = operation["files"]
+    if not isinstance(files, list) or not all(isinstance(f, str) for f in files):
+        raise ValueError(f"files must be a list of paths, not {files!r}.")
+    files = set(files)
+
+    _select(todo_state, operation["items"])
+    rebase_items = todo_state.get_current_items()
+    for i in todo_state.get_selected_indices():
+        for path, file_change in rebase_items[i].file_changes.items():
+            if path in files:
+                file_change.included = False
+    todo_state.modify_items(rebase_items, clear_selection=True)
+
+
+def _copy(todo_state: RebaseTodoStateAndCursor, operation: PlanOperation):
+    # Like copying in the editor, the copy goes just before the original, and the commands
+    # after the item stay with the original.
+    index = _get_index(todo_state, operation["item"])
+    new_item = todo_state.get_current_items(copy=False)[index].copy()
+    new_item.following_commands = []
+    todo_state.insert_item(new_item, index)
+    todo_state.select_none()
+
+
+def _reword(todo_state: RebaseTodoStateAndCursor, operation: PlanOperation):
+    message = operation["message"]
+    if not isinstance(message, str) or message.strip() == "":
+        raise ValueError("message must be a non-empty string.")
+
+    index = _get_index(todo_state, operation["item"])
+    rebase_items = todo_state.get_current_items()
+    rebase_items[index].new_message = message.rstrip() + "\n"
+    if rebase_items[index].action == "pick":
+        rebase_items[index].action = "reword"
+    todo_state.modify_items(rebase_items, clear_selection=True)
+
+
+def _move(todo_state: RebaseTodoStateAndCursor, operation: PlanOperation):
+    to = operation["to"]
+    if not isinstance(to, int):
+        raise ValueError(f"to must be an index, not {to!r}.")
+
+    _select(todo_state, operation["items"])
+    mover = RebaseItemMover(todo_state)
+    mover.start_moving()
+    mover.move_to(to)
+    mover.stop_moving()
+
+
+def _distribute(todo_state: RebaseTodoStateAndCursor, operation: PlanOperation):
+    distributor = RebaseItemDistributor(todo_state)
+
+    _select(todo_state, operation["sources"])
+    distributor.pick_sources()
+    _select(todo_state, operation["targets"])
+    distributor.pick_targets()
+
+    error = distributor.distribute()
+    if error:
+        raise ValueError(error)
+
+
+def _autosquash(todo_state: RebaseTodoStateAndCursor, operation: PlanOperation):
+    rebase_items, num_changed = autosquash(todo_state.get_current_items())
+    # Nothing is recorded in the undo history if the todo is already arranged.
+    if num_changed > 0:
+        todo_state.modify_items(tuple(rebase_items), clear_selection=True)
+
+
+_OPERATIONS = {
+    "set_action": _set_action,
+    "drop_files": _drop_files,
+    "copy": _copy,
+    "move": _move,
+    "reword": _reword,
+    "distribute": _distribute,
+    "autosquash": _autosquash,
+}
@@ -0,0 +1,202 @@
+"""Run git rebases asynchronously, so several can be driven at once"""
+
+import asyncio
+import os
+import re
+import shlex
+import tempfile
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from splitsquash.tracing import span
+
+# git prints this before each todo command
+PROGRESS_PATTERN = re.compile(r"Rebasing \((\d+)/(\d+)\)")
+
+
+@dataclass
+class RebaseProgress:
+    """How far a rebase has got: step is the number of todo commands started so far"""
+
+    step: int
+    total: int
+
+
+@dataclass
+class RebaseResult:
+    """The result of running a rebase
+
+    :param stopped: True if the rebase is still in progress, because it stopped at an edit,
+                    a break, a failed exec or a conflict. Check progress to see where.
+    """
+
+    returncode: int
+    stopped: bool
+    progress: Optional[RebaseProgress] = None
+    # git's output (stdout and stderr)
+    output_lines: List[str] = field(default_factory=list)
+
+    @property
+    def success(self):
+        return self.returncode == 0 and not self.stopped
+
+    @property
+    def output(self):
+        return "\n".join(self.output_lines)
+
+
+async def _git_output(args: List[str], cwd: str) -> str:
+    with span(f"git {args[0]}", "git", command=" ".join(args)) as span_args:
+        process = await asyncio.create_subprocess_exec(
+            "git",
+            *args,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await process.communicate()
+        span_args["bytes"] = len(stdout)
+    if process.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed.")
+    return stdout.decode().strip()
+
+
+def read_rebase_progress(git_dir: str) -> Optional[RebaseProgress]:
+    """Read the progress of the rebase in progress, or return None if there isn't one"""
+    rebase_dir = os.path.join(git_dir, "rebase-merge")
+    try:
+        with open(os.path.join(rebase_dir, "msgnum"), "r") as f:
+            step = int(f.read().strip())
+        with open(os.path.join(rebase_dir, "end"), "r") as f:
+            total = int(f.read().strip())
+    except (OSError, ValueError):
+        # The rebase hasn't started, has finished, or git is writing these files.
+        return None
+
+    return RebaseProgress(step, total)
+
+
+async def run_rebase(
+    rebase_todo: str,
+    rebase_args: Optional[List[str]] = None,
+    cwd: str = ".",
+    on_progress: Optional[Callable[[RebaseProgress], None]] = None,
+    on_output: Optional[Callable[[str], None]] = None,
+    env: Optional[dict] = None,
+    poll_interval: float = 0.05,
+) -> RebaseResult:
+    """Run `git rebase -i` with a rebase todo
+
+    The todo is written to a temporary file, which a sequence editor command copies over git's
+    todo, so the todo can be any size and contain any characters.
+
+    Progress is read from the "Rebasing (N/M)" messages in git's output, and from the
+    rebase-merge/msgnum and end files, in case git doesn't print them.
+
+    If the task running this is cancelled, git is stopped and the rebase is aborted.
+
+    :param rebase_args: Passed to git rebase, e.g. the upstream.
+    :param on_progress: Called every time git starts a new todo command.
+    :param on_output: Called with each line git outputs, as it's output.
+    :param env: The environment for git. Defaults to the current environment.
+    :param poll_interval: How often to check the progress of the rebase, in seconds.
+    """
+    if rebase_args is None:
+        rebase_args = []
+
+    git_dir = os.path.join(cwd, await _git_output(["rev-parse", "--git-dir"], cwd))
+
+    with tempfile.NamedTemporaryFile(
+        "w", prefix="splitsquash-todo-", suffix=".txt", delete=False
+    ) as f:
+        f.write(rebase_todo)
+        todo_file = f.name
+
+    env = dict(os.environ if env is None else env)
+    # git runs the editor as `$GIT_SEQUENCE_EDITOR <todo file>`.
+    env["GIT_SEQUENCE_EDITOR"] = f"cp {shlex.quote(todo_file)}"
+
+    output_lines: List[str] = []
+    progress: Optional[RebaseProgress] = None
+    process = None
+    with span("git rebase", "git", args=" ".join(rebase_args), cwd=cwd):
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "git",
+                "rebase",
+                "-i",
+                *rebase_args,
+                cwd=cwd,
+                env=env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+
+            def update_progress(new_progress: Optional[RebaseProgress]):
+                nonlocal progress
+                if new_progress is None or new_progress == progress:
+                    return
+                if progress is not None and new_progress.step < progress.step:
+                    # The files were read before the output caught up.
+                    return
+
+                progress = new_progress
+                if on_progress is not None:
+                    on_progress(progress)
+
+            async def read_output():
+                async for line in process.stdout:
+                    line = line.decode(errors="replace").rstrip("\n")
+                    output_lines.append(line)
+                    if on_output is not None:
+                        on_output(line)
+
+                    for match in PROGRESS_PATTERN.finditer(line):
+                        update_progress(
+                            RebaseProgress(int(match.group(1)), int(match.group(2)))
+                        )
+
+            async def poll_progress():
+                while True:
+                    update_progress(read_rebase_progress(git_dir))
+                    await asyncio.sleep(poll_interval)
+
+            poll_task = asyncio.create_task(poll_progress())
+            try:
+                await read_output()
+                returncode = await process.wait()
+            finally:
+                poll_task.cancel()
+        except asyncio.CancelledError:
+            if process is not None and process.returncode is None:
+                process.terminate()
+                await process.wait()
+            await _abort_rebase(cwd)
+            raise
+        finally:
+            os.remove(todo_file)
+
+    # If the rebase stopped part way through, the rebase directory is still there.
+    final_progress = read_rebase_progress(git_dir)
+    stopped = final_progress is not None
+    if final_progress is not None:
+        progress = final_progress
+
+    return RebaseResult(
+        returncode=returncode,
+        stopped=stopped,
+        progress=progress,
+        output_lines=output_lines,
+    )
+
+
+async def _abort_rebase(cwd: str):
+    process = await asyncio.create_subprocess_exec(
+        "git",
+        "rebase",
+        "--abort",
+        cwd=cwd,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    await process.wait()
@@ -0,0 +1,134 @@
+"""Squash fixup!, squash! and amend! commits into their targets, like git rebase --autosquash
+
+A commit whose subject is "fixup! <subject>" belongs after the earlier commit with that
+subject, or whose hash starts with <subject>. Targets are looked up in hash indices built in
+one pass over the rebase items, so the whole todo is rearranged in linear time.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from splitsquash.types import RebaseItem
+
+# the prefix of each kind of autosquash commit, and the action and fixup option it gets
+AUTOSQUASH_PREFIXES = {
+    "fixup! ": ("fixup", None),
+    "squash! ": ("squash", None),
+    "amend! ": ("fixup", "-C"),
+}
+
+# Shorter prefixes of commit hashes aren't indexed, as they'd match lots of commits.
+MIN_SHA_PREFIX_LENGTH = 4
+
+
+def _get_subject(item: RebaseItem) -> str:
+    return item.commit.message.split("\n", 1)[0].strip()
+
+
+def _strip_autosquash_prefix(subject: str) -> Optional[str]:
+    """Remove the fixup!, squash! or amend! prefix, or return None if there isn't one"""
+    for prefix in AUTOSQUASH_PREFIXES:
+        if subject.startswith(prefix):
+            return subject[len(prefix) :].lstrip()
+    return None
+
+
+def get_autosquash_action(item: RebaseItem) -> Optional[Tuple[str, Optional[str]]]:
+    """Get the action and fixup option for an autosquash item, or None if it isn't one"""
+    subject = _get_subject(item)
+    for prefix, action in AUTOSQUASH_PREFIXES.items():
+        if subject.startswith(prefix):
+            return action
+    return None
+
+
+class AutosquashIndex:
+    """Looks up the item that an autosquash subject refers to, in constant time
+
+    Items are indexed by their subject, and by every prefix of their commit hash. When
+    several items match, the first one added is used, like git.
+    """
+
+    def __init__(self):
+        self._indices_by_subject: Dict[str, int] = {}
+        self._indices_by_sha_prefix: Dict[str, int] = {}
+
+    def add(self, index: int, item: RebaseItem):
+        self._indices_by_subject.setdefault(_get_subject(item), index)
+
+        sha = item.commit.hexsha
+        for length in range(MIN_SHA_PREFIX_LENGTH, len(sha) + 1):
+            self._indices_by_sha_prefix.setdefault(sha[:length], index)
+
+    def find(self, subject: str) -> Optional[int]:
+        """Find the item an autosquash item's subject refers to
+
+        The subject is matched without its prefix, then without any more prefixes, so
+        "fixup! fixup! a" matches "fixup! a" if it exists, or "a" otherwise.
+        """
+        rest = _strip_autosquash_prefix(subject)
+        while rest is not None:
+            index = self._indices_by_subject.get(rest)
+            if index is None and " " not in rest:
+                index = self._indices_by_sha_prefix.get(rest.lower())
+            if index is not None:
+                return index
+            rest = _strip_autosquash_prefix(rest)
+        return None
+
+
+def find_autosquash_targets(rebase_items: List[RebaseItem]) -> Dict[int, int]:
+    """Find the item each autosquash item should be squashed into
+
+    Only items before an autosquash item can be its target, like git. If the target is
+    itself an autosquash item, its target is used instead, so a chain of fixups all end up
+    after the same item.
+
+    :return: The index of the target of each autosquash item that has one, in order.
+    """
+    index = AutosquashIndex()
+    targets: Dict[int, int] = {}
+    for i, item in enumerate(rebase_items):
+        if item.action != "drop" and get_autosquash_action(item) is not None:
+            target = index.find(_get_subject(item))
+            if target is not None:
+                targets[i] = targets.get(target, target)
+        index.add(i, item)
+    return targets
+
+
+def autosquash(rebase_items: List[RebaseItem]) -> Tuple[List[RebaseItem], int]:
+    """Move every autosquash item after its target, and set its action
+
+    The items are modified, so pass copies. Autosquash items for the same target keep their
+    order.
+
+    :return: The rearranged items, and the number of autosquash items that were moved or
+             had their action changed. If this is 0, the items are the same as before.
+    """
+    targets = find_autosquash_targets(rebase_items)
+
+    items_by_target: Dict[int, List[int]] = {}
+    for i, target in targets.items():
+        items_by_target.setdefault(target, []).append(i)
+
+    result = []
+    num_changed = 0
+    for i, item in enumerate(rebase_items):
+        if i in targets:
+            continue
+        result.append(item)
+
+        for j in items_by_target.get(i, []):
+            autosquash_item = rebase_items[j]
+            action, fixup_option = get_autosquash_action(autosquash_item)
+            if (
+                j != len(result)
+                or autosquash_item.action != action
+                or autosquash_item.fixup_option != fixup_option
+            ):
+                num_changed += 1
+            autosquash_item.action = action
+            autosquash_item.fixup_option = fixup_option
+            result.append(autosquash_item)
+
+    return result, num_changed
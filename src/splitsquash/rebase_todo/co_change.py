@@ -0,0 +1,97 @@
+from typing import Dict, List, Optional, Tuple, Iterator
+
+from splitsquash.rebase_todo.renames import RenameIndex
+from splitsquash.types import RebaseItem
+
+
+def get_incidence_bitsets(
+    rebase_items: Tuple[RebaseItem, ...], rename_index: Optional[RenameIndex] = None
+) -> Dict[str, int]:
+    """Get the column of the item by file incidence matrix for each file, as a bitset
+
+    Bit i of a file's bitset is set if rebase item i modifies the file. If a rename index is
+    given, files are keyed by their canonical path, so each renamed file has one bitset.
+    """
+    bitsets: Dict[str, int] = {}
+    for i, item in enumerate(rebase_items):
+        bit = 1 << i
+        for path in item.file_changes.keys():
+            if rename_index is not None:
+                path = rename_index.get_canonical_path(path)
+            bitsets[path] = bitsets.get(path, 0) | bit
+    return bitsets
+
+
+def _iter_bits(bitset: int) -> Iterator[int]:
+    """Yield the index of each set bit, from lowest to highest"""
+    while bitset:
+        yield (bitset & -bitset).bit_length() - 1
+        bitset &= bitset - 1
+
+
+def _similarity(a: int, b: int) -> float:
+    """Jaccard similarity of two bitsets"""
+    return (a & b).bit_count() / (a | b).bit_count()
+
+
+def order_files_by_co_change(
+    rebase_items: Tuple[RebaseItem, ...], rename_index: Optional[RenameIndex] = None
+) -> List[str]:
+    """Order the files modified by some rebase items, so files that change together are adjacent
+
+    Files modified by exactly the same items are grouped together. Then the groups are put
+    in order by starting with the earliest group, and repeatedly appending the most similar
+    group to the last one. Only groups that share at least one item with the last group are
+    compared, so this is fast even with many files. When no group shares an item, the next
+    earliest group is used.
+
+    The order only depends on the items and paths, so it is the same every time. If a rename
+    index is given, renamed files are given once, by their canonical path.
+    """
+    bitsets = get_incidence_bitsets(rebase_items, rename_index)
+
+    # group files with identical bitsets
+    files_by_bitset: Dict[int, List[str]] = {}
+    for path in sorted(bitsets.keys()):
+        files_by_bitset.setdefault(bitsets[path], []).append(path)
+
+    # Earliest first: sort by the first item that modifies the files, then by path.
+    def earliest_first(bitset: int):
+        return (bitset & -bitset).bit_length(), files_by_bitset[bitset][0]
+
+    remaining = sorted(files_by_bitset.keys(), key=earliest_first)
+
+    # for each item, the groups of files it modifies
+    bitsets_by_item: List[List[int]] = [[] for _ in rebase_items]
+    for bitset in remaining:
+        for i in _iter_bits(bitset):
+            bitsets_by_item[i].append(bitset)
+
+    ordered_bitsets: List[int] = []
+    placed = set()
+    next_remaining = 0
+    current = None
+    while len(placed) < len(remaining):
+        # find the most similar unplaced group to the current one
+        best = None
+        if current is not None:
+            best_key = None
+            for i in _iter_bits(current):
+                for candidate in bitsets_by_item[i]:
+                    if candidate in placed:
+                        continue
+                    key = (-_similarity(current, candidate), earliest_first(candidate))
+                    if best_key is None or key < best_key:
+                        best, best_key = candidate, key
+
+        if best is None:
+            # nothing similar, so start again from the earliest unplaced group
+            while remaining[next_remaining] in placed:
+                next_remaining += 1
+            best = remaining[next_remaining]
+
+        ordered_bitsets.append(best)
+        placed.add(best)
+        current = best
+
+    return [path for bitset in ordered_bitsets for path in files_by_bitset[bitset]]
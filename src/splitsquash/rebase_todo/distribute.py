@@ -1,11 +1,19 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
+from splitsquash.rebase_todo.renames import RenameIndex
 from splitsquash.types import RebaseItem
 
 
-def get_included_file_paths(rebase_item: RebaseItem):
+def get_included_file_paths(
+    rebase_item: RebaseItem, rename_index: Optional[RenameIndex] = None
+):
+    """Get the paths of the included files, or their canonical paths if a rename index is given"""
+    if rename_index is None:
+        rename_index = RenameIndex()
     return [
-        path for path, change in rebase_item.file_changes.items() if change.included
+        rename_index.get_canonical_path(path)
+        for path, change in rebase_item.file_changes.items()
+        if change.included
     ]
 
 
@@ -13,8 +21,15 @@ def distribute_changes(
     source_indices: List[int],
     target_indices: List[int],
     rebase_items: Tuple[RebaseItem, ...],
+    rename_index: Optional[RenameIndex] = None,
 ) -> Tuple[Tuple[RebaseItem, ...] | None, str | None]:
-    """Split the changes from some source commits, and squash them into some target commits"""
+    """Split the changes from some source commits, and squash them into some target commits
+
+    If a rename index is given, files are matched by their canonical path, so a change to a
+    file under its old path is squashed into a target that changes it under its new path.
+    """
+    if rename_index is None:
+        rename_index = RenameIndex()
 
     source_indices = list(sorted(source_indices))
     target_indices = list(sorted(target_indices))
@@ -28,13 +43,17 @@ def distribute_changes(
     # Check for any file changes with ambiguous target commits.
     all_source_files = set(
         sum(
-            [get_included_file_paths(rebase_items[i]) for i in source_indices], start=[]
+            [
+                get_included_file_paths(rebase_items[i], rename_index)
+                for i in source_indices
+            ],
+            start=[],
         )
     )
     target_files_seen = set()
     ambiguous_files = set()
     for target_index in target_indices:
-        target_files = get_included_file_paths(rebase_items[target_index])
+        target_files = get_included_file_paths(rebase_items[target_index], rename_index)
         common_files = all_source_files.intersection(target_files)
         ambiguous_files.update(target_files_seen.intersection(common_files))
         target_files_seen.update(common_files)
@@ -73,7 +92,7 @@ def distribute_changes(
             result.append(rebase_items[i].copy())
             i += 1
 
-        target_file_paths = set(get_included_file_paths(target_item))
+        target_file_paths = set(get_included_file_paths(target_item, rename_index))
 
         # Squash source file changes into this target commit (after the items we just skipped over).
         for source_index in source_indices:
@@ -82,7 +101,7 @@ def distribute_changes(
 
             # get file changes to squash
             source_item = rebase_items[source_index]
-            source_file_paths = set(get_included_file_paths(source_item))
+            source_file_paths = set(get_included_file_paths(source_item, rename_index))
             paths_to_squash = target_file_paths.intersection(source_file_paths)
             if len(paths_to_squash) == 0:
                 continue
@@ -90,8 +109,12 @@ def distribute_changes(
             # add fixup to squash changes into target commit
             fixup: RebaseItem = source_item.copy()
             fixup.action = "squash"
+            fixup.fixup_option = None
+            fixup.following_commands = []
             for file_path, file_change in fixup.file_changes.items():
-                file_change.included = file_path in paths_to_squash
+                file_change.included = (
+                    rename_index.get_canonical_path(file_path) in paths_to_squash
+                )
             result.append(fixup)
 
     return tuple(result), None
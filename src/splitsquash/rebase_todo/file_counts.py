@@ -0,0 +1,96 @@
+from typing import Dict, KeysView, List, Tuple
+
+from splitsquash.types import RebaseItem
+
+
+class FileCounts:
+    """Counts how many rebase items modify each file
+
+    Two counts are kept for each path: the number of items that modify it, and the number
+    of items that modify it with the file included. A path is removed when its count drops
+    to zero, so the set of files is always available without looking at the items.
+
+    The counts are updated with the differences between two lists of rebase items, so only
+    the items that were added, removed or toggled are looked at in detail.
+    """
+
+    def __init__(self, rebase_items: Tuple[RebaseItem, ...] = ()):
+        self._counts: Dict[str, int] = {}
+        self._included_counts: Dict[str, int] = {}
+
+        for item in rebase_items:
+            self._add_item(item)
+
+    def get_files(self, include_files_excluded_by_user: bool = True) -> KeysView[str]:
+        """Get the files modified by at least one item
+
+        :param include_files_excluded_by_user: If False, only files that are included in at
+                                               least one item are returned.
+        """
+        if include_files_excluded_by_user:
+            return self._counts.keys()
+        else:
+            return self._included_counts.keys()
+
+    def get_count(self, path: str, include_files_excluded_by_user: bool = True) -> int:
+        """Get the number of items that modify a file"""
+        if include_files_excluded_by_user:
+            return self._counts.get(path, 0)
+        else:
+            return self._included_counts.get(path, 0)
+
+    def update(
+        self,
+        old_items: Tuple[RebaseItem, ...],
+        new_items: Tuple[RebaseItem, ...],
+    ):
+        """Update the counts after old_items have been replaced with new_items
+
+        Items for the same commit are paired up, and only their included flags are compared.
+        Unpaired items are added or removed.
+        """
+        old_items_by_sha: Dict[str, List[RebaseItem]] = {}
+        for item in old_items:
+            old_items_by_sha.setdefault(item.commit.hexsha, []).append(item)
+
+        for new_item in new_items:
+            matching_old_items = old_items_by_sha.get(new_item.commit.hexsha)
+            if matching_old_items:
+                self._update_item(matching_old_items.pop(), new_item)
+            else:
+                self._add_item(new_item)
+
+        for unmatched_old_items in old_items_by_sha.values():
+            for old_item in unmatched_old_items:
+                self._remove_item(old_item)
+
+    def _add_item(self, item: RebaseItem):
+        for path, file_change in item.file_changes.items():
+            self._increment(self._counts, path, 1)
+            if file_change.included:
+                self._increment(self._included_counts, path, 1)
+
+    def _remove_item(self, item: RebaseItem):
+        for path, file_change in item.file_changes.items():
+            self._increment(self._counts, path, -1)
+            if file_change.included:
+                self._increment(self._included_counts, path, -1)
+
+    def _update_item(self, old_item: RebaseItem, new_item: RebaseItem):
+        if old_item is new_item:
+            return
+
+        old_file_changes = old_item.file_changes
+        for path, file_change in new_item.file_changes.items():
+            if file_change.included != old_file_changes[path].included:
+                self._increment(
+                    self._included_counts, path, 1 if file_change.included else -1
+                )
+
+    @staticmethod
+    def _increment(counts: Dict[str, int], path: str, change: int):
+        count = counts.get(path, 0) + change
+        if count == 0:
+            del counts[path]
+        else:
+            counts[path] = count
@@ -2,6 +2,7 @@
 
 from typing import List, Optional
 
+from splitsquash.rebase_todo.autosquash import find_autosquash_targets
 from splitsquash.rebase_todo.distribute import distribute_changes
 from splitsquash.rebase_todo.rebase_todo_state import RebaseTodoStateAndCursor
 
@@ -12,6 +13,9 @@ class RebaseItemMover:
     This is a stateful interaction. The user can select some items, press
     a button to begin moving them, move them up or down, then press a
     button to confirm the change.
+
+    All the moves made between start_moving() and stop_moving() are recorded
+    as a single step in the undo history.
     """
 
     def __init__(self, rebase_todo_state: RebaseTodoStateAndCursor):
@@ -49,46 +53,116 @@ class RebaseItemMover:
         self._first_moving_index = dest_index
         self._last_moving_index = dest_index + len(items_to_move) - 1
 
-    def move_up(self):
-        """Move block of rebase items up
+    def move_up(self, num_items: int = 1):
+        """Move block of rebase items up, past this many items
 
         Must have called start_moving first.
         """
         if not self._moving:
             raise RuntimeError
 
-        rebase_items = list(self._todo_state.get_current_items())
-
         if self._first_moving_index == 0:
             return
 
+        if num_items > 1:
+            self.move_to(self._first_moving_index - num_items)
+            return
+
+        # The items are only re-ordered, not modified, so they don't need to be copied.
+        rebase_items = list(self._todo_state.get_current_items(copy=False))
+
         item_before_moving_block = rebase_items.pop(self._first_moving_index - 1)
         rebase_items.insert(self._last_moving_index, item_before_moving_block)
-        self._todo_state.modify_items(tuple(rebase_items))
+        self._todo_state.replace_items(tuple(rebase_items))
 
         self._first_moving_index -= 1
         self._last_moving_index -= 1
 
-    def move_down(self):
-        """Move block of rebase items down
+    def move_down(self, num_items: int = 1):
+        """Move block of rebase items down, past this many items
 
         Must have called start_moving first.
         """
         if not self._moving:
             raise RuntimeError
 
-        rebase_items = list(self._todo_state.get_current_items())
+        if self._last_moving_index == self._todo_state.get_current_num_items() - 1:
+            return
 
-        if self._last_moving_index == len(rebase_items) - 1:
+        if num_items > 1:
+            self.move_to(self._first_moving_index + num_items)
             return
 
+        # The items are only re-ordered, not modified, so they don't need to be copied.
+        rebase_items = list(self._todo_state.get_current_items(copy=False))
+
         item_after_moving_block = rebase_items.pop(self._last_moving_index + 1)
         rebase_items.insert(self._first_moving_index, item_after_moving_block)
-        self._todo_state.modify_items(tuple(rebase_items))
+        self._todo_state.replace_items(tuple(rebase_items))
 
         self._first_moving_index += 1
         self._last_moving_index += 1
 
+    def move_to(self, index: int):
+        """Move block of rebase items, so the first item in the block is at this index
+
+        The index is clamped, so the block stays within the list of rebase items. Must have
+        called start_moving first.
+        """
+        if not self._moving:
+            raise RuntimeError
+
+        rebase_items = self._todo_state.get_current_items(copy=False)
+        block_length = self._last_moving_index - self._first_moving_index + 1
+        index = max(0, min(len(rebase_items) - block_length, index))
+        if index == self._first_moving_index:
+            return
+
+        # Take the block out, and splice it back in at the new index.
+        block = rebase_items[self._first_moving_index : self._last_moving_index + 1]
+        other_items = (
+            rebase_items[: self._first_moving_index]
+            + rebase_items[self._last_moving_index + 1 :]
+        )
+        self._todo_state.replace_items(
+            other_items[:index] + block + other_items[index:]
+        )
+
+        self._first_moving_index = index
+        self._last_moving_index = index + block_length - 1
+
+    def move_to_top(self):
+        """Move block of rebase items to the top
+
+        Must have called start_moving first.
+        """
+        self.move_to(0)
+
+    def move_to_bottom(self):
+        """Move block of rebase items to the bottom
+
+        Must have called start_moving first.
+        """
+        self.move_to(self._todo_state.get_current_num_items())
+
+    def move_before(self, index: int):
+        """Move block of rebase items, so it is just before the item at this index
+
+        Nothing happens if the item at this index is in the block. Must have called
+        start_moving first.
+        """
+        if not self._moving:
+            raise RuntimeError
+
+        if self._first_moving_index <= index <= self._last_moving_index:
+            return
+        elif index > self._last_moving_index:
+            # The indices of the items after the block will go down when the block is removed.
+            block_length = self._last_moving_index - self._first_moving_index + 1
+            index -= block_length
+
+        self.move_to(index)
+
     def stop_moving(self):
         if not self._moving:
             raise RuntimeError
@@ -128,12 +202,29 @@ class RebaseItemDistributor:
 
         The selected items will also be de-selected. If no items were selected,
         False is returned, as you need at least one source commit to proceed.
+
+        If any of the sources are fixup!, squash! or amend! commits, their targets are
+        selected instead, as suggested targets.
         """
         self._source_indices = self._todo_state.get_selected_indices()
         if len(self._source_indices) == 0:
             return False
 
         self._todo_state.select_none()
+
+        targets = find_autosquash_targets(
+            self._todo_state.get_current_items(copy=False)
+        )
+        suggested_targets = set(
+            targets[i] for i in self._source_indices if i in targets
+        )
+        if len(suggested_targets) > 0:
+            self._todo_state.set_selected(
+                [
+                    i in suggested_targets
+                    for i in range(self._todo_state.get_current_num_items())
+                ]
+            )
         return True
 
     def pick_targets(self):
@@ -169,6 +260,7 @@ class RebaseItemDistributor:
             self._source_indices,
             self._target_indices,
             self._todo_state.get_current_items(),
+            self._todo_state.get_rename_index(),
         )
 
         self.reset()
@@ -1,15 +1,44 @@
-from typing import List, Tuple, Literal, Optional
+from typing import List, Tuple, Literal, Optional, Callable
 
+from splitsquash.rebase_todo.co_change import order_files_by_co_change
+from splitsquash.rebase_todo.file_counts import FileCounts
+from splitsquash.rebase_todo.renames import RenameIndex
+from splitsquash.rebase_todo.search import RebaseTodoSearchIndex
+from splitsquash.tracing import traced
 from splitsquash.types import RebaseItem
 
 
 class RebaseTodoState:
-    """Stores the state of the rebase todo, and tracks an undo history"""
+    """Stores the state of the rebase todo, and tracks an undo history
+
+    Several views can share one RebaseTodoState. They can register a listener with
+    add_listener() to be notified whenever the current items change.
+
+    The number of current items that modify each file is kept up to date as the items change,
+    so the files don't need to be collected from the items again.
+    """
 
     def __init__(self, rebase_items: List[RebaseItem]):
         self._history: List[Tuple[RebaseItem, ...]] = [tuple(rebase_items)]
         self._history_index = 0
 
+        self._file_counts = FileCounts(self._history[0])
+        self._original_file_counts: Optional[FileCounts] = None
+
+        self._listeners: List[Callable[[], None]] = []
+
+        self._search_index: Optional[RebaseTodoSearchIndex] = None
+        self._rename_index: Optional[RenameIndex] = None
+        self._files_by_co_change: Optional[List[str]] = None
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Call listener every time the current items change"""
+        self._listeners.append(listener)
+
+    def _notify_listeners(self):
+        for listener in self._listeners:
+            listener()
+
     def get_current_num_items(self):
         return len(self._history[self._history_index])
 
@@ -35,22 +64,95 @@ class RebaseTodoState:
         Some commits might have been dropped or modified. This function returns all the
         files from before any of these modifications.
         """
-        rebase_items = self.get_original_items()
-        self._visible_files: List[str | os.PathLike[str]] = sum(
-            [list(item.commit.stats.files.keys()) for item in rebase_items], start=[]
+        if self._original_file_counts is None:
+            self._original_file_counts = FileCounts(self._history[0])
+        return list(
+            self._original_file_counts.get_files(include_files_excluded_by_user)
         )
-        self._visible_files = list(set(self._visible_files))
 
+    def get_current_files(self, include_files_excluded_by_user: bool = True):
+        """Get the files modified by the current items
+
+        This returns a live view of the files, which changes when the items change.
+        """
+        return self._file_counts.get_files(include_files_excluded_by_user)
+
+    def get_current_file_count(
+        self, path: str, include_files_excluded_by_user: bool = True
+    ) -> int:
+        """Get the number of current items that modify a file"""
+        return self._file_counts.get_count(path, include_files_excluded_by_user)
+
+    def get_search_index(self) -> RebaseTodoSearchIndex:
+        """Get an index for searching the commits, which is built the first time it's needed"""
+        if self._search_index is None:
+            self._search_index = RebaseTodoSearchIndex(
+                self.get_original_items(copy=False)
+            )
+        return self._search_index
+
+    def get_rename_index(self) -> RenameIndex:
+        """Get the index of the renames in the original items, which is built the first time it's needed
+
+        Items are only ever copies of the original commits, so their renames never change.
+        """
+        if self._rename_index is None:
+            self._rename_index = RenameIndex.from_items(
+                self.get_original_items(copy=False)
+            )
+        return self._rename_index
+
+    def get_files_by_co_change(self) -> List[str]:
+        """Get all the files in the original items, ordered so files that change together are adjacent
+
+        Renamed files are given once, by their canonical path (see RenameIndex). The order is
+        computed the first time it's needed, then kept, so it doesn't change while the rebase
+        todo is being edited.
+        """
+        if self._files_by_co_change is None:
+            self._files_by_co_change = order_files_by_co_change(
+                self.get_original_items(copy=False), self.get_rename_index()
+            )
+        return self._files_by_co_change
+
+    @traced(
+        "RebaseTodoState.modify_items",
+        get_args=lambda self, rebase_items: {
+            "history_size": len(self._history),
+            "num_items": len(rebase_items),
+        },
+    )
     def modify_items(self, rebase_items: Tuple[RebaseItem, ...]):
         """Modify the rebase_items, while tracking the changes so this action can be undone"""
+        self._file_counts.update(self._history[self._history_index], rebase_items)
         self._history = self._history[: self._history_index + 1] + [rebase_items]
         self._history_index += 1
+        self._notify_listeners()
+
+    def replace_items(self, rebase_items: Tuple[RebaseItem, ...]):
+        """Replace the current rebase_items, without adding a step to the undo history
+
+        This can be used to combine several small changes into one undo step.
+        """
+        if self._history_index == 0:
+            raise RuntimeError("The original rebase items can't be replaced.")
+
+        self._file_counts.update(self._history[self._history_index], rebase_items)
+        self._history[self._history_index] = rebase_items
+        self._notify_listeners()
 
     def undo(self):
-        self._history_index = max(0, self._history_index - 1)
+        self._set_history_index(max(0, self._history_index - 1))
 
     def redo(self):
-        self._history_index = min(len(self._history) - 1, self._history_index + 1)
+        self._set_history_index(min(len(self._history) - 1, self._history_index + 1))
+
+    def _set_history_index(self, history_index: int):
+        self._file_counts.update(
+            self._history[self._history_index], self._history[history_index]
+        )
+        self._history_index = history_index
+        self._notify_listeners()
 
 
 class RebaseTodoStateAndCursor:
@@ -66,10 +168,27 @@ class RebaseTodoStateAndCursor:
         self._selected = [False] * self._state.get_current_num_items()
         self._cursor = 0
 
+        self._state.add_listener(self._on_state_changed)
+
     @property
     def cursor(self):
         return self._cursor
 
+    def add_listener(self, listener: Callable[[], None]):
+        """Call listener every time the current items change
+
+        This includes changes made through other RebaseTodoStateAndCursors that share
+        the same RebaseTodoState.
+        """
+        self._state.add_listener(listener)
+
+    def _on_state_changed(self):
+        # The items may have been changed through another RebaseTodoStateAndCursor, so the
+        # selection and cursor might not match the new items.
+        if len(self._selected) != self._state.get_current_num_items():
+            self.select_none()
+        self._clamp_cursor()
+
     def get_active_item(self):
         """Get the rebase item currently under the cursor"""
         return self._state.get_current_items()[self._cursor]
@@ -138,6 +257,21 @@ class RebaseTodoStateAndCursor:
     def get_original_items(self, copy: bool = True):
         return self._state.get_original_items(copy=copy)
 
+    def get_original_files(self, include_files_excluded_by_user: bool = True):
+        return self._state.get_original_files(include_files_excluded_by_user)
+
+    def get_current_files(self, include_files_excluded_by_user: bool = True):
+        return self._state.get_current_files(include_files_excluded_by_user)
+
+    def get_search_index(self):
+        return self._state.get_search_index()
+
+    def get_rename_index(self):
+        return self._state.get_rename_index()
+
+    def get_files_by_co_change(self):
+        return self._state.get_files_by_co_change()
+
     def modify_items(
         self, rebase_items: Tuple[RebaseItem, ...], clear_selection: bool = False
     ):
@@ -172,6 +306,17 @@ class RebaseTodoStateAndCursor:
         self._state.modify_items(rebase_items)
         self._clamp_cursor()
 
+    def replace_items(self, rebase_items: Tuple[RebaseItem, ...]):
+        """Replace the current rebase items, without adding a step to the undo history
+
+        The number of rebase items must not change.
+        """
+        if len(rebase_items) != self._state.get_current_num_items():
+            raise RuntimeError("New rebase_items must have same length as original.")
+
+        self._state.replace_items(rebase_items)
+        self._clamp_cursor()
+
     def insert_item(self, rebase_item: RebaseItem, index: Optional[int] = None):
         if index is None:
             index = self._cursor + 1
@@ -0,0 +1,99 @@
+"""Follow files across the renames in a rebase todo
+
+When a commit renames a file, the commits before it change the file under its old path, and
+the commits after it use the new path. The rename index maps every path to one canonical
+path for the file, so the changes can be treated as changes to the same file.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, TypeVar
+
+from splitsquash.types import RebaseItem
+
+T = TypeVar("T")
+
+
+def get_renames(rebase_items: Iterable[RebaseItem]) -> Iterator[Tuple[str, str]]:
+    """Yield the old and new path of each rename in the items, in order"""
+    for item in rebase_items:
+        for path, file_stats in item.stats.files.items():
+            old_path = file_stats.get("old_path")
+            if old_path is not None:
+                yield old_path, path
+
+
+class RenameIndex:
+    """Maps each path in a rebase todo to the canonical path of its file
+
+    Paths joined by renames belong to the same file. The canonical path is the new path of
+    the last rename of the file, in the order of the todo, which is usually the path the
+    file ends up with. A path that is reused by an unrelated file after a rename is treated
+    as the same file.
+
+    The index is built with a union-find over the renames, so it takes close to linear time
+    in the number of renames. Paths that were never renamed aren't stored.
+    """
+
+    def __init__(self, renames: Iterable[Tuple[str, str]] = ()):
+        # union-find parent of each renamed path
+        self._parents: Dict[str, str] = {}
+        # the canonical path of each root
+        self._canonical_paths: Dict[str, str] = {}
+        # the paths of each file, keyed by its canonical path
+        self._paths: Dict[str, List[str]] = {}
+
+        for old_path, new_path in renames:
+            self._add_rename(old_path, new_path)
+
+        for path in self._parents:
+            self._paths.setdefault(self.get_canonical_path(path), []).append(path)
+
+    @classmethod
+    def from_items(cls, rebase_items: Iterable[RebaseItem]) -> "RenameIndex":
+        return cls(get_renames(rebase_items))
+
+    def _find_root(self, path: str) -> str:
+        root = path
+        while self._parents[root] != root:
+            root = self._parents[root]
+
+        # path compression
+        while self._parents[path] != root:
+            self._parents[path], path = root, self._parents[path]
+
+        return root
+
+    def _add_rename(self, old_path: str, new_path: str):
+        for path in (old_path, new_path):
+            if path not in self._parents:
+                self._parents[path] = path
+                self._canonical_paths[path] = path
+
+        old_root = self._find_root(old_path)
+        new_root = self._find_root(new_path)
+        if old_root != new_root:
+            self._parents[old_root] = new_root
+            del self._canonical_paths[old_root]
+        self._canonical_paths[new_root] = new_path
+
+    def get_canonical_path(self, path: str) -> str:
+        """Get the canonical path of the file at this path"""
+        if path not in self._parents:
+            return path
+        return self._canonical_paths[self._find_root(path)]
+
+    def get_paths(self, path: str) -> List[str]:
+        """Get every path of the file at this path, including the path itself"""
+        return self._paths.get(self.get_canonical_path(path), [path])
+
+    def find_path(self, paths: Mapping[str, T], path: str) -> Optional[str]:
+        """Find the key of paths that is a path of the same file as path
+
+        e.g. find the path a rebase item uses for a file, in its file changes. The path
+        itself is preferred, if it's a key.
+        """
+        if path in paths:
+            return path
+        for other_path in self.get_paths(path):
+            if other_path in paths:
+                return other_path
+        return None
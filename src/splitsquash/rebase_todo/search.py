@@ -0,0 +1,69 @@
+from bisect import bisect_left
+from typing import Dict, List, Set, Tuple
+
+from splitsquash.types import RebaseItem
+
+
+class RebaseTodoSearchIndex:
+    """An index for searching the commits in a rebase todo
+
+    A commit matches a query if its hash starts with the query, or the query appears
+    in the first line of its message or in one of the paths it modifies. Searching is
+    case-insensitive.
+
+    The index is built once from the original rebase items. Copies of these items share
+    their commits, so they are found too.
+    """
+
+    def __init__(self, rebase_items: Tuple[RebaseItem, ...]):
+        # sorted hashes, so hashes with a given prefix are next to each other
+        self._shas: List[str] = sorted(set(item.commit.hexsha for item in rebase_items))
+
+        self._subjects: Dict[str, str] = {}
+        self._shas_by_path: Dict[str, Set[str]] = {}
+        for item in rebase_items:
+            sha = item.commit.hexsha
+            if sha in self._subjects:
+                continue
+
+            self._subjects[sha] = item.commit.message.split("\n")[0].lower()
+            for path in item.file_changes.keys():
+                self._shas_by_path.setdefault(str(path).lower(), set()).add(sha)
+
+        # The paths matched by the last query. When the user types another character, only
+        # these paths need to be searched again.
+        self._last_query = ""
+        self._last_matching_paths: List[str] = list(self._shas_by_path.keys())
+
+    def search(self, query: str) -> Set[str]:
+        """Get the hashes of all the commits that match the query"""
+        query = query.lower()
+
+        result = set()
+
+        # hash prefix
+        i = bisect_left(self._shas, query)
+        while i < len(self._shas) and self._shas[i].startswith(query):
+            result.add(self._shas[i])
+            i += 1
+
+        # subject
+        for sha, subject in self._subjects.items():
+            if query in subject:
+                result.add(sha)
+
+        # paths
+        for path in self._get_matching_paths(query):
+            result.update(self._shas_by_path[path])
+
+        return result
+
+    def _get_matching_paths(self, query: str) -> List[str]:
+        if query.startswith(self._last_query):
+            candidate_paths = self._last_matching_paths
+        else:
+            candidate_paths = self._shas_by_path.keys()
+
+        self._last_query = query
+        self._last_matching_paths = [path for path in candidate_paths if query in path]
+        return self._last_matching_paths
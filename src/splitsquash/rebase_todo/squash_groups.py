@@ -0,0 +1,161 @@
+"""Group each rebase item with the fixups and squashes after it, which end up in one commit
+
+A long rebase todo often has far fewer final commits than rebase items. The editor can show
+each group as one row, which is expanded to show its items.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from splitsquash.directory_aggregation import DirectoryStats
+from splitsquash.rebase_todo.renames import RenameIndex
+from splitsquash.types import RebaseItem
+
+# the actions that squash an item into the item before it
+SQUASH_ACTIONS = ("fixup", "squash")
+
+
+@dataclass
+class SquashGroup:
+    """A rebase item and the fixups and squashes after it, with their changes added together
+
+    :param start: The index of the first item.
+    :param end: The index after the last item.
+    """
+
+    start: int
+    end: int
+    insertions: int = 0
+    deletions: int = 0
+    # the changes to each file in all the items, added together, keyed by canonical path (see
+    # RenameIndex)
+    files: Dict[str, DirectoryStats] = field(default_factory=dict)
+
+    @property
+    def num_items(self) -> int:
+        return self.end - self.start
+
+
+class SquashGroups:
+    """The squash groups of a list of rebase items, kept up to date as the items change
+
+    The groups are found in one pass over the items, and are only found again when the items
+    change. Their totals are only added up when a collapsed group is shown, and are reused
+    until the items change, e.g. while the cursor moves.
+
+    :param rename_index: Used to add up the changes to each renamed file under one path.
+    """
+
+    def __init__(self, rename_index: Optional[RenameIndex] = None):
+        self._rename_index = rename_index or RenameIndex()
+        self._rebase_items: Tuple[RebaseItem, ...] = ()
+        # the index of the first item of each group, in order
+        self._starts: List[int] = []
+        # for each item, the index of its group in self._starts
+        self._group_indices: List[int] = []
+
+        # the totals of the groups that have been shown, keyed by their start and end
+        self._totals: Dict[Tuple[int, int], SquashGroup] = {}
+
+    def update_items(self, rebase_items: Tuple[RebaseItem, ...]):
+        """Find the groups of these items, unless they are the items the groups are for already
+
+        The rebase todo history stores each version of the items as a new tuple, so the
+        tuple is compared by identity.
+        """
+        if rebase_items is self._rebase_items:
+            return
+
+        self._rebase_items = rebase_items
+        self._starts = []
+        self._group_indices = []
+        for i, item in enumerate(rebase_items):
+            if i == 0 or item.action not in SQUASH_ACTIONS:
+                self._starts.append(i)
+            self._group_indices.append(len(self._starts) - 1)
+
+        self._totals = {}
+
+    def get_range(self, index: int) -> Tuple[int, int]:
+        """Get the start and end of the group containing the item at this index"""
+        group_index = self._group_indices[index]
+        start = self._starts[group_index]
+        if group_index + 1 < len(self._starts):
+            return start, self._starts[group_index + 1]
+        return start, len(self._rebase_items)
+
+    def get_group_key(self, index: int) -> str:
+        """Get the key of the group containing the item at this index
+
+        This is the hash of the group's first commit, so it stays the same when the group is
+        moved, or when items are added to it.
+        """
+        start, _ = self.get_range(index)
+        return self._rebase_items[start].commit.hexsha
+
+    def is_collapsed(self, index: int, expanded_keys: Set[str]) -> bool:
+        """Check if the item at this index is in a group that is shown as one row
+
+        Groups of one item are never collapsed.
+        """
+        start, end = self.get_range(index)
+        return (
+            end - start > 1
+            and self._rebase_items[start].commit.hexsha not in expanded_keys
+        )
+
+    def get_visible_indices(self, expanded_keys: Set[str]) -> List[int]:
+        """Get the index of the item shown in each row
+
+        A collapsed group is shown as its first item. Every item of the other groups is
+        shown.
+        """
+        visible_indices = []
+        for group_index, start in enumerate(self._starts):
+            if self.is_collapsed(start, expanded_keys):
+                visible_indices.append(start)
+            elif group_index + 1 < len(self._starts):
+                visible_indices.extend(range(start, self._starts[group_index + 1]))
+            else:
+                visible_indices.extend(range(start, len(self._rebase_items)))
+        return visible_indices
+
+    def get_collapsed_groups(
+        self, visible_indices: List[int], expanded_keys: Set[str]
+    ) -> Dict[int, SquashGroup]:
+        """Get the collapsed groups shown in these rows, keyed by the index of their first item"""
+        return {
+            i: self.get_group(i)
+            for i in visible_indices
+            if self.is_collapsed(i, expanded_keys)
+        }
+
+    def get_group(self, index: int) -> SquashGroup:
+        """Get the group containing the item at this index, with its totals"""
+        start, end = self.get_range(index)
+        group = self._totals.get((start, end))
+        if group is None:
+            group = self._totals[(start, end)] = self._add_up_group(start, end)
+        return group
+
+    def _add_up_group(self, start: int, end: int) -> SquashGroup:
+        group = SquashGroup(start, end)
+        for i in range(start, end):
+            item = self._rebase_items[i]
+            group.insertions += item.stats.total["insertions"]
+            group.deletions += item.stats.total["deletions"]
+
+            for path, file_change in item.file_changes.items():
+                file_stats = item.stats.files[path]
+                canonical_path = self._rename_index.get_canonical_path(path)
+                stats = group.files.get(canonical_path)
+                if stats is None:
+                    stats = group.files[canonical_path] = DirectoryStats()
+
+                if file_change.included:
+                    stats.num_included += 1
+                else:
+                    stats.num_excluded += 1
+                stats.lines_changed += file_stats["lines"]
+                stats.change_types[file_stats["change_type"]] += 1
+        return group
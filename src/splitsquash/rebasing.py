@@ -1,11 +1,11 @@
-import os
-import subprocess
+from dataclasses import dataclass, field
 from itertools import groupby
-from typing import List, Optional, Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from git import Repo
+from git import Commit, Repo, Stats
+from gitdb.util import hex_to_bin
 
-from splitsquash.types import RebaseItem
+from splitsquash.types import RebaseCommand, RebaseItem, encode_message
 
 
 def check_rebase_is_valid(rebase_items: List[RebaseItem]) -> List[str]:
@@ -31,21 +31,322 @@ def check_rebase_is_valid(rebase_items: List[RebaseItem]) -> List[str]:
     return errors
 
 
-def parse_rebase_items(rebase_todo: str, repo: Repo) -> List[RebaseItem]:
-    result = []
-    for line in rebase_todo.split("\n"):
-        if line.startswith("#") or len(line.strip()) == 0:
+# The commands that apply a commit, and their abbreviations
+COMMIT_COMMANDS = {
+    "pick": "pick",
+    "p": "pick",
+    "reword": "reword",
+    "r": "reword",
+    "edit": "edit",
+    "e": "edit",
+    "squash": "squash",
+    "s": "squash",
+    "fixup": "fixup",
+    "f": "fixup",
+    "drop": "drop",
+    "d": "drop",
+}
+
+# All the other commands, and their abbreviations
+OTHER_COMMANDS = {
+    "exec": "exec",
+    "x": "exec",
+    "break": "break",
+    "b": "break",
+    "label": "label",
+    "l": "label",
+    "reset": "reset",
+    "t": "reset",
+    "merge": "merge",
+    "m": "merge",
+    "update-ref": "update-ref",
+    "u": "update-ref",
+    "noop": "noop",
+}
+
+
+@dataclass
+class RebaseTodoToken:
+    """One command in a rebase todo, split into its parts"""
+
+    line_number: int
+    # the full command name, even if the line used an abbreviation
+    command: str
+    # For commit commands, the commit hash, option and message. For other commands, only
+    # args is set, and contains everything after the command.
+    sha: Optional[str] = None
+    fixup_option: Optional[str] = None
+    args: str = ""
+
+
+@dataclass
+class RebaseTodo:
+    """A parsed rebase todo
+
+    :param leading_commands: Non-commit lines before the first commit, e.g. "label onto" with
+                             --rebase-merges. The other non-commit lines are stored in the
+                             following_commands of the item before them.
+    """
+
+    rebase_items: List[RebaseItem]
+    leading_commands: List[RebaseCommand] = field(default_factory=list)
+
+
+def _split_first_word(text: str) -> Tuple[str, str]:
+    """Split the first word from the rest of the text
+
+    Like git's todo parser, words can be separated by any number of spaces or tabs.
+    """
+    parts = text.split(None, 1)
+    if len(parts) == 0:
+        return "", ""
+    elif len(parts) == 1:
+        return parts[0], ""
+    return parts[0], parts[1]
+
+
+def tokenize_rebase_todo(lines: Iterable[str]) -> Iterator[RebaseTodoToken]:
+    """Split each command in a rebase todo into its parts, without accessing the repository
+
+    Comments and blank lines are skipped. A ValueError is raised for unknown commands, or
+    commit commands without a commit.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if len(line) == 0 or line.startswith("#"):
             continue
-        action, sha, *message = line.split(" ")
-        commit = repo.commit(sha)
-        result.append(RebaseItem(action, commit))
 
+        command, args = _split_first_word(line)
+
+        if command in OTHER_COMMANDS:
+            yield RebaseTodoToken(line_number, OTHER_COMMANDS[command], args=args)
+            continue
+        elif command not in COMMIT_COMMANDS:
+            raise ValueError(f"Unknown command {command!r} on line {line_number}.")
+
+        command = COMMIT_COMMANDS[command]
+
+        fixup_option = None
+        if command == "fixup":
+            option, rest = _split_first_word(args)
+            if option in ("-C", "-c"):
+                fixup_option = option
+                args = rest
+
+        sha, message = _split_first_word(args)
+        if len(sha) == 0:
+            raise ValueError(f"No commit given for {command} on line {line_number}.")
+
+        yield RebaseTodoToken(
+            line_number, command, sha=sha, fixup_option=fixup_option, args=message
+        )
+
+
+def _parse_stats(diff_output: str) -> Stats:
+    """Parse the --raw and --numstat output of one commit, like Commit.stats
+
+    Renamed files are keyed by their new path, and their entry has an "old_path" too, so both
+    paths can be passed to git. (Commit.stats keys them by "old => new", which isn't a path.)
+    """
+    # The --raw lines come first, then the --numstat lines for the same files, in the same
+    # order. The paths are taken from the --raw lines, which list renames as two paths.
+    raw_lines = []
+    numstat_lines = []
+    for line in diff_output.split("\n"):
+        if line.startswith(":"):
+            raw_lines.append(line)
+        elif len(line) > 0:
+            numstat_lines.append(line)
+
+    total = {"insertions": 0, "deletions": 0, "lines": 0, "files": 0}
+    files = {}
+    for raw_line, numstat_line in zip(raw_lines, numstat_lines):
+        # :<old mode> <new mode> <old sha> <new sha> <change type><score>\t<path>[\t<new path>]
+        info, *paths = raw_line.split("\t")
+        change_type = info.split(" ")[4][0]
+        raw_insertions, raw_deletions, _ = numstat_line.split("\t", 2)
+
+        insertions = int(raw_insertions) if raw_insertions != "-" else 0
+        deletions = int(raw_deletions) if raw_deletions != "-" else 0
+        total["insertions"] += insertions
+        total["deletions"] += deletions
+        total["lines"] += insertions + deletions
+        total["files"] += 1
+
+        file_stats = {
+            "insertions": insertions,
+            "deletions": deletions,
+            "lines": insertions + deletions,
+            "change_type": change_type,
+        }
+        if len(paths) == 2:
+            file_stats["old_path"] = paths[0]
+        files[paths[-1]] = file_stats
+    return Stats(total, files)
+
+
+def load_commits(full_shas: List[str], repo: Repo) -> Dict[str, Tuple[Commit, Stats]]:
+    """Load the messages, parents and changed files of several commits with one git log
+
+    Reading Commit.stats runs git diff, and reading Commit.message reads the commit object, so
+    they would cost a git call for every commit if they were loaded one by one. The commits
+    returned already have their message and parents set. Renames are detected, see
+    _parse_stats().
+    """
+    if len(full_shas) == 0:
+        return {}
+
+    # Each commit is written as NUL, hash, NUL, parents, NUL, message, NUL, then its diff.
+    output = repo.git.log(
+        "--no-walk=unsorted",
+        "--format=%x00%H%x00%P%x00%B%x00",
+        "--raw",
+        "--numstat",
+        "--find-renames",
+        "--diff-merges=first-parent",
+        *full_shas,
+        "--",
+    )
+    parts = output.split("\0")
+
+    result = {}
+    for i in range(1, len(parts) - 3, 4):
+        full_sha, parent_shas, message, diff_output = parts[i : i + 4]
+        commit = Commit(
+            repo,
+            hex_to_bin(full_sha),
+            message=message,
+            parents=[Commit(repo, hex_to_bin(sha)) for sha in parent_shas.split()],
+        )
+        result[full_sha] = (commit, _parse_stats(diff_output))
     return result
 
 
-def create_rebase_todo_text(rebase_items: List[RebaseItem]) -> str:
+def resolve_commits(shas: Iterable[str], repo: Repo) -> Dict[str, Tuple[Commit, Stats]]:
+    """Look up several commits, and the files they change, with two git commands
+
+    :return: The commit and its stats for each of the given hashes, which may be abbreviated.
+    """
+    shas = list(dict.fromkeys(shas))
+    if len(shas) == 0:
+        return {}
+
+    full_shas = repo.git.rev_parse(*(f"{sha}^{{commit}}" for sha in shas)).split()
+    commits = load_commits(list(dict.fromkeys(full_shas)), repo)
+    return {sha: commits[full_sha] for sha, full_sha in zip(shas, full_shas)}
+
+
+def parse_rebase_todo(rebase_todo: str, repo: Repo) -> RebaseTodo:
+    """Parse every command in a rebase todo
+
+    Commits are looked up all at once, after the whole todo has been tokenized, so the number
+    of git commands doesn't depend on the length of the todo. Non-commit commands are kept as
+    RebaseCommands.
+    """
+    tokens = list(tokenize_rebase_todo(rebase_todo.split("\n")))
+    commits = resolve_commits(
+        (token.sha for token in tokens if token.sha is not None), repo
+    )
+
+    result = RebaseTodo([])
+    commands = result.leading_commands
+    for token in tokens:
+        if token.sha is None:
+            commands.append(RebaseCommand(token.command, token.args))
+            continue
+
+        commit, stats = commits[token.sha]
+        item = RebaseItem(token.command, commit, token.fixup_option, stats=stats)
+        result.rebase_items.append(item)
+        commands = item.following_commands
+
+    return result
+
+
+def parse_rebase_items(rebase_todo: str, repo: Repo) -> List[RebaseItem]:
+    """Parse a rebase todo, and return the items that apply commits
+
+    Use parse_rebase_todo() to also get any non-commit commands before the first item.
+    """
+    return parse_rebase_todo(rebase_todo, repo).rebase_items
+
+
+def _is_partial(item: RebaseItem) -> bool:
+    """Check if an item only includes some of the files of its commit"""
+    if item.action == "drop":
+        return False
+    num_included = sum(change.included for change in item.file_changes.values())
+    return 0 < num_included < len(item.file_changes)
+
+
+def _get_num_split_items(rebase_items: List[RebaseItem], start: int) -> int:
+    """Count the items from start that are partial copies of the same commit, in a row
+
+    They can all be made by one ss-edit-rebase-item command. The run ends at an item with
+    following commands, since they have to run before the next item is applied.
+    """
+    end = start + 1
+    while (
+        end < len(rebase_items)
+        and len(rebase_items[end - 1].following_commands) == 0
+        and _is_partial(rebase_items[end])
+        and rebase_items[end].commit.hexsha == rebase_items[start].commit.hexsha
+    ):
+        end += 1
+    return end - start
+
+
+def _get_new_message(item: RebaseItem) -> Optional[str]:
+    """Get the message to apply to an item while the rebase runs, or None to keep its own
+
+    Dropped items and fixups don't keep their message, so it isn't applied to them.
+    """
+    if item.action in ("drop", "fixup") or item.new_message == item.commit.message:
+        return None
+    return item.new_message
+
+
+def _get_edit_args(item: RebaseItem, include_files: bool) -> str:
+    """Get the ss-edit-rebase-item arguments of a part
+
+    An item with a new message is reworded by ss-edit-rebase-item, so it's picked instead of
+    making git stop to reword it.
+    """
+    new_message = _get_new_message(item)
+    action = item.action
+    if new_message is not None and action == "reword":
+        action = "pick"
+
+    args = f"-a {action}"
+    if action == "fixup" and item.fixup_option is not None:
+        args += f" {item.fixup_option}"
+    if new_message is not None:
+        args += f" -m {encode_message(new_message)}"
+    if include_files:
+        # A renamed file is included by including both its paths, so the old path is
+        # removed when the new one is added.
+        paths = []
+        for change in item.file_changes.values():
+            if change.included:
+                paths.append(change.path)
+                old_path = item.stats.files[change.path].get("old_path")
+                if old_path is not None:
+                    paths.append(old_path)
+        args += " " + " ".join(paths)
+    return args
+
+
+def create_rebase_todo_text(
+    rebase_items: List[RebaseItem],
+    leading_commands: Iterable[RebaseCommand] = (),
+) -> str:
     rebase_todo_text = ""
-    for item in rebase_items:
+    for command in leading_commands:
+        rebase_todo_text += f"{command.get_line()}\n"
+
+    i = 0
+    while i < len(rebase_items):
+        item = rebase_items[i]
         first_message_line = item.commit.message.split("\n")[0]
 
         all_files_included = all(
@@ -55,27 +356,46 @@ def create_rebase_todo_text(rebase_items: List[RebaseItem]) -> str:
             not change.included for change in item.file_changes.values()
         )
 
-        if item.action == "drop" or all_files_included:
+        # the items handled by this iteration
+        split_items = [item]
+
+        if item.action == "drop" or (
+            all_files_included and _get_new_message(item) is None
+        ):
             # No exec commands needed. Just apply the rebase action as normal.
+            action = item.action
+            if action == "fixup" and item.fixup_option is not None:
+                action += f" {item.fixup_option}"
             rebase_todo_text += (
-                f"{item.action} {item.commit.hexsha[:7]} {first_message_line}\n"
+                f"{action} {item.commit.hexsha[:7]} {first_message_line}\n"
             )
         elif no_files_included:
             # No files included, so just drop it.
             rebase_todo_text += f"drop {item.commit.hexsha[:7]} {first_message_line}\n"
+        elif all_files_included:
+            # The item has been reworded. Pick the commit, then call ss-edit-rebase-item to give
+            # it the new message and apply the rebase action, so git doesn't stop for the message.
+            rebase_todo_text += f"pick {item.commit.hexsha[:7]} {first_message_line}\n"
+            rebase_todo_text += (
+                f"exec ss-edit-rebase-item {_get_edit_args(item, False)}\n"
+            )
         else:
             # This rebase item only contains a subset of the files of the original commit. Pick the
             # commit, then call ss-edit-rebase-item in an exec command. The edit-rebase-item command will
             # edit the commit to only include the specified files, and apply the specified rebase action.
+            # If the next items are also parts of this commit, they're all made by the same
+            # command, so the commit is only applied once.
+            split_items = rebase_items[i : i + _get_num_split_items(rebase_items, i)]
 
             rebase_todo_text += f"pick {item.commit.hexsha[:7]} {first_message_line}\n"
 
-            changed_files = " ".join(
-                change.path for change in item.file_changes.values() if change.included
-            )
-            rebase_todo_text += (
-                f"exec ss-edit-rebase-item -a {item.action} {changed_files}\n"
-            )
+            parts = [_get_edit_args(split_item, True) for split_item in split_items]
+            rebase_todo_text += f"exec ss-edit-rebase-item {' --and '.join(parts)}\n"
+
+        for command in split_items[-1].following_commands:
+            rebase_todo_text += f"{command.get_line()}\n"
+
+        i += len(split_items)
 
     return rebase_todo_text
 
@@ -84,23 +404,15 @@ def rebase(
     rebase_items: List[RebaseItem],
     rebase_args: Optional[List[str]] = None,
 ) -> str:
-    if rebase_args is None:
-        rebase_args = []
-
-    # build rebase file
-    rebase_todo = ""
-    for item in rebase_items:
-        rebase_todo += f"{item.action} {item.commit.hexsha[:7]} {item.commit.message}\n"
-
-    # run git rebase command
-    # Custom editor command outputs rebase_todo to file.
-    env = os.environ.copy()
-    env["GIT_EDITOR"] = f"echo {repr(rebase_todo)}"
-    process = subprocess.run(
-        ["git", "rebase", "-i", *rebase_args],
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-    )
+    """Run an interactive rebase with these rebase items, and return git's output
+
+    This blocks until git exits. Use splitsquash.rebase_runner.run_rebase() to follow the
+    progress of the rebase, or run several at once.
+    """
+    # Only imported here, so parsing a todo doesn't import asyncio.
+    import asyncio
+
+    from splitsquash.rebase_runner import run_rebase
 
-    return process.stdout.decode()
+    result = asyncio.run(run_rebase(create_rebase_todo_text(rebase_items), rebase_args))
+    return result.output
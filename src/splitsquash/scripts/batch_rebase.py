@@ -0,0 +1,59 @@
+import argparse
+import sys
+import time
+
+from splitsquash import tracing
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        "ss-batch-rebase",
+        description=(
+            "Rebase several branches onto the same upstream, applying the same plan to each\n"
+            + "rebase todo. Each branch is rebased in its own temporary worktree."
+        ),
+    )
+    parser.add_argument("--plan", type=str, required=True)
+    parser.add_argument("--upstream", type=str, required=True)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="The number of branches to rebase at once. Defaults to the number of CPUs.",
+    )
+    parser.add_argument("branches", nargs="+", type=str)
+    args = parser.parse_args()
+
+    tracing.start_from_environment("ss-batch-rebase")
+
+    # Imported after the arguments are parsed, so --help doesn't load multiprocessing.
+    from splitsquash.batch import run_batch
+
+    start_time = time.perf_counter()
+    num_failed = 0
+    for result in run_batch(
+        ".", args.branches, args.upstream, args.plan, max_workers=args.jobs
+    ):
+        if result.success:
+            print(
+                f"ok     {result.branch} {result.old_sha[:7]} -> {result.new_sha[:7]} "
+                f"({result.duration:.2f}s)"
+            )
+        else:
+            num_failed += 1
+            print(f"failed {result.branch} ({result.duration:.2f}s)")
+            print("    " + result.output.strip().replace("\n", "\n    "))
+
+    total_time = time.perf_counter() - start_time
+    print(
+        f"{len(args.branches) - num_failed}/{len(args.branches)} branches rebased "
+        f"in {total_time:.2f}s"
+    )
+
+    if num_failed > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
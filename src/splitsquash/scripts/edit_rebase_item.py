@@ -1,8 +1,40 @@
 import argparse
+import os
+import sys
+from dataclasses import dataclass
+from typing import List, Optional
 
-from git import Repo
+from splitsquash import git_plumbing, tracing
+from splitsquash.types import REBASE_ACTIONS, decode_message
 
-from splitsquash.types import REBASE_ACTIONS
+# separates the parts when a commit is split into several
+PART_SEPARATOR = "--and"
+
+
+@dataclass
+class RebaseItemPart:
+    """One of the rebase items made from the commit, and the files it includes
+
+    If files_included is empty, the part includes the whole commit. message is the part's
+    new commit message, or None to keep the commit's message. fixup_option is -C or -c, if
+    the part is a fixup that uses its own message.
+    """
+
+    action: str
+    files_included: List[str]
+    message: Optional[str] = None
+    fixup_option: Optional[str] = None
+
+
+def split_parts_args(args: List[str]) -> List[List[str]]:
+    """Split the command line arguments into the arguments of each part"""
+    parts = [[]]
+    for arg in args:
+        if arg == PART_SEPARATOR:
+            parts.append([])
+        else:
+            parts[-1].append(arg)
+    return parts
 
 
 def main():
@@ -10,7 +42,12 @@ def main():
         description=(
             "Run this script after applying a commit in a rebase. You can use\n"
             + "this to change the rebase action or remove some files."
-        )
+        ),
+        epilog=(
+            f"To split the commit into several rebase items, separate them with "
+            f"{PART_SEPARATOR}, e.g. -a pick a.txt {PART_SEPARATOR} -a fixup b.txt. The commit "
+            "is only applied once for all of them."
+        ),
     )
     parser.add_argument(
         "-a",
@@ -18,44 +55,122 @@ def main():
         type=str,
         choices=REBASE_ACTIONS,
     )
-    parser.add_argument("files_included", nargs="+", type=str)
-    args = parser.parse_args()
-
-    repo = Repo(".")
-
-    # We need to edit the most recent rebase commit to only include the specified files, and use
-    # the specified rebase action. To do this, we:
-    # 1. Edit the commit to only include the specified files.
-    # 2. Reset the commit.
-    # 3. Edit the `git-rebase-todo` file to re-apply the commit with the specified action.
-
-    # 1. Edit the commit.
-    commit_message = repo.head.commit.message
-    repo.head.reset("HEAD~1", index=True, working_tree=False)
-    repo.index.add(args.files_included)
-    repo.index.commit(commit_message)
-    repo.head.reset("HEAD", index=True, working_tree=True)
-
-    if args.action == "pick":
-        # Steps 2 and 3 are unnecessary for picks, since the correct action has already been applied.
-        return
+    parser.add_argument(
+        "-m",
+        "--message",
+        type=str,
+        help="The new commit message, base64-encoded so it fits on one line of the todo.",
+    )
+    fixup_options = parser.add_mutually_exclusive_group()
+    for fixup_option in ("-C", "-c"):
+        fixup_options.add_argument(
+            fixup_option,
+            dest="fixup_option",
+            action="store_const",
+            const=fixup_option,
+            help=f"Use with -a fixup, to apply it as fixup {fixup_option}.",
+        )
+    parser.add_argument(
+        "files_included",
+        nargs="*",
+        type=str,
+        help="The files to include. If there are none, the whole commit is included.",
+    )
+
+    parts = []
+    for part_args in split_parts_args(sys.argv[1:]):
+        args = parser.parse_args(part_args)
+        message = decode_message(args.message) if args.message is not None else None
+        parts.append(
+            RebaseItemPart(args.action, args.files_included, message, args.fixup_option)
+        )
+
+    if len(parts) > 1 and any(len(part.files_included) == 0 for part in parts):
+        parser.error("Every part must have some files when the commit is split.")
+
+    tracing.start_from_environment("ss-edit-rebase-item")
+    with tracing.span(
+        "ss-edit-rebase-item",
+        actions=[part.action for part in parts],
+        files=[part.files_included for part in parts],
+    ):
+        edit_rebase_item(parts)
+
+
+def edit_rebase_item(parts: List[RebaseItemPart]):
+    # This runs once for every split commit, so it uses git plumbing commands directly,
+    # rather than importing GitPython.
+    git_dir = git_plumbing.get_git_dir()
+
+    # We need to replace the most recent rebase commit with one commit for each part, which
+    # only includes the part's files, and apply each part's rebase action. To do this, we:
+    # 1. Create a commit for each part, on top of the commit for the part before.
+    # 2. Keep the commits for the picks at the start, and reset the rest.
+    # 3. Edit the `git-rebase-todo` file to re-apply the other commits with their actions.
+
+    # 1. Create the commits. They're written without touching the index or working tree, and
+    # keep the author of the original commit.
+    with tracing.span("1. Edit the commit"):
+        commit = git_plumbing.read_commit("HEAD")
+        author_env = commit.get_author_env()
+
+        if len(parts[0].files_included) == 0:
+            # The whole commit is kept, e.g. to reword it, so its tree can be reused.
+            trees = [commit.tree]
+        else:
+            trees = []
+            with git_plumbing.temporary_index(git_dir) as index_env:
+                git_plumbing.read_tree(commit.parents[0], env=index_env)
+                for part in parts:
+                    git_plumbing.reset_paths("HEAD", part.files_included, env=index_env)
+                    trees.append(git_plumbing.write_tree(env=index_env))
+
+        new_commit_hashes = []
+        parent = commit.parents[0]
+        for part, tree in zip(parts, trees):
+            message = part.message if part.message is not None else commit.message
+            parent = git_plumbing.commit_tree(tree, [parent], message, env=author_env)
+            new_commit_hashes.append(parent)
+
+    # Picks are already applied correctly, so they can stay. The other parts have to be
+    # re-applied by git, with their actions.
+    num_picks = 0
+    while num_picks < len(parts) and parts[num_picks].action == "pick":
+        num_picks += 1
 
     # 2. Reset the commit
-    new_commit_hash = repo.head.commit.hexsha
-    repo.head.reset("HEAD~1", index=True, working_tree=True)
+    with tracing.span("2. Reset the commit"):
+        if num_picks > 0:
+            git_plumbing.reset_hard(new_commit_hashes[num_picks - 1])
+        else:
+            git_plumbing.reset_hard(commit.parents[0])
+
+    if num_picks == len(parts):
+        # Step 3 is unnecessary when there are only picks.
+        return
 
     # 3. Edit the git-rebase-todo file
-    todo_file = ".git/rebase-merge/git-rebase-todo"
-    with open(todo_file, "r") as f:
-        rebase_todo = f.readlines()
+    with tracing.span("3. Edit the git-rebase-todo file"):
+        # In a linked worktree, .git is a file, so use the worktree's git directory.
+        todo_file = os.path.join(git_dir, "rebase-merge", "git-rebase-todo")
+        with open(todo_file, "r") as f:
+            rebase_todo = f.readlines()
 
-    commit_message_first_line = commit_message.split("\n")[0]
-    rebase_todo = [
-        f"{args.action} {new_commit_hash} {commit_message_first_line}\n"
-    ] + rebase_todo
+        commit_message_first_line = commit.message.split("\n")[0]
+        new_lines = []
+        for part, new_commit_hash in zip(
+            parts[num_picks:], new_commit_hashes[num_picks:]
+        ):
+            action = part.action
+            if action == "fixup" and part.fixup_option is not None:
+                action += f" {part.fixup_option}"
+            new_lines.append(
+                f"{action} {new_commit_hash} {commit_message_first_line}\n"
+            )
+        rebase_todo = new_lines + rebase_todo
 
-    with open(todo_file, "w") as f:
-        f.writelines(rebase_todo)
+        with open(todo_file, "w") as f:
+            f.writelines(rebase_todo)
 
 
 if __name__ == "__main__":
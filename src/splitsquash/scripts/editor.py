@@ -1,15 +1,16 @@
-import argparse
 from typing import List, Optional
 
-from git import Repo
+from textual import work
 from textual.app import App
 from textual.widgets import TabbedContent, Tabs
 
+from splitsquash.diffs import DiffCache
+from splitsquash.dry_run import dry_run, get_rebase_onto
 from splitsquash.widgets.editor_widget_with_file_grid import EditorWidgetWithFileGrid
 from splitsquash.widgets.default_editor_widget import DefaultEditorWidget
 from splitsquash.rebase_todo.rebase_todo_state import RebaseTodoState
-from splitsquash.rebasing import parse_rebase_items, create_rebase_todo_text
-from splitsquash.types import RebaseItem
+from splitsquash.rebasing import create_rebase_todo_text
+from splitsquash.types import RebaseCommand, RebaseItem
 
 
 class GitRebaseExtendedEditor(App):
@@ -17,16 +18,29 @@ class GitRebaseExtendedEditor(App):
 
     BINDINGS = [
         ("enter", "submit", "Submit and perform rebase."),
+        ("ctrl+d", "dry_run", "Try the rebase in a temporary worktree."),
     ]
 
-    def __init__(self, rebase_items: List[RebaseItem], *args, **kwargs):
+    def __init__(
+        self,
+        rebase_items: List[RebaseItem],
+        *args,
+        leading_commands: Optional[List[RebaseCommand]] = None,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self._rebase_todo_state = RebaseTodoState(rebase_items)
+        self._leading_commands = leading_commands or []
         self._result: Optional[str] = None
 
+        # Both editor widgets show diffs, so they share a cache.
+        diff_cache = DiffCache()
+
         self._editor_widgets = {
-            "Default Editor": DefaultEditorWidget(self._rebase_todo_state),
-            "Editor With File Grid": EditorWidgetWithFileGrid(self._rebase_todo_state),
+            "Default Editor": DefaultEditorWidget(self._rebase_todo_state, diff_cache),
+            "Editor With File Grid": EditorWidgetWithFileGrid(
+                self._rebase_todo_state, diff_cache
+            ),
         }
 
     def action_quit(self) -> None:
@@ -36,46 +50,41 @@ class GitRebaseExtendedEditor(App):
     def get_result(self):
         return self._result
 
-    def action_submit(self):
+    def _create_rebase_todo_text(self):
         rebase_items = self._rebase_todo_state.get_current_items()
-        self._result = create_rebase_todo_text(rebase_items)
+        return create_rebase_todo_text(rebase_items, self._leading_commands)
+
+    def action_submit(self):
+        self._result = self._create_rebase_todo_text()
         self.exit()
 
+    def action_dry_run(self):
+        """Run the rebase todo in a temporary worktree, and show how it went"""
+        self.notify("Starting dry run...", timeout=3)
+        self._dry_run(self._create_rebase_todo_text())
+
+    @work(exclusive=True, group="dry_run")
+    async def _dry_run(self, rebase_todo: str):
+        try:
+            result = await dry_run(rebase_todo, await get_rebase_onto())
+        except (OSError, RuntimeError) as e:
+            self.notify(f"Dry run failed: {e}", severity="error", timeout=10)
+            return
+
+        self.notify(
+            result.get_summary(),
+            title="Dry run",
+            severity="information" if result.success else "warning",
+            timeout=20,
+        )
+
     def on_tabbed_content_tab_activated(self, event: Tabs.TabMessage):
-        # Pass rebase todo state to new editor widget and refresh. This means changes
-        # applied since this editor was last focussed will be visible.
+        # Both editor widgets share the same rebase todo state. Refresh the new editor widget
+        # if the state was changed while it was hidden, so those changes will be visible.
         editor_widget = self._editor_widgets[event.tab.label]
-        editor_widget.set_rebase_todo_state(self._rebase_todo_state, recompose=True)
+        editor_widget.update_state_if_out_of_date()
 
     def compose(self):
         with TabbedContent("Default Editor", "Editor With File Grid"):
             yield self._editor_widgets["Default Editor"]
             yield self._editor_widgets["Editor With File Grid"]
-
-
-def main():
-    parser = argparse.ArgumentParser(
-        "splitsquash",
-        description="An editor for git rebase todo files.",
-    )
-    parser.add_argument("rebase_todo_file", type=str)
-    args = parser.parse_args()
-
-    repo = Repo(".")
-
-    # parse rebase to-do file
-    with open(args.rebase_todo_file, "r") as f:
-        rebase_todo_text = f.read()
-    rebase_items = parse_rebase_items(rebase_todo_text, repo)
-
-    app = GitRebaseExtendedEditor(rebase_items)
-    app.run()
-
-    new_rebase_todo_text = app.get_result()
-    if new_rebase_todo_text is not None:
-        with open(args.rebase_todo_file, "w") as f:
-            f.write(new_rebase_todo_text)
-
-
-if __name__ == "__main__":
-    main()
@@ -0,0 +1,119 @@
+import argparse
+import sys
+from typing import TYPE_CHECKING
+
+from splitsquash import tracing
+
+if TYPE_CHECKING:
+    from splitsquash.rebasing import RebaseTodo
+
+# Each mode imports what it needs when it runs, so that e.g. applying a plan doesn't import
+# Textual, and --help doesn't import GitPython.
+
+
+def run_plan(plan_file: str, rebase_todo: "RebaseTodo") -> str:
+    """Apply a plan to the rebase todo, and return the new rebase todo text"""
+    from splitsquash.plan import apply_plan, load_plan
+    from splitsquash.rebase_todo.rebase_todo_state import (
+        RebaseTodoState,
+        RebaseTodoStateAndCursor,
+    )
+    from splitsquash.rebasing import create_rebase_todo_text
+
+    operations = load_plan(plan_file)
+
+    todo_state = RebaseTodoStateAndCursor(RebaseTodoState(rebase_todo.rebase_items))
+    apply_plan(todo_state, operations)
+
+    return create_rebase_todo_text(
+        todo_state.get_current_items(), rebase_todo.leading_commands
+    )
+
+
+def run_editor(rebase_todo: "RebaseTodo"):
+    """Open the editor, and return the new rebase todo text, or None if it was cancelled"""
+    from splitsquash.scripts.editor import GitRebaseExtendedEditor
+
+    app = GitRebaseExtendedEditor(
+        rebase_todo.rebase_items, leading_commands=rebase_todo.leading_commands
+    )
+    app.run()
+    return app.get_result()
+
+
+def run_dry_run(rebase_todo_text: str):
+    """Try a rebase todo in a temporary worktree, and print the time taken by each step"""
+    import asyncio
+
+    from splitsquash.dry_run import dry_run, get_rebase_onto
+
+    async def _run():
+        return await dry_run(rebase_todo_text, await get_rebase_onto())
+
+    result = asyncio.run(_run())
+    for step in result.steps:
+        print(f"{step.duration:8.3f}s  {step.number:4}  {step.line}")
+    print(result.get_summary())
+    if not result.success:
+        print(result.output)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        "splitsquash",
+        description="An editor for git rebase todo files.",
+    )
+    parser.add_argument("rebase_todo_file", type=str)
+    parser.add_argument(
+        "--plan",
+        type=str,
+        help=(
+            "Apply the operations in this JSON file to the rebase todo, instead of "
+            + "opening the editor. See splitsquash.plan for the format."
+        ),
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help=(
+            "Try the new rebase todo in a temporary worktree, and print how long each step "
+            + "took, instead of writing it. The rebase is cancelled."
+        ),
+    )
+    args = parser.parse_args()
+
+    tracing.start_from_environment("splitsquash")
+
+    from git import Repo
+
+    from splitsquash.rebasing import parse_rebase_todo
+
+    repo = Repo(".")
+
+    # parse rebase to-do file
+    with open(args.rebase_todo_file, "r") as f:
+        rebase_todo_text = f.read()
+    with tracing.span("parse_rebase_todo"):
+        rebase_todo = parse_rebase_todo(rebase_todo_text, repo)
+
+    if args.plan is not None:
+        try:
+            new_rebase_todo_text = run_plan(args.plan, rebase_todo)
+        except ValueError as e:
+            print(f"splitsquash: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        new_rebase_todo_text = run_editor(rebase_todo)
+
+    if new_rebase_todo_text is not None and args.dry_run:
+        run_dry_run(new_rebase_todo_text)
+        # Exit with an error, so git cancels the rebase.
+        sys.exit(1)
+
+    if new_rebase_todo_text is not None:
+        with open(args.rebase_todo_file, "w") as f:
+            f.write(new_rebase_todo_text)
+
+
+if __name__ == "__main__":
+    main()
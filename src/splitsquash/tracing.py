@@ -0,0 +1,186 @@
+"""Record where time is spent, as a Chrome trace that can be opened in Perfetto
+
+Set the SPLITSQUASH_TRACE environment variable to a file path to record a trace. Every
+Splitsquash process started with it (the editor, and ss-edit-rebase-item, which git runs
+with the same environment) appends its spans to the same file, so they show up on one
+timeline.
+
+The file uses the JSON array format, which allows the closing bracket to be missing, so
+each span can be appended as soon as it ends. Timestamps are wall clock times, so spans from
+different processes line up.
+
+When tracing is off, spans and traced functions cost one check of a global.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+TRACE_ENVIRONMENT_VARIABLE = "SPLITSQUASH_TRACE"
+
+# file descriptor of the trace file, or None if tracing is off
+_trace_fd: Optional[int] = None
+
+
+def is_tracing() -> bool:
+    return _trace_fd is not None
+
+
+def start_from_environment(process_name: str):
+    """Start tracing if SPLITSQUASH_TRACE is set
+
+    Call this at the start of each entry point.
+    """
+    path = os.environ.get(TRACE_ENVIRONMENT_VARIABLE)
+    if path:
+        start(path, process_name)
+
+
+def start(path: str, process_name: str):
+    """Append spans from this process to a trace file"""
+    global _trace_fd
+    if _trace_fd is not None:
+        return
+
+    _trace_fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    if os.fstat(_trace_fd).st_size == 0:
+        os.write(_trace_fd, b"[\n")
+
+    _write_event(
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": os.getpid(),
+            "args": {"name": f"{process_name} ({os.getpid()})"},
+        }
+    )
+
+    _trace_gitpython()
+
+
+def _write_event(event: Dict[str, Any]):
+    # A single write with O_APPEND, so events from several processes don't interleave.
+    os.write(_trace_fd, (json.dumps(event, default=str) + ",\n").encode())
+
+
+@contextmanager
+def span(name: str, category: str = "splitsquash", **args) -> Iterator[Dict[str, Any]]:
+    """Record the time taken by the body of a with statement
+
+    The yielded dict holds the span's arguments, so more can be added in the body, e.g. the
+    number of bytes read.
+    """
+    if _trace_fd is None:
+        yield args
+        return
+
+    start_time = time.time_ns() // 1000
+    try:
+        yield args
+    finally:
+        _write_event(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start_time,
+                "dur": time.time_ns() // 1000 - start_time,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+
+def traced(
+    name: str,
+    category: str = "splitsquash",
+    get_args: Optional[Callable[..., Dict[str, Any]]] = None,
+):
+    """Decorate a function to record a span every time it's called
+
+    :param get_args: Called with the function's arguments after it returns, to get the
+                     span's arguments. e.g. lambda self: {"num_children": len(self.children)}
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _trace_fd is None:
+                return function(*args, **kwargs)
+
+            with span(name, category) as span_args:
+                result = function(*args, **kwargs)
+                if get_args is not None:
+                    span_args.update(get_args(*args, **kwargs))
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def traced_compose(name: str):
+    """Decorate a Textual compose() method to record a span with the number of widgets"""
+
+    def decorator(compose):
+        @functools.wraps(compose)
+        def wrapper(*args, **kwargs):
+            if _trace_fd is None:
+                yield from compose(*args, **kwargs)
+                return
+
+            with span(name, "compose") as span_args:
+                num_widgets = 0
+                for widget in compose(*args, **kwargs):
+                    num_widgets += 1
+                    yield widget
+                span_args["num_widgets"] = num_widgets
+
+        return wrapper
+
+    return decorator
+
+
+def _get_size(output) -> Optional[int]:
+    if isinstance(output, (str, bytes)):
+        return len(output)
+    elif isinstance(output, tuple) and len(output) == 3:
+        # (status, stdout, stderr) from with_extended_output
+        return _get_size(output[1])
+    return None
+
+
+def _trace_gitpython():
+    """Record a span for every git command GitPython runs, and every object it reads"""
+    from git.cmd import Git
+
+    execute = Git.execute
+
+    @functools.wraps(execute)
+    def traced_execute(self, command, *args, **kwargs):
+        command_parts = [str(part) for part in command]
+        with span(" ".join(command_parts[:2]), "git") as span_args:
+            span_args["command"] = " ".join(command_parts)
+            output = execute(self, command, *args, **kwargs)
+            span_args["bytes"] = _get_size(output)
+            return output
+
+    Git.execute = traced_execute
+
+    for method_name in ["get_object_header", "get_object_data", "stream_object_data"]:
+        method = getattr(Git, method_name)
+
+        def traced_object_read(self, ref, *, _method=method, _name=method_name):
+            with span(f"git cat-file ({_name})", "git") as span_args:
+                span_args["ref"] = ref
+                result = _method(self, ref)
+                # (hexsha, type, size, ...)
+                span_args["bytes"] = result[2]
+                return result
+
+        setattr(Git, method_name, functools.wraps(method)(traced_object_read))
@@ -1,14 +1,27 @@
+import base64
 from copy import deepcopy
 from dataclasses import dataclass
 from os import PathLike
-from typing import Literal
+from typing import TYPE_CHECKING, List, Literal, Optional
 
-from git import Commit
+if TYPE_CHECKING:
+    # Only imported for type checking, so ss-edit-rebase-item can use this module without
+    # importing GitPython.
+    from git import Commit, Stats
 
 REBASE_ACTIONS = ["pick", "drop", "edit", "reword", "squash", "fixup"]
 RebaseAction = Literal["pick", "drop", "edit", "reword", "squash", "fixup"]
 
 
+def encode_message(message: str) -> str:
+    """Encode a commit message as one word, so it can be passed in an exec line"""
+    return base64.b64encode(message.encode("utf-8")).decode("ascii")
+
+
+def decode_message(encoded_message: str) -> str:
+    return base64.b64decode(encoded_message).decode("utf-8")
+
+
 @dataclass
 class OptionalFile:
     """A file path and a boolean
@@ -24,20 +37,79 @@ class OptionalFile:
     included: bool
 
 
+@dataclass
+class RebaseCommand:
+    """A line in a rebase todo that doesn't apply a commit, e.g. exec, label or update-ref
+
+    These are kept as they are, without looking anything up in the repository, so they can be
+    written back to the rebase todo.
+    """
+
+    # the full command name, even if the todo used an abbreviation
+    command: str
+    # everything after the command, as it appeared in the todo
+    args: str = ""
+
+    def get_line(self) -> str:
+        if self.args:
+            return f"{self.command} {self.args}"
+        return self.command
+
+
 class RebaseItem:
-    def __init__(self, action: RebaseAction, commit: Commit):
+    """A line in a rebase todo that applies a commit (pick, fixup, etc.)
+
+    :param fixup_option: -C or -c, if the item is a fixup that uses this commit's message.
+    :param following_commands: The non-commit lines after this item in the rebase todo. They
+                               move with the item. e.g. an update-ref after a branch's last
+                               commit stays after that commit.
+    :param stats: The files changed by the commit, if they've already been loaded, e.g. by
+                  parse_rebase_todo(). Otherwise they're read from commit.stats, which runs
+                  git diff every time it's used.
+    :param new_message: The message to give the commit instead of its own, if the user has
+                        reworded it. It's applied while the rebase runs, so git doesn't stop.
+    """
+
+    def __init__(
+        self,
+        action: RebaseAction,
+        commit: "Commit",
+        fixup_option: Optional[str] = None,
+        following_commands: Optional[List[RebaseCommand]] = None,
+        stats: Optional["Stats"] = None,
+        new_message: Optional[str] = None,
+    ):
         self.action = action
         self.commit = commit
+        self.fixup_option = fixup_option
+        self.new_message = new_message
+        self.following_commands = following_commands or []
+        self.stats = stats if stats is not None else commit.stats
         self.file_changes = {
-            file: OptionalFile(file, True) for file in self.commit.stats.files.keys()
+            file: OptionalFile(file, True) for file in self.stats.files.keys()
         }
 
+    @property
+    def message(self) -> str:
+        """The new message, if the commit has been reworded, or the commit's own message"""
+        if self.new_message is not None:
+            return self.new_message
+        return self.commit.message
+
     def copy(self):
         """Copy RebaseItem
 
-        All the mutable fields are deep-copied, except the commit. Deep-copying the commit can
-        lead to max recursion depth errors. I'm not sure why.
+        All the mutable fields are deep-copied, except the commit and its stats, which are never
+        modified. Deep-copying the commit can lead to max recursion depth errors. I'm not sure
+        why.
         """
-        result = RebaseItem(self.action, self.commit)
+        result = RebaseItem(
+            self.action,
+            self.commit,
+            self.fixup_option,
+            stats=self.stats,
+            new_message=self.new_message,
+        )
+        result.following_commands = deepcopy(self.following_commands)
         result.file_changes = deepcopy(self.file_changes)
         return result
@@ -1,10 +1,12 @@
-from typing import Tuple, Optional, List
+from typing import Dict, Tuple, Optional, List
 
 from textual.containers import Grid
 from textual.events import Click
 from textual.message import Message
 from textual.widgets import Label
 
+from splitsquash.rebase_todo.squash_groups import SquashGroup
+from splitsquash.tracing import traced, traced_compose
 from splitsquash.types import RebaseItem
 
 
@@ -26,6 +28,10 @@ class CommitGrid(Grid):
         self._rebase_items: Tuple[RebaseItem, ...] = ()
         self._active_index: Optional[int] = None
         self._highlighted_indices: List[int] = []
+        # The indices of the rebase items to show, or None to show all of them
+        self._visible_indices: Optional[List[int]] = None
+        # The squash groups shown as one row, keyed by the index of their first item
+        self._collapsed_groups: Dict[int, SquashGroup] = {}
 
         self.styles.grid_columns = "auto"
         self.styles.grid_gutter_vertical = 2
@@ -34,23 +40,38 @@ class CommitGrid(Grid):
         self.styles.grid_size_columns = 4
         self.styles.height = 1
 
+    @traced(
+        "CommitGrid.update_state",
+        get_args=lambda self, *args, **kwargs: {"num_children": len(self.children)},
+    )
     def update_state(
         self,
         rebase_items: Tuple[RebaseItem, ...],
         active_index: Optional[int],
         highlighted_indices: List[int],
         recompose: bool = False,
+        visible_indices: Optional[List[int]] = None,
+        collapsed_groups: Optional[Dict[int, SquashGroup]] = None,
     ):
         """Set all of the state
 
         Call this method after instantiating the widget. Call it again to update all the state.
+
+        :param visible_indices: If given, only the rebase items at these indices are shown. The
+                                other indices still refer to positions in rebase_items.
+        :param collapsed_groups: The squash groups to show as one row, with their line totals,
+                                 keyed by the index of their first item. The row is shown at
+                                 that index, so it must be visible.
         """
         self._rebase_items = rebase_items
         self._active_index = active_index
         self._highlighted_indices = highlighted_indices
+        self._visible_indices = visible_indices
+        self._collapsed_groups = collapsed_groups or {}
 
-        self.styles.grid_size_rows = len(rebase_items) + 1
-        self.styles.height = len(rebase_items) + 1
+        num_rows = len(self._get_row_indices())
+        self.styles.grid_size_rows = num_rows + 1
+        self.styles.height = num_rows + 1
 
         if recompose:
             self.refresh(recompose=True)
@@ -60,11 +81,21 @@ class CommitGrid(Grid):
             if child is not event.widget:
                 continue
 
-            commit_index = child_index // 3 - 1
+            row = child_index // 4 - 1
+            if row < 0:
+                return
+            commit_index = self._get_row_indices()[row]
             self.post_message(self.ClickedCommit(commit_index))
 
             return
 
+    def _get_row_indices(self) -> List[int]:
+        """Get the index of the rebase item shown in each row"""
+        if self._visible_indices is None:
+            return list(range(len(self._rebase_items)))
+        return self._visible_indices
+
+    @traced_compose("CommitGrid.compose")
     def compose(self):
         # header row
         yield Label("")
@@ -78,7 +109,8 @@ class CommitGrid(Grid):
             highlighted[i] = True
 
         # commit rows
-        for i, item in enumerate(self._rebase_items):
+        for i in self._get_row_indices():
+            item = self._rebase_items[i]
             classes = []
             if i == self._active_index:
                 classes.append("active")
@@ -90,9 +122,16 @@ class CommitGrid(Grid):
 
             yield Label(item.commit.hexsha[:7], classes=f"hexsha {classes}")
 
-            num_inserted = item.commit.stats.total["insertions"]
-            num_deleted = item.commit.stats.total["deletions"]
+            group = self._collapsed_groups.get(i)
+            if group is None:
+                num_inserted = item.stats.total["insertions"]
+                num_deleted = item.stats.total["deletions"]
+            else:
+                num_inserted = group.insertions
+                num_deleted = group.deletions
             yield Label(f"[green]+{num_inserted}[/green][red]-{num_deleted}[/red]")
 
-            first_message_line = item.commit.message.split("\n")[0]
+            first_message_line = item.message.split("\n")[0]
+            if group is not None:
+                first_message_line += f" [dim](+{group.num_items - 1} squashed)[/dim]"
             yield Label(first_message_line, classes=f"commit_message {classes}")
@@ -1,8 +1,11 @@
 from typing import Optional
 
-from textual.containers import Horizontal
+from textual.containers import Horizontal, Vertical
+from textual.widgets import Input
 
-from splitsquash.widgets.file_selector import FileSelector
+from splitsquash.diffs import DiffCache
+from splitsquash.widgets.diff_view import DiffView
+from splitsquash.widgets.file_selector import FileSelector, PATTERN_PLACEHOLDER
 from splitsquash.rebase_todo.rebase_todo_state import (
     RebaseTodoState,
     RebaseTodoStateAndCursor,
@@ -15,7 +18,8 @@ class DefaultEditorWidget(Horizontal):
 
     It shows a RebaseTodoWidget on the right side, and a FileSelector on the left side.
     The FileSelectors shows the files in the selected commit, and allows you to drop
-    some files from that commit.
+    some files from that commit, or the files matching a pattern typed above it. The
+    diff of the selected commit is shown below the RebaseTodoWidget.
     """
 
     CSS_PATH = "../styles/main.tcss"
@@ -23,24 +27,24 @@ class DefaultEditorWidget(Horizontal):
     def __init__(
         self,
         rebase_todo_state: RebaseTodoState,
+        diff_cache: DiffCache,
         *args,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
 
         self._todo_state = RebaseTodoStateAndCursor(rebase_todo_state)
+        self._diff_cache = diff_cache
 
         self._rebase_todo_widget: Optional[RebaseTodoWidget] = None
         self._file_selector: Optional[FileSelector] = None
+        self._pattern_input: Optional[Input] = None
+        self._diff_view: Optional[DiffView] = None
 
-    def set_rebase_todo_state(
-        self,
-        rebase_todo_state: RebaseTodoState,
-        recompose: bool = False,
-    ):
-        self._todo_state = RebaseTodoStateAndCursor(rebase_todo_state)
-        if recompose:
-            self.refresh(recompose=True)
+    def update_state_if_out_of_date(self):
+        """Show any changes made to the rebase todo since this widget was last shown"""
+        if self._rebase_todo_widget is not None:
+            self._rebase_todo_widget.update_state_if_out_of_date()
 
     def on_file_selector_changed_active_files(self, event):
         # set included files in active commit
@@ -56,17 +60,40 @@ class DefaultEditorWidget(Horizontal):
         self._todo_state.modify_items(rebase_items, clear_selection=False)
         self._rebase_todo_widget.update_state(recompose=True, notify_other_widets=False)
 
+    def on_input_submitted(self, event: Input.Submitted):
+        if event.input is not self._pattern_input:
+            return
+
+        try:
+            num_matches = self._file_selector.apply_pattern(event.value)
+        except ValueError as e:
+            self.notify(str(e), severity="error", timeout=10)
+            return
+        self.notify(f"{event.value!r} matched {num_matches} file(s).", timeout=3)
+        self._pattern_input.value = ""
+
     def on_rebase_todo_widget_updated(self, event):
         # re-create file selector with files of new active commit
         active_item = self._todo_state.get_active_item()
         file_changes = list(active_item.file_changes.values())
         self._file_selector.set_data(file_changes)
 
+        self._diff_view.show_diff(active_item.commit)
+
     def compose(self):
+        self._pattern_input = Input(placeholder=PATTERN_PLACEHOLDER)
         self._file_selector = FileSelector([])
-        self._file_selector.styles.width = "50%"
-        yield self._file_selector
+
+        with Vertical() as left_side:
+            left_side.styles.width = "50%"
+            yield self._pattern_input
+            yield self._file_selector
 
         self._rebase_todo_widget = RebaseTodoWidget(self._todo_state, False)
-        self._rebase_todo_widget.styles.width = "50%"
-        yield self._rebase_todo_widget
+        self._diff_view = DiffView(self._diff_cache, classes="diff_view")
+
+        with Vertical() as right_side:
+            right_side.styles.width = "50%"
+            self._rebase_todo_widget.styles.height = "60%"
+            yield self._rebase_todo_widget
+            yield self._diff_view
@@ -0,0 +1,119 @@
+import time
+from contextlib import closing
+from typing import List, Optional
+
+from git import Commit
+from rich.cells import cell_len
+from rich.segment import Segment
+from rich.style import Style
+from textual import work
+from textual.geometry import Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+from textual.worker import get_current_worker
+
+from splitsquash.diffs import DiffCache, DiffKey, stream_diff
+
+
+class DiffView(ScrollView):
+    """Shows the diff of a commit, or of one file in a commit
+
+    Diffs are loaded by a background worker, and shown as they are loaded. Each line is only
+    highlighted when it is rendered, so only the visible part of a long diff is highlighted.
+
+    :param diff_cache: Loaded diffs are stored here, so they can be shown again immediately.
+                       This can be shared between several DiffViews.
+    """
+
+    # While a diff is loading, new lines are shown at most this often (seconds).
+    LOAD_UPDATE_INTERVAL = 0.05
+
+    LINE_STYLES = {
+        "+": Style(color="green"),
+        "-": Style(color="red"),
+        "@": Style(color="cyan"),
+        "d": Style(bold=True),
+    }
+
+    def __init__(self, diff_cache: DiffCache, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._diff_cache = diff_cache
+
+        self._key: Optional[DiffKey] = None
+        self._lines: List[str] = []
+        self._max_line_width = 0
+
+    def show_diff(self, commit: Commit, path: Optional[str] = None):
+        """Show the diff of a commit, or of one file if path is given"""
+        key = (commit.hexsha, path)
+        if key == self._key:
+            return
+        self._key = key
+
+        self._set_lines([])
+        self.scroll_home(animate=False)
+
+        cached_lines = self._diff_cache.get(key)
+        if cached_lines is not None:
+            self.workers.cancel_group(self, "load_diff")
+            self._add_lines(key, cached_lines)
+        else:
+            self._load_diff(commit, path, key)
+
+    @work(thread=True, exclusive=True, group="load_diff")
+    def _load_diff(self, commit: Commit, path: Optional[str], key: DiffKey):
+        worker = get_current_worker()
+
+        lines: List[str] = []
+        new_lines: List[str] = []
+        num_bytes = 0
+        last_update_time = time.monotonic()
+
+        with closing(stream_diff(commit, path)) as diff_lines:
+            for line in diff_lines:
+                if worker.is_cancelled:
+                    return
+
+                num_bytes += len(line)
+                new_lines.append(line.decode(errors="replace").rstrip("\n"))
+
+                if time.monotonic() - last_update_time > self.LOAD_UPDATE_INTERVAL:
+                    self.app.call_from_thread(self._add_lines, key, new_lines)
+                    lines += new_lines
+                    new_lines = []
+                    last_update_time = time.monotonic()
+
+        self.app.call_from_thread(self._add_lines, key, new_lines)
+        lines += new_lines
+        self._diff_cache.put(key, lines, num_bytes)
+
+    def _set_lines(self, lines: List[str]):
+        self._lines = []
+        self._max_line_width = 0
+        self._add_lines(self._key, lines)
+
+    def _add_lines(self, key: DiffKey, lines: List[str]):
+        if key != self._key:
+            # These lines are from a diff that's no longer being shown.
+            return
+
+        for line in lines:
+            line = line.expandtabs()
+            self._lines.append(line)
+            self._max_line_width = max(self._max_line_width, cell_len(line))
+
+        self.virtual_size = Size(self._max_line_width, len(self._lines))
+        self.refresh()
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        index = y + scroll_y
+        width = self.scrollable_content_region.width
+        if index >= len(self._lines):
+            return Strip.blank(width, self.rich_style)
+
+        line = self._lines[index]
+        style = self.LINE_STYLES.get(line[:1], Style())
+        strip = Strip([Segment(line, self.rich_style + style)], cell_len(line))
+        return strip.crop_extend(scroll_x, scroll_x + width, self.rich_style)
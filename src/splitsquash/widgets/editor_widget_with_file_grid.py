@@ -1,7 +1,9 @@
-from textual.containers import Horizontal
+from textual.containers import Horizontal, Vertical
+from textual.widgets import Input
 
-from splitsquash.utility_functions import get_files_modified
-from splitsquash.widgets.file_selector import FileSelector
+from splitsquash.diffs import DiffCache
+from splitsquash.widgets.diff_view import DiffView
+from splitsquash.widgets.file_selector import FileSelector, PATTERN_PLACEHOLDER
 from splitsquash.rebase_todo.rebase_todo_state import (
     RebaseTodoState,
     RebaseTodoStateAndCursor,
@@ -15,14 +17,21 @@ class EditorWidgetWithFileGrid(Horizontal):
 
     It shows a FileSelector on the left side, and a RebaseTodoWidget with a FileGrid on
     the right side. You can use the FileSelector to select which files to show in the
-    FileGrid.
+    FileGrid, by clicking on them or by typing a pattern above it. The diff of the file
+    under the cursor in the FileGrid, or of the selected commit if there isn't one, is
+    shown below the FileGrid.
     """
 
     CSS_PATH = "../styles/main.tcss"
 
+    # If more columns than this are shown or hidden at once, e.g. by a pattern, the file
+    # grid is recomposed, which is quicker than mounting and removing each column.
+    MAX_INCREMENTAL_COLUMN_CHANGES = 20
+
     def __init__(
         self,
         rebase_todo_state: RebaseTodoState,
+        diff_cache: DiffCache,
         *args,
         **kwargs,
     ):
@@ -31,37 +40,76 @@ class EditorWidgetWithFileGrid(Horizontal):
         self._todo_state = RebaseTodoStateAndCursor(rebase_todo_state)
 
         self._rebase_todo_widget = RebaseTodoWidget(self._todo_state, True)
-        self._rebase_todo_widget.styles.width = "66%"
+        self._diff_view = DiffView(diff_cache, classes="diff_view")
 
-        # build list of all files modified in this set of rebase items
-        all_files = get_files_modified(self._todo_state.get_original_items())
+        # build list of all files modified in this set of rebase items. The file grid has one
+        # column for each renamed file, so they're listed by their canonical paths.
+        rename_index = self._todo_state.get_rename_index()
+        all_files = dict.fromkeys(
+            rename_index.get_canonical_path(file)
+            for file in self._todo_state.get_original_files()
+        )
 
         self._file_selector = FileSelector(
             [OptionalFile(file, True) for file in all_files]
         )
-        self._file_selector.styles.width = "33%"
+        self._pattern_input = Input(placeholder=PATTERN_PLACEHOLDER)
 
-    def set_rebase_todo_state(
-        self,
-        rebase_todo_state: RebaseTodoState,
-        recompose: bool = False,
-    ):
-        self._todo_state = RebaseTodoStateAndCursor(rebase_todo_state)
+    def update_state_if_out_of_date(self):
+        """Show any changes made to the rebase todo since this widget was last shown"""
+        self._rebase_todo_widget.update_state_if_out_of_date()
 
-        all_files = get_files_modified(self._todo_state.get_original_items())
-        self._file_selector.set_data(
-            [OptionalFile(file, True) for file in all_files],
-            recompose=False,
-        )
+    def on_file_selector_changed_active_files(self, event):
+        file_grid = self._rebase_todo_widget.file_grid
+        num_changes = len(event.added_files) + len(event.removed_files)
+        if num_changes > self.MAX_INCREMENTAL_COLUMN_CHANGES:
+            file_grid.set_visible_files(event.active_files, recompose=True)
+        else:
+            file_grid.update_visible_files(event.added_files, event.removed_files)
 
-        if recompose:
-            self.refresh(recompose=True)
+    def on_input_submitted(self, event: Input.Submitted):
+        if event.input is not self._pattern_input:
+            return
 
-    def on_file_selector_changed_active_files(self, event):
-        self._rebase_todo_widget.file_grid.set_visible_files(
-            event.active_files, recompose=True
-        )
+        try:
+            num_matches = self._file_selector.apply_pattern(event.value)
+        except ValueError as e:
+            self.notify(str(e), severity="error", timeout=10)
+            return
+        self.notify(f"{event.value!r} matched {num_matches} file(s).", timeout=3)
+        self._pattern_input.value = ""
+
+    def on_rebase_todo_widget_updated(self, event):
+        self._show_active_diff()
+
+    def on_rebase_todo_widget_changed_active_file(self, event):
+        self._show_active_diff()
+
+    def _show_active_diff(self):
+        """Show the diff of the active file in the active commit, or the whole commit"""
+        active_item = self._todo_state.get_active_item()
+        active_file = self._rebase_todo_widget.file_grid.active_file
+
+        # The active item may have the file under another path, if it was renamed.
+        path = None
+        if active_file is not None:
+            path = self._todo_state.get_rename_index().find_path(
+                active_item.file_changes, active_file
+            )
+
+        if path is not None:
+            self._diff_view.show_diff(active_item.commit, path)
+        else:
+            self._diff_view.show_diff(active_item.commit)
 
     def compose(self):
-        yield self._file_selector
-        yield self._rebase_todo_widget
+        with Vertical() as left_side:
+            left_side.styles.width = "33%"
+            yield self._pattern_input
+            yield self._file_selector
+
+        with Vertical() as right_side:
+            right_side.styles.width = "66%"
+            self._rebase_todo_widget.styles.height = "60%"
+            yield self._rebase_todo_widget
+            yield self._diff_view
@@ -1,5 +1,6 @@
 import os
-from typing import List, Tuple, Optional, Literal
+from bisect import bisect_left
+from typing import List, Tuple, Optional, Literal, Dict, Iterable, Set
 
 from textual.containers import Grid
 from textual.events import Click
@@ -7,9 +8,25 @@ from textual.message import Message
 from textual.widget import Widget
 from textual.widgets import Label
 
-from splitsquash.types import RebaseItem
+from splitsquash.directory_aggregation import (
+    DirectoryAggregation,
+    DirectoryStats,
+    get_parent_directories,
+)
+from splitsquash.rebase_todo.renames import RenameIndex
+from splitsquash.rebase_todo.squash_groups import SquashGroup
+from splitsquash.tracing import traced, traced_compose
+from splitsquash.types import OptionalFile, RebaseItem
 from splitsquash.widgets.utility_widgets import FilenameLabel
 
+CHANGE_TYPE_COLOURS = {
+    "A": "green",
+    "D": "red",
+    "M": "orange",
+    "R": "green",
+    "T": "blue",
+}
+
 
 class FileGrid(Grid):
     """Displays FileChangeIndicators for a list of commits
@@ -22,12 +39,20 @@ class FileGrid(Grid):
     - a cross if it is included, but the user has clicked on it to remove it
     - nothing otherwise
 
+    In directory mode, the files are grouped into one column for each directory at a
+    chosen depth. Each cell shows the change type, the number of included files out of
+    the total, and the number of lines changed in that directory. Directory columns can
+    be expanded into one column for each of their children.
+
     Only the list of files is initialised in the constructor, so the widget
     is empty when it is instantiated. You must populate the other state with the
     update_state() method.
 
     :param files: The list of file paths to use as the column headers. The columns
-                  can be shown or hidden later using set_visible_files().
+                  can be shown or hidden later using set_visible_files() or
+                  update_visible_files().
+    :param rename_index: If given, the files are canonical paths (see RenameIndex), and each
+                         column shows the changes to its file under any of its paths.
     """
 
     class SetFileStatus(Message):
@@ -37,48 +62,111 @@ class FileGrid(Grid):
             self.included = included
             super().__init__()
 
+    class ChangedActiveFile(Message):
+        """Posted when the user moves the (text) cursor to a different file"""
+
     def __init__(
         self,
         files: List[str | os.PathLike[str]],
+        rename_index: Optional[RenameIndex] = None,
         *args,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
 
+        self._rename_index = rename_index or RenameIndex()
+
         self._rebase_items: Tuple[RebaseItem, ...] = ()
         self._active_index: Optional[int] = None
         self._highlighted_indices: List[int] = []
-        self._visible_files: List[str | os.PathLike[str]] = files
+        # The indices of the rebase items to show, or None to show all of them
+        self._visible_indices: Optional[List[int]] = None
+        # The squash groups shown as one row, keyed by the index of their first item
+        self._collapsed_groups: Dict[int, SquashGroup] = {}
         self._active_file_index: int = -1
 
+        # Each file is given an id, which is its column position when all files are shown.
+        # The visible ids are kept sorted, so columns can be inserted in the right place.
+        self._files: List[str | os.PathLike[str]] = []
+        self._file_ids: Dict[str | os.PathLike[str], int] = {}
+        self._visible_file_ids: List[int] = []
+        self._visible_files: List[str | os.PathLike[str]] = []
+        for file in files:
+            self._visible_file_ids.append(self._get_file_id(file))
+        self._visible_files = list(files)
+
+        # The composed widgets in each visible column, keyed by file id. The first widget is the
+        # header, and the rest are the cells for each rebase item. Only used when there is one
+        # column per file.
+        self._columns: Dict[int, List[Widget]] = {}
+
+        # In directory mode, files are grouped into one column per directory at this depth,
+        # unless the directory has been expanded. None means there is one column per file.
+        self._directory_depth: Optional[int] = None
+        self._expanded_directories: Set[str] = set()
+        self._aggregation = DirectoryAggregation(self._rename_index)
+
+        # The path shown in each column. In directory mode, some of these are directories.
+        self._column_paths: List[str | os.PathLike[str]] = list(self._visible_files)
+        self._directory_columns: Set[str] = set()
+
         self._last_hovered_file = None
 
         self.styles.grid_columns = "auto"
         self.styles.grid_gutter_vertical = 1
         self.styles.grid_rows = "1"
         self.styles.grid_size_rows = 1
-        self.styles.grid_size_columns = len(self._visible_files)
+        self.styles.grid_size_columns = len(self._column_paths)
         self.styles.height = 2
         self.styles.overflow_x = "auto"
 
+    @property
+    def active_file(self) -> Optional[str | os.PathLike[str]]:
+        """The file under the (text) cursor, or None if there isn't one
+
+        This is also None if the cursor is on a directory column.
+        """
+        active_column = self._get_active_column()
+        if active_column in self._directory_columns:
+            return None
+        return active_column
+
+    @traced(
+        "FileGrid.update_state",
+        get_args=lambda self, *args, **kwargs: {"num_children": len(self.children)},
+    )
     def update_state(
         self,
         rebase_items: Tuple[RebaseItem, ...],
         active_index: Optional[int],
         highlighted_indices: List[int],
         recompose: bool = False,
+        visible_indices: Optional[List[int]] = None,
+        collapsed_groups: Optional[Dict[int, SquashGroup]] = None,
     ):
         """Set all of the state
 
         Call this method after instantiating the widget. Call it again to update all the state.
+
+        :param visible_indices: If given, only the rebase items at these indices are shown. The
+                                other indices still refer to positions in rebase_items.
+        :param collapsed_groups: The squash groups to show as one row, with the file changes of
+                                 all their items, keyed by the index of their first item. The
+                                 row is shown at that index, so it must be visible.
         """
         self._rebase_items = rebase_items
         self._active_index = active_index
         self._highlighted_indices = highlighted_indices
+        self._visible_indices = visible_indices
+        self._collapsed_groups = collapsed_groups or {}
+
+        if self._directory_depth is not None:
+            self._aggregation.update_items(rebase_items)
 
-        self.styles.grid_size_rows = len(rebase_items) + 1
+        num_rows = len(self._get_row_indices())
+        self.styles.grid_size_rows = num_rows + 1
         # An extra row is added at the bottom so the scroll bar doesn't cover the bottom row.
-        self.styles.height = len(rebase_items) + 2
+        self.styles.height = num_rows + 2
 
         if recompose:
             self.refresh(recompose=True)
@@ -89,12 +177,208 @@ class FileGrid(Grid):
         recompose: bool = False,
     ):
         """Only these files will be shown"""
-        self._visible_files = visible_files
-        self.styles.grid_size_columns = len(self._visible_files)
+        active_column = self._get_active_column()
+
+        self._visible_file_ids = sorted(
+            set(self._get_file_id(file) for file in visible_files)
+        )
+        self._update_visible_files(active_column)
 
         if recompose:
             self.refresh(recompose=True)
 
+    def update_visible_files(
+        self,
+        added_files: Iterable[str | os.PathLike[str]],
+        removed_files: Iterable[str | os.PathLike[str]],
+    ):
+        """Show and hide some columns, without recomposing the other columns
+
+        In directory mode, the whole grid is recomposed.
+        """
+        if self._directory_depth is not None:
+            visible_files = set(self._visible_files).union(added_files)
+            visible_files.difference_update(removed_files)
+            self.set_visible_files(list(visible_files), recompose=True)
+            return
+
+        active_column = self._get_active_column()
+
+        for file in removed_files:
+            file_id = self._file_ids.get(file)
+            position = self._get_visible_position(file_id)
+            if position is None:
+                continue
+
+            del self._visible_file_ids[position]
+            self.remove_children(self._columns.pop(file_id, []))
+
+        new_file_ids = []
+        for file in added_files:
+            file_id = self._get_file_id(file)
+            if self._get_visible_position(file_id) is not None:
+                continue
+
+            position = bisect_left(self._visible_file_ids, file_id)
+            self._visible_file_ids.insert(position, file_id)
+            new_file_ids.append(file_id)
+
+        self._update_visible_files(active_column)
+
+        if self.is_mounted:
+            # Mount from left to right, so each new column can be placed after its neighbour.
+            for file_id in sorted(new_file_ids):
+                self._mount_column(self._get_visible_position(file_id))
+
+    def _get_file_id(self, file: str | os.PathLike[str]) -> int:
+        """Get the id of a file, giving it a new id if it hasn't been seen before"""
+        file_id = self._file_ids.get(file)
+        if file_id is None:
+            file_id = len(self._files)
+            self._files.append(file)
+            self._file_ids[file] = file_id
+        return file_id
+
+    def _get_visible_position(self, file_id: Optional[int]) -> Optional[int]:
+        """Get the column position of a file, or None if it isn't visible"""
+        if file_id is None:
+            return None
+        position = bisect_left(self._visible_file_ids, file_id)
+        if (
+            position == len(self._visible_file_ids)
+            or self._visible_file_ids[position] != file_id
+        ):
+            return None
+        return position
+
+    def _get_active_column(self) -> Optional[str | os.PathLike[str]]:
+        if self._active_file_index == -1:
+            return None
+        return self._column_paths[self._active_file_index]
+
+    def _update_visible_files(self, active_column: Optional[str | os.PathLike[str]]):
+        """Update the derived state after the visible files or the directory mode have changed
+
+        The active column stays active if it's still visible.
+        """
+        self._visible_files = [self._files[i] for i in self._visible_file_ids]
+
+        if self._directory_depth is None:
+            self._column_paths = list(self._visible_files)
+            self._directory_columns = set()
+        else:
+            self._column_paths = []
+            self._directory_columns = set()
+            for file in self._visible_files:
+                column_path, is_directory = self._get_directory_column(file)
+                if is_directory:
+                    if column_path in self._directory_columns:
+                        continue
+                    self._directory_columns.add(column_path)
+                self._column_paths.append(column_path)
+
+        self.styles.grid_size_columns = len(self._column_paths)
+
+        if active_column in self._column_paths:
+            self._active_file_index = self._column_paths.index(active_column)
+        else:
+            self._active_file_index = -1
+
+    def _get_directory_column(self, file: str) -> Tuple[str, bool]:
+        """Get the path of the column containing this file in directory mode
+
+        This is the file's directory at the chosen depth, or a deeper directory if that one
+        has been expanded. The file gets its own column if all its directories are expanded.
+
+        :return: The column path, and whether it is a directory.
+        """
+        parts = file.split("/")
+        for depth in range(self._directory_depth, len(parts)):
+            directory = "/".join(parts[:depth])
+            if directory not in self._expanded_directories:
+                return directory, True
+        return file, False
+
+    def set_directory_depth(self, depth: Optional[int], recompose: bool = False):
+        """Show one column per directory at this depth, or one column per file if depth is None
+
+        Top-level directories have a depth of 1.
+        """
+        if depth is not None:
+            depth = max(1, depth)
+            self._aggregation.update_items(self._rebase_items)
+
+        self._directory_depth = depth
+        self._expanded_directories = set()
+        self._update_visible_files(self._get_active_column())
+
+        if recompose:
+            self.refresh(recompose=True)
+
+    @property
+    def directory_depth(self) -> Optional[int]:
+        return self._directory_depth
+
+    def action_collapse_directory(self):
+        """Collapse the expanded directory containing the active column"""
+        active_column = self._get_active_column()
+        if active_column is None:
+            return
+
+        expanded_parents = [
+            directory
+            for directory in get_parent_directories(active_column)
+            if directory in self._expanded_directories
+        ]
+        if len(expanded_parents) == 0:
+            return
+
+        # collapse the deepest one, and everything expanded inside it
+        directory = expanded_parents[-1]
+        self._expanded_directories = {
+            expanded
+            for expanded in self._expanded_directories
+            if expanded != directory and not expanded.startswith(directory + "/")
+        }
+        self._update_visible_files(directory)
+        self.refresh(recompose=True)
+        self.post_message(self.ChangedActiveFile())
+
+    def _expand_directory(self, directory: str):
+        self._expanded_directories.add(directory)
+        self._update_visible_files(None)
+        self.refresh(recompose=True)
+
+    def _mount_column(self, position: int):
+        """Create the widgets for the visible column at this position, and mount them"""
+        file_id = self._visible_file_ids[position]
+        column = [FilenameLabel(self._files[file_id], classes="filename")]
+        for i in self._get_row_indices():
+            column.append(
+                self._create_cell(
+                    i, self._rebase_items[i], position, self._get_row_classes(i)
+                )
+            )
+
+        # Mount each cell next to its neighbour in the same row. If there are no other columns,
+        # there is one cell per row, so they can just be appended in order.
+        if position > 0:
+            previous_column = self._columns[self._visible_file_ids[position - 1]]
+            for cell, neighbour in zip(column, previous_column):
+                self.mount(cell, after=neighbour)
+        elif len(self._columns) > 0:
+            next_column = next(
+                self._columns[other_file_id]
+                for other_file_id in self._visible_file_ids
+                if other_file_id in self._columns
+            )
+            for cell, neighbour in zip(column, next_column):
+                self.mount(cell, before=neighbour)
+        else:
+            self.mount(*column)
+
+        self._columns[file_id] = column
+
     def action_move_left(self):
         """Highlight the file one space to the left"""
         active_item = self._rebase_items[self._active_index]
@@ -102,11 +386,11 @@ class FileGrid(Grid):
         # move left to next file indicator, or select no files (self._active_file_index == -1)
         while self._active_file_index > -1:
             self._active_file_index -= 1
-            file = self._visible_files[self._active_file_index]
-            if file in active_item.file_changes:
+            if self._has_cell(self._active_index, active_item, self._active_file_index):
                 break
 
         self.refresh(recompose=True)
+        self.post_message(self.ChangedActiveFile())
 
     def action_move_right(self):
         """Highlight the file one space to the right"""
@@ -115,11 +399,11 @@ class FileGrid(Grid):
         previous_active_file_index = self._active_file_index
 
         # move right to next file indicator
-        while self._active_file_index < len(self._visible_files) - 1:
+        while self._active_file_index < len(self._column_paths) - 1:
             self._active_file_index += 1
-            file = self._visible_files[self._active_file_index]
-            if file in active_item.file_changes:
+            if self._has_cell(self._active_index, active_item, self._active_file_index):
                 self.refresh(recompose=True)
+                self.post_message(self.ChangedActiveFile())
                 return
 
         # No more files. Reset index to what it was before this function was run.
@@ -136,14 +420,17 @@ class FileGrid(Grid):
             return
 
         # get commit index (row) and file index (column) that was clicked
-        commit_index = clicked_child_index // len(self._visible_files) - 1
-        file_index = clicked_child_index % len(self._visible_files)
-
-        self._toggle_file(commit_index, file_index)
+        row = clicked_child_index // len(self._column_paths) - 1
+        if row < 0:
+            return
+        commit_index = self._get_row_indices()[row]
+        file_index = clicked_child_index % len(self._column_paths)
 
-        # select file (if there is a file at the clicked location)
+        # Select the clicked column before toggling it, since expanding a directory changes
+        # the columns.
         self._active_file_index = file_index
         self._toggle_file(commit_index, file_index)
+        self.post_message(self.ChangedActiveFile())
 
     def action_toggle_file(self):
         """Toggle the status of the selected file indicator"""
@@ -153,11 +440,31 @@ class FileGrid(Grid):
         """Toggle the file indicator at these coordinates
 
         If there is no indicator at this location, just a blank space, then nothing will
-        happen.
+        happen. If there is a directory indicator, the directory is expanded.
         """
+        if not self._has_cell(
+            commit_index, self._rebase_items[commit_index], file_index
+        ):
+            return
+
+        file = self._column_paths[file_index]
+        if file in self._directory_columns:
+            self._expand_directory(file)
+            return
+
+        # In a collapsed squash group, the file is toggled in all the group's items. It is
+        # shown as included if any of them include it.
+        group = self._collapsed_groups.get(commit_index)
+        if group is not None:
+            self.post_message(
+                self.SetFileStatus(
+                    commit_index, file, group.files[file].num_included == 0
+                )
+            )
+            return
+
         # Check if there is a file change in the clicked region, or just a blank space.
-        file = self._visible_files[file_index]
-        file_change = self._rebase_items[commit_index].file_changes.get(file)
+        file_change = self._get_file_change(self._rebase_items[commit_index], file)
         if file_change is None:
             return
 
@@ -179,10 +486,115 @@ class FileGrid(Grid):
         else:
             self._last_hovered_file = None
 
+    def _get_row_indices(self) -> List[int]:
+        """Get the index of the rebase item shown in each row"""
+        if self._visible_indices is None:
+            return list(range(len(self._rebase_items)))
+        return self._visible_indices
+
+    def _has_cell(self, index: int, item: RebaseItem, position: int) -> bool:
+        """Check if a rebase item (row) has an indicator in a column, rather than a blank space"""
+        column_path = self._column_paths[position]
+        if column_path in self._directory_columns:
+            return self._get_directory_stats(index, column_path) is not None
+
+        group = self._collapsed_groups.get(index)
+        if group is not None:
+            return column_path in group.files
+        return self._get_file_change(item, column_path) is not None
+
+    def _get_file_change(
+        self, item: RebaseItem, file: str | os.PathLike[str]
+    ) -> Optional[OptionalFile]:
+        """Get the change to the file in a column, which the item may have under another path"""
+        path = self._rename_index.find_path(item.file_changes, file)
+        if path is None:
+            return None
+        return item.file_changes[path]
+
+    def _get_directory_stats(
+        self, index: int, directory: str
+    ) -> Optional[DirectoryStats]:
+        """Get the stats of a directory in a row, which adds up a collapsed squash group"""
+        group = self._collapsed_groups.get(index)
+        if group is None:
+            return self._aggregation.get_stats(index, directory)
+
+        result = None
+        for i in range(group.start, group.end):
+            stats = self._aggregation.get_stats(i, directory)
+            if stats is None:
+                continue
+            if result is None:
+                result = DirectoryStats()
+            result.add(stats)
+        return result
+
+    def _get_row_classes(self, index: int) -> str:
+        classes = []
+        if index == self._active_index:
+            classes.append("active")
+        if index in self._highlighted_indices:
+            classes.append("selected")
+        return " ".join(classes)
+
+    def _create_cell(
+        self, index: int, item: RebaseItem, position: int, classes: str
+    ) -> Widget:
+        """Create the widget for a rebase item (row) and a visible file (column)"""
+        active = (
+            index == self._active_index
+            and position == self._active_file_index
+            and isinstance(item, RebaseItem)
+        )
+
+        file = self._column_paths[position]
+        if file in self._directory_columns:
+            stats = self._get_directory_stats(index, file)
+            if stats is None:
+                return Label("")
+            return DirectoryChangeIndicator(stats, active, classes=classes)
+
+        group = self._collapsed_groups.get(index)
+        if group is not None:
+            stats = group.files.get(file)
+            if stats is None:
+                return Label("")
+            return FileChangeIndicator(
+                stats.get_change_type(), stats.num_included > 0, active, classes=classes
+            )
+
+        file_change = self._get_file_change(item, file)
+        if not file_change:
+            return Label("")
+
+        change_type = item.stats.files[file_change.path]["change_type"]
+
+        return FileChangeIndicator(
+            change_type, file_change.included, active, classes=classes
+        )
+
+    @traced_compose("FileGrid.compose")
     def compose(self):
+        # The columns are only tracked when there is one column per file, so they can be shown
+        # and hidden individually.
+        if self._directory_depth is None:
+            self._columns = {file_id: [] for file_id in self._visible_file_ids}
+            column_widgets = [
+                self._columns[file_id] for file_id in self._visible_file_ids
+            ]
+        else:
+            self._columns = {}
+            column_widgets = [[] for _ in self._column_paths]
+
         # header row
-        for file in self._visible_files:
-            yield FilenameLabel(file, classes="filename")
+        for column_path, widgets in zip(self._column_paths, column_widgets):
+            classes = "filename"
+            if column_path in self._directory_columns:
+                classes += " directory"
+            label = FilenameLabel(column_path, classes=classes)
+            widgets.append(label)
+            yield label
 
         # make boolean array from self._highlighted_indices
         highlighted = [False] * len(self._rebase_items)
@@ -190,7 +602,8 @@ class FileGrid(Grid):
             highlighted[i] = True
 
         # commit rows
-        for i, item in enumerate(self._rebase_items):
+        for i in self._get_row_indices():
+            item = self._rebase_items[i]
             classes = []
             if i == self._active_index:
                 classes.append("active")
@@ -198,23 +611,10 @@ class FileGrid(Grid):
                 classes.append("selected")
             classes = " ".join(classes)
 
-            for j, file in enumerate(self._visible_files):
-                file_change = item.file_changes.get(file)
-                if not file_change:
-                    yield Label("")
-                    continue
-
-                change_type = item.commit.stats.files[file_change.path]["change_type"]
-
-                active = (
-                    i == self._active_index
-                    and j == self._active_file_index
-                    and isinstance(item, RebaseItem)
-                )
-
-                yield FileChangeIndicator(
-                    change_type, file_change.included, active, classes=classes
-                )
+            for j, widgets in enumerate(column_widgets):
+                cell = self._create_cell(i, item, j, classes)
+                widgets.append(cell)
+                yield cell
 
 
 class FileChangeIndicator(Widget):
@@ -241,14 +641,6 @@ class FileChangeIndicator(Widget):
         self._active = active
 
     def render(self):
-        change_type_colours = {
-            "A": "green",
-            "D": "red",
-            "M": "orange",
-            "R": "green",
-            "T": "blue",
-        }
-
         content = (
             self._change_type
         )  # single letter indicated type of changed (added, deleted, etc.)
@@ -259,9 +651,49 @@ class FileChangeIndicator(Widget):
 
         if self._included:
             # File hasn't been excluded by user. Make it coloured
-            content = f"[{change_type_colours[self._change_type]}]{content}[/]"
+            content = f"[{CHANGE_TYPE_COLOURS[self._change_type]}]{content}[/]"
         else:
             # File has been excluded by user. Make it non-coloured and add strikethrough.
             content = f"[strike]{content}[/]"
 
         return content
+
+
+class DirectoryChangeIndicator(Widget):
+    """An indicator to show in the FileGrid for all the file changes in a directory
+
+    It shows the change type (see FileChangeIndicator), the number of included files out of
+    the total, and the number of lines changed.
+
+    :param stats: The file changes in the directory, added together.
+    :param active: True if the user's cursor is hovering over this indicator (text cursor, not mouse).
+    """
+
+    def __init__(
+        self,
+        stats: DirectoryStats,
+        active: bool,
+        *args,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self._stats = stats
+        self._active = active
+
+        self.styles.width = "auto"
+
+    def render(self):
+        change_type = self._stats.get_change_type()
+        num_files = self._stats.num_included + self._stats.num_excluded
+
+        content = change_type
+        if self._active:
+            content = f"[on white]{content}[/]"
+
+        if self._stats.num_included > 0:
+            content = f"[{CHANGE_TYPE_COLOURS[change_type]}]{content}[/]"
+        else:
+            # All the files have been excluded by the user.
+            content = f"[strike]{content}[/]"
+
+        return f"{content} {self._stats.num_included}/{num_files} ~{self._stats.lines_changed}"
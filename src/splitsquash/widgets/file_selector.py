@@ -1,6 +1,6 @@
 import os.path
 from os import PathLike
-from typing import Iterable, Dict, List, Set
+from typing import Iterable, Dict, List, Optional, Set
 
 from rich.style import Style
 from rich.text import Text
@@ -10,13 +10,30 @@ from textual.message import Message
 from textual.widgets import Tree
 from textual.widgets._tree import TreeNode, TreeDataType
 
+from splitsquash.path_patterns import PathIndex, compile_path_pattern
 from splitsquash.types import OptionalFile
 
+# the placeholder of the inputs used to type patterns for FileSelector.apply_pattern
+PATTERN_PLACEHOLDER = "Select files, e.g. *.lock, vendor/, re:<regex> or !<pattern>"
+
 
 class FileSelector(Tree):
     class ChangedActiveFiles(Message):
-        def __init__(self, active_files: List[str | PathLike]):
+        """Posted when the user changes the active files
+
+        As well as the full list of active files, the files that were activated and
+        deactivated by this change are given, so receivers can update incrementally.
+        """
+
+        def __init__(
+            self,
+            active_files: List[str | PathLike],
+            added_files: List[str | PathLike],
+            removed_files: List[str | PathLike],
+        ):
             self.active_files = active_files
+            self.added_files = added_files
+            self.removed_files = removed_files
             super().__init__()
 
     def __init__(
@@ -35,6 +52,12 @@ class FileSelector(Tree):
         self._mouse_button = None
 
         self._common_path = ""
+        # full paths of the active leaf nodes, used to work out what changed on each click
+        self._active_files: Set[str | PathLike] = set()
+        # the leaf node of each file, keyed by its full path
+        self._leaf_nodes: Dict[str | PathLike, TreeNode[str]] = {}
+        # built the first time a pattern is applied, see apply_pattern
+        self._path_index: Optional[PathIndex] = None
 
         self.set_data(files, recompose=False)
 
@@ -44,9 +67,13 @@ class FileSelector(Tree):
         recompose: bool = True,
     ):
         """Re-create the file hierarchy with the given file changes"""
+        self._leaf_nodes = {}
+        self._path_index = None
+
         if len(optional_files) == 0:
             self._common_path = ""
             self.reset("", data={"path": "", "active": True})
+            self._active_files = set(self._get_active_file_paths())
             if recompose:
                 self.refresh(recompose=True)
             return
@@ -57,6 +84,8 @@ class FileSelector(Tree):
                 optional_file.path,
                 data={"path": optional_files[0].path, "active": optional_file.included},
             )
+            self._leaf_nodes[optional_file.path] = self.root
+            self._active_files = set(self._get_active_file_paths())
             if recompose:
                 self.refresh(recompose=True)
             return
@@ -98,6 +127,12 @@ class FileSelector(Tree):
                     },
                 )
 
+        for node_path, node in nodes.items():
+            if len(node.children) == 0:
+                self._leaf_nodes[os.path.join(self._common_path, node_path)] = node
+
+        self._active_files = set(self._get_active_file_paths())
+
         if recompose:
             self.refresh(recompose=True)
 
@@ -118,12 +153,73 @@ class FileSelector(Tree):
             self.set_nodes_active(self.root, False)
 
         self.set_nodes_active(node, make_selected_active)
+        self._post_changed_active_files()
+
+    def apply_pattern(self, pattern: str) -> int:
+        """Activate every file that matches a pattern, and return the number of matches
+
+        The other files keep their state. If the pattern starts with "!", the matching files
+        are deactivated instead, e.g. "!**" deactivates every file. See
+        splitsquash.path_patterns for the pattern syntax. A ValueError is raised if the
+        pattern isn't valid.
+
+        The paths are indexed the first time a pattern is applied, and the index is kept
+        until the files change, so each pattern only costs one pass over the distinct file
+        names or directories.
+        """
+        active = not pattern.startswith("!")
+        compiled_pattern = compile_path_pattern(pattern if active else pattern[1:])
+
+        if self._path_index is None:
+            self._path_index = PathIndex(str(path) for path in self._leaf_nodes)
+        matching_files = self._path_index.match(compiled_pattern)
+
+        changed = False
+        for path in matching_files:
+            node = self._leaf_nodes[path]
+            changed = changed or node.data["active"] != active
+            node.data["active"] = active
+        if not changed:
+            return len(matching_files)
+        self._update_directories_active(self.root)
+
+        # The line cache of every node is keyed on the root, so this redraws all of them.
+        self.root.refresh()
+        self.refresh()
+
+        self._post_changed_active_files()
+        return len(matching_files)
+
+    @classmethod
+    def _update_directories_active(cls, node: TreeNode[str]) -> bool:
+        """Mark each directory as active if all the files in it are, and return whether node is"""
+        if len(node.children) > 0:
+            children_active = [
+                cls._update_directories_active(child) for child in node.children
+            ]
+            node.data["active"] = all(children_active)
+        return node.data["active"]
+
+    def _post_changed_active_files(self):
+        """Post the active files, and the files activated and deactivated since the last post"""
+        active_files = self._get_active_file_paths()
+        new_active_files = set(active_files)
+        added_files = [path for path in active_files if path not in self._active_files]
+        removed_files = [
+            path for path in self._active_files if path not in new_active_files
+        ]
+        self._active_files = new_active_files
+
+        self.post_message(
+            self.ChangedActiveFiles(active_files, added_files, removed_files)
+        )
 
-        active_files = self.get_active_files(self.root)
-        active_files = [
-            os.path.join(self._common_path, rel_path) for rel_path in active_files
+    def _get_active_file_paths(self) -> List[str | PathLike]:
+        """Get the full paths of all the active files"""
+        return [
+            os.path.join(self._common_path, rel_path)
+            for rel_path in self.get_active_files(self.root)
         ]
-        self.post_message(self.ChangedActiveFiles(active_files))
 
     @classmethod
     def get_active_files(cls, node: TreeNode[str]):
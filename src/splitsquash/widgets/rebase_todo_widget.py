@@ -1,28 +1,40 @@
-from typing import Literal, Optional
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, Literal, Optional, Set, List, Tuple
 
 from textual.containers import Horizontal, Vertical
 from textual.events import Key
 from textual.message import Message
 from textual.widget import Widget
-from textual.widgets import Label
+from textual.widgets import Label, Input
 
+from splitsquash.rebase_todo.autosquash import autosquash
 from splitsquash.rebase_todo.rebase_todo_interactions import (
     RebaseItemMover,
     RebaseItemDistributor,
 )
 from splitsquash.rebase_todo.rebase_todo_state import RebaseTodoStateAndCursor
-from splitsquash.types import RebaseItem, RebaseAction
-from splitsquash.utility_functions import get_files_modified
+from splitsquash.rebase_todo.squash_groups import SquashGroups
+from splitsquash.tracing import traced, traced_compose
+from splitsquash.types import RebaseAction
 from splitsquash.widgets.commit_grid import CommitGrid
 from splitsquash.widgets.file_grid import FileGrid
+from splitsquash.widgets.reword_screen import RewordScreen
 
 
 class RebaseTodoWidget(Widget):
     CSS_PATH = "../styles/main.tcss"
 
+    # The children are updated at most this many times per second. Any changes made between
+    # updates are shown together in the next update.
+    MAX_UPDATES_PER_SECOND = 60
+
     class Updated(Message):
         pass
 
+    class ChangedActiveFile(Message):
+        """Posted when the (text) cursor moves to a different file in the file grid"""
+
     def __init__(
         self,
         rebase_todo_state: RebaseTodoStateAndCursor,
@@ -40,12 +52,36 @@ class RebaseTodoWidget(Widget):
         self._todo_state = rebase_todo_state
         self._state: Literal["idle", "moving", "distributing"] = "idle"
 
+        # True if the rebase todo has changed since the children were last updated. This
+        # happens when the todo is modified by another widget e.g. one in another tab.
+        self._out_of_date = False
+        self._todo_state.add_listener(self._on_todo_state_changed)
+
+        # The row number typed while moving commits, before pressing G to move them there.
+        self._typed_row_number = ""
+
+        # The hashes of the commits matching the search query, or None if there is no search.
+        # Only the matching rebase items are shown.
+        self._search_matches: Optional[Set[str]] = None
+
+        # In the grouped view, each item and the fixups and squashes after it are shown as one
+        # row, unless the group has been expanded. Expanded groups are stored by the hash of
+        # their first commit, so they stay expanded when they move.
+        self._grouped = False
+        self._squash_groups = SquashGroups(self._todo_state.get_rename_index())
+        self._expanded_groups: Set[str] = set()
+
+        # scheduling for request_update()
+        self._update_requested = False
+        self._last_update_time = 0.0
+
         # classes providing stateful user interactions
         self._item_mover = RebaseItemMover(self._todo_state)
         self._item_distributor = RebaseItemDistributor(self._todo_state)
 
         # children
         self._status_label: Optional[Label] = None
+        self._search_input: Optional[Input] = None
         self._commit_grid: Optional[CommitGrid] = None
         self._file_grid: Optional[FileGrid] = None
 
@@ -53,7 +89,33 @@ class RebaseTodoWidget(Widget):
     def file_grid(self):
         return self._file_grid
 
+    def _on_todo_state_changed(self):
+        self._out_of_date = True
+
+    def update_state_if_out_of_date(self):
+        """Update the children if the rebase todo was changed since they were last updated
+
+        Any interaction in progress is cancelled, as its indices may no longer be valid.
+        """
+        if not self._out_of_date or self._commit_grid is None:
+            return
+
+        if self._state == "moving":
+            self._item_mover.stop_moving()
+            self._typed_row_number = ""
+        elif self._state == "distributing":
+            self._item_distributor.reset()
+        self._state = "idle"
+
+        self.update_state()
+
     def on_key(self, event: Key):
+        if self._search_input.has_focus:
+            # The other keys are used to type the search query.
+            if event.key == "escape":
+                self.action_clear_search()
+            return
+
         if self._state != "idle":
             # These are the only actions that can be performed in a non-idle state.
             if event.key == "j":
@@ -66,8 +128,20 @@ class RebaseTodoWidget(Widget):
                 self.action_distribute()
             if event.key == "v":
                 self.action_select()
+            if self._state == "moving":
+                if event.key.isdigit():
+                    self._typed_row_number += event.key
+                    self.request_update()
+                if event.key == "g":
+                    self.action_move_commits_to_top()
+                if event.key == "G":
+                    self.action_move_commits_to_bottom_or_row()
             return
 
+        if event.key in ("h", "l", "t", "u"):
+            # The file grid uses its own copy of the cursor, so it must be up to date.
+            self._update_state_if_requested()
+
         if event.key == "j":
             self.action_move_down()
         if event.key == "k":
@@ -88,52 +162,87 @@ class RebaseTodoWidget(Widget):
             self._set_rebase_action("edit")
         if event.key == "r":
             self._set_rebase_action("reword")
+        if event.key == "R":
+            self.action_reword()
         if event.key == "d":
             self._set_rebase_action("drop")
         if event.key == "m":
             self.action_move_commits()
         if event.key == "c":
             self.action_copy()
+        if event.key == "A":
+            self.action_autosquash()
         if event.key == "t" and self._file_grid is not None:
             self._file_grid.action_toggle_file()
+        if event.key == "a":
+            self.action_toggle_directory_columns()
+        if event.key == "left_square_bracket":
+            self.action_change_directory_depth(-1)
+        if event.key == "right_square_bracket":
+            self.action_change_directory_depth(1)
+        if event.key == "u" and self._file_grid is not None:
+            self._file_grid.action_collapse_directory()
         if event.key == "ctrl+a":
             self.action_select_all()
         if event.key == "ctrl+z":
             self._todo_state.undo()
-            self.update_state()
+            self.request_update()
         if event.key == "ctrl+y":
             self._todo_state.redo()
-            self.update_state()
+            self.request_update()
         if event.key == "q":
             self.action_distribute()
+        if event.key == "z":
+            self.action_toggle_grouped()
+        if event.key == "o":
+            self.action_toggle_group()
+        if event.key == "slash":
+            self.action_search()
+        if event.key == "escape":
+            self.action_clear_search()
 
     def on_commit_grid_clicked_commit(self, event):
+        if self._state == "moving":
+            self._item_mover.move_before(event.commit_index)
+            self.request_update()
+            return
+
         self._todo_state.set_cursor(event.commit_index)
         self._todo_state.select_single(event.commit_index)
-        self.update_state()
+        self.request_update()
+
+    def on_file_grid_changed_active_file(self, event):
+        # The file grid's message doesn't bubble past this widget when it's posted from one of
+        # this widget's key handlers, so pass it on as this widget's own message.
+        event.stop()
+        self.post_message(self.ChangedActiveFile())
 
     def on_file_grid_set_file_status(self, event):
-        # find rebase item to modify
+        # find rebase items to modify. A collapsed squash group is modified as a whole.
         rebase_items = list(self._todo_state.get_current_items())
-        rebase_item: RebaseItem = rebase_items[event.commit_index]
+        start, end = self._get_row_range(event.commit_index)
 
-        # set file change status
-        file_change = rebase_item.file_changes[event.file_path]
-        file_change.included = event.included
+        # set file change status. The items may have the file under another path, if it was
+        # renamed.
+        rename_index = self._todo_state.get_rename_index()
+        for rebase_item in rebase_items[start:end]:
+            path = rename_index.find_path(rebase_item.file_changes, event.file_path)
+            if path is not None:
+                rebase_item.file_changes[path].included = event.included
 
         # select modified commit
         self._todo_state.set_cursor(event.commit_index)
 
         # modify item and update
         self._todo_state.modify_items(tuple(rebase_items))
-        self.update_state()
+        self.request_update()
 
     def action_distribute(self):
         if self._state == "idle":
             picked_valid_sources = self._item_distributor.pick_sources()
             if picked_valid_sources:
                 self._state = "distributing"
-                self.update_state()
+                self.request_update()
         elif self._state == "distributing":
             picked_valid_targets = self._item_distributor.pick_targets()
             if picked_valid_targets:
@@ -144,47 +253,278 @@ class RebaseTodoWidget(Widget):
                 self._item_distributor.reset()
 
             self._state = "idle"
-            self.update_state()
+            self.request_update()
 
     def action_copy(self):
-        self._todo_state.insert_item(
-            self._todo_state.get_active_item(), self._todo_state.cursor
+        # The commands after the item (e.g. update-ref) stay with the original.
+        new_item = self._todo_state.get_active_item()
+        new_item.following_commands = []
+        self._todo_state.insert_item(new_item, self._todo_state.cursor)
+        self.request_update()
+
+    def action_autosquash(self):
+        """Move every fixup!, squash! and amend! commit after its target, as one undo step"""
+        rebase_items, num_changed = autosquash(self._todo_state.get_current_items())
+        if num_changed == 0:
+            self.notify(
+                "There are no fixup!, squash! or amend! commits to move, or they're "
+                "already after their targets."
+            )
+            return
+
+        self._todo_state.modify_items(tuple(rebase_items), clear_selection=True)
+        self.request_update()
+
+    def action_reword(self):
+        """Edit the messages of the selected items, one after the other"""
+        rebase_items = self._todo_state.get_current_items(copy=False)
+        self.app.push_screen(
+            RewordScreen(
+                [(i, rebase_items[i]) for i in self._todo_state.get_indices_to_modify()]
+            ),
+            self._set_new_messages,
         )
-        self.update_state()
+
+    def _set_new_messages(self, new_messages: Dict[int, str]):
+        """Give the items their new messages, as one undo step
+
+        Picks are marked as reworded. The messages are applied while the rebase runs, so
+        git doesn't stop to reword them.
+        """
+        if len(new_messages) == 0:
+            return
+
+        rebase_items = self._todo_state.get_current_items()
+        for i, message in new_messages.items():
+            rebase_items[i].new_message = message
+            if rebase_items[i].action == "pick":
+                rebase_items[i].action = "reword"
+
+        self._todo_state.modify_items(rebase_items)
+        self.request_update()
 
     def action_move_commits(self):
         if self._state == "idle":
             self._item_mover.start_moving()
             self._state = "moving"
-            self.update_state()
+            self.request_update()
         elif self._state == "moving":
             self._item_mover.stop_moving()
             self._state = "idle"
-            self.update_state()
+            self._typed_row_number = ""
+            self.request_update()
+
+    def action_move_commits_to_top(self):
+        if self._state == "moving":
+            self._item_mover.move_to_top()
+            self._typed_row_number = ""
+            self.request_update()
+
+    def action_move_commits_to_bottom_or_row(self):
+        """Move the commits to the row number that was typed, or to the bottom if none was typed
+
+        Rows are numbered from 1.
+        """
+        if self._state != "moving":
+            return
+
+        if self._typed_row_number:
+            self._item_mover.move_to(int(self._typed_row_number) - 1)
+        else:
+            self._item_mover.move_to_bottom()
+        self._typed_row_number = ""
+        self.request_update()
 
     def action_move_up(self):
+        visible_indices = self._get_visible_indices()
         if self._state == "moving":
-            self._item_mover.move_up()
-            self.update_state()
+            self._item_mover.move_up(self._get_num_items_to_move_past(-1))
+            self.request_update()
+        elif visible_indices is not None:
+            # move to the previous row, skipping items that are hidden by the search or
+            # collapsed groups
+            i = bisect_left(visible_indices, self._todo_state.cursor)
+            if i > 0:
+                self._todo_state.set_cursor(visible_indices[i - 1])
+            self.request_update()
         else:
             self._todo_state.move_cursor("dec")
-            self.update_state()
+            self.request_update()
 
     def action_move_down(self):
+        visible_indices = self._get_visible_indices()
         if self._state == "moving":
-            self._item_mover.move_down()
-            self.update_state()
+            self._item_mover.move_down(self._get_num_items_to_move_past(1))
+            self.request_update()
+        elif visible_indices is not None:
+            # move to the next row, skipping items that are hidden by the search or collapsed
+            # groups
+            i = bisect_right(visible_indices, self._todo_state.cursor)
+            if i < len(visible_indices):
+                self._todo_state.set_cursor(visible_indices[i])
+            self.request_update()
         else:
             self._todo_state.move_cursor("inc")
-            self.update_state()
+            self.request_update()
+
+    def _get_num_items_to_move_past(self, direction: Literal[-1, 1]) -> int:
+        """Get the number of items in the row next to the moving items, in this direction
+
+        In the grouped view, the moving items skip over a whole collapsed group, so they
+        don't end up between its first item and its fixups and squashes.
+        """
+        if not self._grouped:
+            return 1
+
+        moving_indices = self._item_mover.get_moving_indices()
+        if direction < 0:
+            neighbour = moving_indices[0] - 1
+        else:
+            neighbour = moving_indices[-1] + 1
+        if not 0 <= neighbour < self._todo_state.get_current_num_items():
+            return 1
+
+        self._update_squash_groups()
+        start, end = self._get_row_range(neighbour)
+        if direction < 0:
+            return neighbour - start + 1
+        return end - neighbour
+
+    def action_toggle_directory_columns(self):
+        """Switch the file grid between one column per file and one column per directory"""
+        if self._file_grid is None:
+            return
+
+        if self._file_grid.directory_depth is None:
+            self._file_grid.set_directory_depth(1, recompose=True)
+        else:
+            self._file_grid.set_directory_depth(None, recompose=True)
+
+    def action_change_directory_depth(self, change: int):
+        """Show the directories of the file grid at a deeper or shallower depth"""
+        if self._file_grid is None or self._file_grid.directory_depth is None:
+            return
+
+        self._file_grid.set_directory_depth(
+            self._file_grid.directory_depth + change, recompose=True
+        )
+
+    def action_toggle_grouped(self):
+        """Switch between one row per item, and one row per squash group"""
+        self._grouped = not self._grouped
+        self._expanded_groups = set()
+        self.request_update()
+
+    def action_toggle_group(self):
+        """Expand or collapse the squash group under the cursor"""
+        if not self._grouped:
+            return
+
+        self._update_squash_groups()
+        key = self._squash_groups.get_group_key(self._todo_state.cursor)
+        if key in self._expanded_groups:
+            self._expanded_groups.remove(key)
+        else:
+            self._expanded_groups.add(key)
+        self.request_update()
+
+    def action_search(self):
+        """Show the search bar, and focus it"""
+        self._search_input.display = True
+        self._search_input.focus()
+
+    def action_clear_search(self):
+        """Hide the search bar, and show all the rebase items again"""
+        self._search_input.value = ""
+        self._search_input.display = False
+        self._search_matches = None
+        self.focus()
+        self.request_update()
+
+    def on_input_changed(self, event: Input.Changed):
+        if event.input is not self._search_input:
+            return
+
+        if event.value:
+            search_index = self._todo_state.get_search_index()
+            self._search_matches = search_index.search(event.value)
+
+            # move the cursor to a matching item, if it isn't on one already
+            visible_indices = self._get_visible_indices()
+            if (
+                len(visible_indices) > 0
+                and self._todo_state.cursor not in visible_indices
+            ):
+                self._todo_state.set_cursor(visible_indices[0])
+        else:
+            self._search_matches = None
+
+        self.request_update()
+
+    def on_input_submitted(self, event: Input.Submitted):
+        if event.input is self._search_input:
+            # Keep the search results, and go back to editing the rebase todo.
+            self.focus()
+
+    def _update_squash_groups(self):
+        self._squash_groups.update_items(self._todo_state.get_current_items(copy=False))
+
+    def _get_visible_indices(self) -> Optional[List[int]]:
+        """Get the indices of the rebase items shown in each row, or None if they are all shown
+
+        Only the items that match the search are shown. In the grouped view, a collapsed
+        group is shown as its first item, if any of its items match.
+        """
+        if self._search_matches is None and not self._grouped:
+            return None
+
+        rebase_items = self._todo_state.get_current_items(copy=False)
+        if not self._grouped:
+            return [
+                i
+                for i, item in enumerate(rebase_items)
+                if item.commit.hexsha in self._search_matches
+            ]
+
+        self._update_squash_groups()
+        visible_indices = self._squash_groups.get_visible_indices(self._expanded_groups)
+        if self._search_matches is None:
+            return visible_indices
+
+        return [
+            i
+            for i in visible_indices
+            if any(
+                item.commit.hexsha in self._search_matches
+                for item in rebase_items[slice(*self._get_row_range(i))]
+            )
+        ]
+
+    def _get_row_range(self, index: int) -> Tuple[int, int]:
+        """Get the start and end of the items in the row shown at this index
+
+        This is the whole group for a collapsed squash group, or just the item otherwise.
+        """
+        if self._grouped and self._squash_groups.is_collapsed(
+            index, self._expanded_groups
+        ):
+            return self._squash_groups.get_range(index)
+        return index, index + 1
 
     def action_select(self):
-        self._todo_state.toggle_active_item()
-        self.update_state()
+        start, end = self._get_row_range(self._todo_state.cursor)
+        if end - start == 1:
+            self._todo_state.toggle_active_item()
+        else:
+            # select or deselect the whole collapsed group, so it's moved as one
+            selected = self._todo_state.get_selected()
+            selected[start:end] = [not selected[start]] * (end - start)
+            self._todo_state.set_selected(selected)
+        self.request_update()
 
     def action_select_all(self):
         self._todo_state.toggle_select_all_or_none()
-        self.update_state()
+        self.request_update()
 
     def _set_rebase_action(self, action: RebaseAction):
         rebase_items = self._todo_state.get_current_items()
@@ -193,36 +533,87 @@ class RebaseTodoWidget(Widget):
             rebase_items[i].action = action
 
         self._todo_state.modify_items(rebase_items)
-        self.update_state()
+        self.request_update()
+
+    def request_update(self):
+        """Update the state of all the children at the next frame
+
+        Call this after updating any of the state. Requests made before the next frame are
+        combined into one update. This means that when a key is held down, all the queued
+        key events are applied to the state before the children are refreshed once.
+        """
+        if self._update_requested:
+            return
+        self._update_requested = True
+
+        delay = (
+            self._last_update_time + 1 / self.MAX_UPDATES_PER_SECOND - time.monotonic()
+        )
+        if delay > 0:
+            self.set_timer(delay, self._update_state_if_requested)
+        else:
+            # Run after the messages that are already queued e.g. repeated key events.
+            self.call_later(self._update_state_if_requested)
 
+    @property
+    def update_pending(self) -> bool:
+        """Whether an update has been requested, but hasn't happened yet"""
+        return self._update_requested
+
+    def _update_state_if_requested(self):
+        """Run the update requested by request_update() now, if there is one"""
+        if self._update_requested:
+            self.update_state()
+
+    @traced(
+        "RebaseTodoWidget.update_state",
+        get_args=lambda self, *args, **kwargs: {"num_children": len(self.children)},
+    )
     def update_state(
         self,
         recompose: bool = True,
         notify_other_widets: bool = True,
     ):
-        """Update the state of all the children, and refresh them
+        """Update the state of all the children, and refresh them immediately
 
-        Call this after updating any of the state.
+        Prefer request_update(), unless the children need to be updated straight away.
         """
+        self._update_requested = False
+        self._last_update_time = time.monotonic()
 
         rebase_items = self._todo_state.get_current_items()
+        self._out_of_date = False
 
         if self._state == "moving":
             highlighted_indices = self._item_mover.get_moving_indices()
         else:
             highlighted_indices = self._todo_state.get_selected_indices()
 
-        status_text = (
-            "Select commits to distribute into..."
-            if self._state == "distributing"
-            else ""
-        )
+        if self._state == "distributing":
+            status_text = "Select commits to distribute into..."
+        elif self._state == "moving" and self._typed_row_number:
+            status_text = f"Press G to move to row {self._typed_row_number}"
+        else:
+            status_text = ""
         self._status_label.update(status_text)
 
+        visible_indices = self._get_visible_indices()
+        if self._grouped:
+            # The cursor stays on the first item of a collapsed group.
+            start, _ = self._get_row_range(self._todo_state.cursor)
+            self._todo_state.set_cursor(start)
+            collapsed_groups = self._squash_groups.get_collapsed_groups(
+                visible_indices, self._expanded_groups
+            )
+        else:
+            collapsed_groups = None
+
         self._commit_grid.update_state(
             rebase_items,
             self._todo_state.cursor if self._state != "moving" else None,
             highlighted_indices,
+            visible_indices=visible_indices,
+            collapsed_groups=collapsed_groups,
         )
 
         if self._file_grid is not None:
@@ -230,6 +621,8 @@ class RebaseTodoWidget(Widget):
                 rebase_items,
                 self._todo_state.cursor if self._state != "moving" else None,
                 highlighted_indices,
+                visible_indices=visible_indices,
+                collapsed_groups=collapsed_groups,
             )
 
         if recompose:
@@ -240,6 +633,7 @@ class RebaseTodoWidget(Widget):
         if notify_other_widets:
             self.post_message(self.Updated())
 
+    @traced_compose("RebaseTodoWidget.compose")
     def compose(self):
         # The left half of the widget shows the rebase actions, hashes, and commit messages. The
         # right half shows the file changes. The right half is scrollable horizontally. Both halves
@@ -248,16 +642,19 @@ class RebaseTodoWidget(Widget):
         # Instantiate the children as empty widgets, then populate them with state
 
         self._status_label = Label()
+        self._search_input = Input(placeholder="Search hashes, messages and files")
+        self._search_input.display = False
         self._commit_grid = CommitGrid()
 
         if self._show_files:
-            files = get_files_modified(self._todo_state.get_original_items())
-            self._file_grid = FileGrid(files)
+            files = self._todo_state.get_files_by_co_change()
+            self._file_grid = FileGrid(files, self._todo_state.get_rename_index())
 
         self.update_state()
 
         with Vertical():
             yield self._status_label
+            yield self._search_input
 
             with Horizontal():
                 yield self._commit_grid
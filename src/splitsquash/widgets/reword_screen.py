@@ -0,0 +1,73 @@
+from typing import Dict, List, Tuple
+
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.widgets import Label, TextArea
+
+from splitsquash.types import RebaseItem
+
+
+class RewordScreen(ModalScreen[Dict[int, str]]):
+    """Edits the messages of some rebase items, one after the other
+
+    Each message is only read when its item is shown, so the full messages don't have to be
+    loaded for every item up front. The screen is dismissed with the new message of each
+    item that was saved, keyed by the item's index. Items whose message wasn't changed are
+    left out.
+
+    :param rebase_items: The index and item of each rebase item to edit, in order.
+    """
+
+    BINDINGS = [
+        ("ctrl+s", "save", "Save the message, and edit the next one."),
+        ("escape", "finish", "Stop editing, and keep the messages saved so far."),
+    ]
+
+    def __init__(self, rebase_items: List[Tuple[int, RebaseItem]], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._rebase_items = rebase_items
+        # the position in self._rebase_items of the item being edited
+        self._position = 0
+        self._new_messages: Dict[int, str] = {}
+
+        self._title_label = Label()
+        self._text_area = TextArea()
+
+    def on_mount(self):
+        self._show_item()
+
+    def _show_item(self):
+        _, item = self._rebase_items[self._position]
+        self._title_label.update(
+            f"Reword {item.commit.hexsha[:7]} "
+            f"({self._position + 1}/{len(self._rebase_items)}). "
+            "Press ctrl+s to save, or escape to stop."
+        )
+        self._text_area.load_text(item.message)
+        self._text_area.focus()
+
+    def action_save(self):
+        index, item = self._rebase_items[self._position]
+
+        # Trailing whitespace is removed, like git commit does.
+        message = self._text_area.text.rstrip() + "\n"
+        if message.strip() == "":
+            self.notify("The message can't be empty.", severity="error")
+            return
+        if message.rstrip() != item.message.rstrip():
+            self._new_messages[index] = message
+
+        self._position += 1
+        if self._position == len(self._rebase_items):
+            self.dismiss(self._new_messages)
+        else:
+            self._show_item()
+
+    def action_finish(self):
+        self.dismiss(self._new_messages)
+
+    def compose(self):
+        with Vertical(classes="popup"):
+            yield self._title_label
+            yield self._text_area
@@ -0,0 +1,75 @@
+import subprocess
+from typing import Callable
+
+import pytest
+from git import Commit, Repo, Stats
+from gitdb.util import hex_to_bin
+
+from splitsquash.types import RebaseItem
+
+Git = Callable[..., str]
+
+
+@pytest.fixture
+def repo_dir(tmp_path) -> str:
+    """An empty git repository, with a user set so commits can be made"""
+    repo_dir = str(tmp_path / "repo")
+    subprocess.run(["git", "init", "-q", "-b", "main", repo_dir], check=True)
+    subprocess.run(["git", "config", "user.name", "Test"], cwd=repo_dir, check=True)
+    subprocess.run(
+        ["git", "config", "user.email", "test@example.com"], cwd=repo_dir, check=True
+    )
+    return repo_dir
+
+
+@pytest.fixture
+def git(repo_dir) -> Git:
+    """Run a git command in the test repository, and return its output"""
+
+    def run_git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args],
+            cwd=repo_dir,
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+        ).stdout
+
+    return run_git
+
+
+@pytest.fixture
+def commit_file(repo_dir, git) -> Callable[[str, str, str], str]:
+    """Write a file and commit it, and return the hash of the new commit"""
+
+    def commit(path: str, content: str, message: str) -> str:
+        with open(f"{repo_dir}/{path}", "w") as f:
+            f.write(content)
+        git("add", path)
+        git("commit", "-q", "-m", message)
+        return git("rev-parse", "HEAD").strip()
+
+    return commit
+
+
+@pytest.fixture
+def make_item(repo_dir) -> Callable[..., RebaseItem]:
+    """Make a rebase item for a commit that isn't in the repository
+
+    The commit adds one file, named after its hash.
+    """
+    repo = Repo(repo_dir)
+
+    def make(hexsha: str, message: str = "", action: str = "pick") -> RebaseItem:
+        hexsha = hexsha.ljust(40, "0")
+        commit = Commit(
+            repo, hex_to_bin(hexsha), message=message or f"Commit {hexsha[:7]}\n"
+        )
+        file_stats = {"insertions": 1, "deletions": 0, "lines": 1, "change_type": "A"}
+        stats = Stats(
+            {"insertions": 1, "deletions": 0, "lines": 1, "files": 1},
+            {f"{hexsha[:7]}.txt": file_stats},
+        )
+        return RebaseItem(action, commit, stats=stats)
+
+    return make
@@ -0,0 +1,73 @@
+from splitsquash.plan import apply_plan
+from splitsquash.rebase_todo.autosquash import autosquash
+from splitsquash.rebase_todo.rebase_todo_state import (
+    RebaseTodoState,
+    RebaseTodoStateAndCursor,
+)
+
+
+def _describe(rebase_items):
+    return [
+        (item.commit.message.strip(), item.action, item.fixup_option)
+        for item in rebase_items
+    ]
+
+
+def test_autosquash(make_item):
+    items = [
+        make_item("a1", "A"),
+        make_item("b1", "B"),
+        make_item("c1", "fixup! A"),
+        make_item("d1", "amend! B\n\nNew B"),
+        make_item("e1", "squash! a100"),
+    ]
+
+    result, num_changed = autosquash(items)
+
+    assert _describe(result) == [
+        ("A", "pick", None),
+        ("fixup! A", "fixup", None),
+        ("squash! a100", "squash", None),
+        ("B", "pick", None),
+        ("amend! B\n\nNew B", "fixup", "-C"),
+    ]
+    assert num_changed == 3
+
+
+def test_autosquash_arranged_todo(make_item):
+    items = [
+        make_item("a1", "A"),
+        make_item("c1", "fixup! A", action="fixup"),
+        make_item("b1", "B"),
+    ]
+
+    result, num_changed = autosquash(items)
+
+    assert result == items
+    assert num_changed == 0
+
+
+def test_autosquash_sets_action_in_place(make_item):
+    """An item that is already after its target still counts if its action changes"""
+    items = [make_item("a1", "A"), make_item("c1", "fixup! A")]
+
+    result, num_changed = autosquash(items)
+
+    assert _describe(result) == [("A", "pick", None), ("fixup! A", "fixup", None)]
+    assert num_changed == 1
+
+
+def test_autosquash_plan_adds_one_undo_step(make_item):
+    items = [make_item("a1", "A"), make_item("b1", "B"), make_item("c1", "fixup! A")]
+    todo_state = RebaseTodoStateAndCursor(RebaseTodoState(items))
+
+    apply_plan(todo_state, [{"op": "autosquash"}, {"op": "autosquash"}])
+    arranged = _describe(todo_state.get_current_items(copy=False))
+    todo_state.undo()
+
+    assert arranged == [
+        ("A", "pick", None),
+        ("fixup! A", "fixup", None),
+        ("B", "pick", None),
+    ]
+    assert _describe(todo_state.get_current_items(copy=False)) == _describe(items)
@@ -0,0 +1,47 @@
+import json
+
+from splitsquash.batch import rebase_branch_with_plan
+
+
+def _write_plan(tmp_path, operations) -> str:
+    plan_file = tmp_path / "plan.json"
+    plan_file.write_text(json.dumps(operations))
+    return str(plan_file)
+
+
+def test_rebase_branch_with_plan(tmp_path, repo_dir, git, commit_file):
+    commit_file("base.txt", "base\n", "base")
+    git("checkout", "-q", "-b", "feat")
+    commit_file("a.txt", "a\n", "A")
+    commit_file("b.txt", "b\n", "B")
+    git("checkout", "-q", "main")
+    plan_file = _write_plan(
+        tmp_path, [{"op": "set_action", "items": [1], "action": "fixup"}]
+    )
+
+    result = rebase_branch_with_plan(repo_dir, "feat", "main", plan_file)
+
+    assert result.success, result.output
+    assert git("rev-parse", "feat").strip() == result.new_sha
+    assert git("log", "--format=%s", "main..feat").split() == ["A"]
+
+
+def test_rebase_branch_with_plan_stops(tmp_path, repo_dir, git, commit_file):
+    """A rebase that stops at an edit is cancelled, and the branch isn't moved"""
+    commit_file("base.txt", "base\n", "base")
+    git("checkout", "-q", "-b", "feat")
+    commit_file("a.txt", "a\n", "A")
+    commit_file("b.txt", "b\n", "B")
+    old_sha = commit_file("c.txt", "c\n", "C")
+    git("checkout", "-q", "main")
+    plan_file = _write_plan(
+        tmp_path, [{"op": "set_action", "items": [1], "action": "edit"}]
+    )
+
+    result = rebase_branch_with_plan(repo_dir, "feat", "main", plan_file)
+
+    assert not result.success
+    assert result.new_sha is None
+    assert "stopped" in result.output
+    assert git("rev-parse", "feat").strip() == old_sha
+    assert git("worktree", "list", "--porcelain").count("worktree ") == 1
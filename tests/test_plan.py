@@ -0,0 +1,90 @@
+import pytest
+
+from splitsquash.plan import apply_plan
+from splitsquash.rebase_todo.rebase_todo_state import (
+    RebaseTodoState,
+    RebaseTodoStateAndCursor,
+)
+
+
+@pytest.fixture
+def todo_state(make_item) -> RebaseTodoStateAndCursor:
+    return RebaseTodoStateAndCursor(
+        RebaseTodoState([make_item("1a2b"), make_item("1a2c"), make_item("3c4d")])
+    )
+
+
+def _get_actions(todo_state: RebaseTodoStateAndCursor):
+    return [item.action for item in todo_state.get_current_items(copy=False)]
+
+
+@pytest.mark.parametrize("item_ref", [0, "3c4d", "1A2B", "1a2b0000"])
+def test_item_refs(todo_state, item_ref):
+    apply_plan(
+        todo_state, [{"op": "set_action", "items": [item_ref], "action": "drop"}]
+    )
+
+    expected_index = {0: 0, "3c4d": 2, "1A2B": 0, "1a2b0000": 0}[item_ref]
+    assert _get_actions(todo_state)[expected_index] == "drop"
+    assert _get_actions(todo_state).count("drop") == 1
+
+
+@pytest.mark.parametrize(
+    "item_ref",
+    [
+        # empty, too short, not hex, or no matching commit
+        "",
+        "1a2",
+        "zzzz",
+        "1a2b0000g",
+        "ffff",
+        # out of range, or not an index or hash
+        3,
+        -1,
+        True,
+        1.5,
+    ],
+)
+def test_invalid_item_refs(todo_state, item_ref):
+    with pytest.raises(ValueError):
+        apply_plan(
+            todo_state, [{"op": "set_action", "items": [item_ref], "action": "drop"}]
+        )
+
+    assert _get_actions(todo_state) == ["pick", "pick", "pick"]
+
+
+def test_copied_item_ref(todo_state):
+    apply_plan(todo_state, [{"op": "copy", "item": "1a2b"}])
+    apply_plan(todo_state, [{"op": "set_action", "items": ["1a2b"], "action": "drop"}])
+
+    # Copies of the same commit aren't ambiguous, and the first copy is used.
+    assert _get_actions(todo_state) == ["drop", "pick", "pick", "pick"]
+
+
+def test_ambiguous_commits(make_item):
+    todo_state = RebaseTodoStateAndCursor(
+        RebaseTodoState([make_item("abcd1"), make_item("abcd2")])
+    )
+
+    with pytest.raises(ValueError, match="more than one commit"):
+        apply_plan(
+            todo_state, [{"op": "set_action", "items": ["abcd"], "action": "drop"}]
+        )
+    apply_plan(todo_state, [{"op": "set_action", "items": ["abcd2"], "action": "drop"}])
+    assert _get_actions(todo_state) == ["pick", "drop"]
+
+
+@pytest.mark.parametrize(
+    "operations",
+    [
+        [1],
+        [{"op": "unknown"}],
+        [{"op": "set_action", "items": 0, "action": "drop"}],
+        [{"op": "set_action", "items": [0], "action": "unknown"}],
+        [{"op": "drop_files", "items": [0], "files": "1a2b000.txt"}],
+    ],
+)
+def test_invalid_operations(todo_state, operations):
+    with pytest.raises(ValueError):
+        apply_plan(todo_state, operations)
@@ -0,0 +1,143 @@
+import pytest
+from git import Repo
+
+from splitsquash.rebasing import (
+    COMMIT_COMMANDS,
+    OTHER_COMMANDS,
+    RebaseTodoToken,
+    parse_rebase_todo,
+    tokenize_rebase_todo,
+)
+
+
+def _tokenize(line: str) -> RebaseTodoToken:
+    (token,) = tokenize_rebase_todo([line])
+    return token
+
+
+@pytest.mark.parametrize("command", COMMIT_COMMANDS)
+def test_tokenize_commit_commands(command):
+    token = _tokenize(f"{command} 1a2b3c4 The message")
+
+    assert token == RebaseTodoToken(
+        1, COMMIT_COMMANDS[command], sha="1a2b3c4", args="The message"
+    )
+
+
+@pytest.mark.parametrize("command", OTHER_COMMANDS)
+def test_tokenize_other_commands(command):
+    token = _tokenize(f"{command} some args")
+
+    assert token == RebaseTodoToken(1, OTHER_COMMANDS[command], args="some args")
+
+
+@pytest.mark.parametrize("command", ["fixup", "f"])
+@pytest.mark.parametrize("option", ["-C", "-c"])
+def test_tokenize_fixup_option(command, option):
+    token = _tokenize(f"{command} {option} 1a2b3c4 amend! The message")
+
+    assert token == RebaseTodoToken(
+        1, "fixup", sha="1a2b3c4", fixup_option=option, args="amend! The message"
+    )
+
+
+def test_tokenize_fixup_without_option():
+    token = _tokenize("fixup 1a2b3c4 -C isn't an option here")
+
+    assert token.fixup_option is None
+    assert token.sha == "1a2b3c4"
+    assert token.args == "-C isn't an option here"
+
+
+def test_tokenize_exec():
+    token = _tokenize("exec ss-edit-rebase-item -a fixup a.txt --and -a pick b.txt")
+
+    assert token == RebaseTodoToken(
+        1, "exec", args="ss-edit-rebase-item -a fixup a.txt --and -a pick b.txt"
+    )
+
+
+def test_tokenize_merge():
+    token = _tokenize("merge -C 1a2b3c4 topic # Merge branch 'topic'")
+
+    assert token == RebaseTodoToken(
+        1, "merge", args="-C 1a2b3c4 topic # Merge branch 'topic'"
+    )
+
+
+def test_tokenize_update_ref():
+    token = _tokenize("update-ref refs/heads/topic")
+
+    assert token == RebaseTodoToken(1, "update-ref", args="refs/heads/topic")
+
+
+def test_tokenize_command_without_args():
+    assert _tokenize("break") == RebaseTodoToken(1, "break")
+    assert _tokenize("noop") == RebaseTodoToken(1, "noop")
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "pick\t1a2b3c4\tThe message",
+        "pick  1a2b3c4   The message",
+        " \tpick \t 1a2b3c4 \tThe message",
+    ],
+)
+def test_tokenize_whitespace(line):
+    token = _tokenize(line)
+
+    assert token == RebaseTodoToken(1, "pick", sha="1a2b3c4", args="The message")
+
+
+def test_tokenize_fixup_option_with_tabs():
+    token = _tokenize("fixup\t-C\t1a2b3c4\tThe message")
+
+    assert token == RebaseTodoToken(
+        1, "fixup", sha="1a2b3c4", fixup_option="-C", args="The message"
+    )
+
+
+def test_tokenize_skips_comments_and_blank_lines():
+    lines = ["# Rebase 1a2b3c4..5d6e7f8", "", "   ", "pick 1a2b3c4 A", "\t# comment"]
+
+    assert list(tokenize_rebase_todo(lines)) == [
+        RebaseTodoToken(4, "pick", sha="1a2b3c4", args="A")
+    ]
+
+
+@pytest.mark.parametrize("line", ["frobnicate 1a2b3c4", "pick", "fixup -C", "p\t"])
+def test_tokenize_invalid_lines(line):
+    with pytest.raises(ValueError):
+        _tokenize(line)
+
+
+def test_parse_rebase_todo(repo_dir, git, commit_file):
+    commit_file("base.txt", "base\n", "base")
+    a = commit_file("a.txt", "a\n", "A")
+    b = commit_file("b.txt", "b\n", "B")
+    rebase_todo = (
+        "label onto\n"
+        f"pick\t{a[:7]} A\n"
+        "exec make test\n"
+        f"f -C {b[:7]} B\n"
+        "update-ref refs/heads/topic\n"
+    )
+
+    todo = parse_rebase_todo(rebase_todo, Repo(repo_dir))
+
+    assert [command.get_line() for command in todo.leading_commands] == ["label onto"]
+    first, second = todo.rebase_items
+    assert (first.action, first.commit.hexsha) == ("pick", a)
+    assert [command.get_line() for command in first.following_commands] == [
+        "exec make test"
+    ]
+    assert (second.action, second.fixup_option, second.commit.hexsha) == (
+        "fixup",
+        "-C",
+        b,
+    )
+    assert list(second.file_changes) == ["b.txt"]
+    assert [command.get_line() for command in second.following_commands] == [
+        "update-ref refs/heads/topic"
+    ]